@@ -1,8 +1,8 @@
 import logging
 
 from schemas.user import User
-from services import auth_service
-from fastapi import Cookie, HTTPException, status
+from services import auth_service, request_profiling
+from fastapi import Cookie, Header, HTTPException, status
 
 
 async def get_current_user(access_token: str = Cookie(None)) -> User:
@@ -11,3 +11,9 @@ async def get_current_user(access_token: str = Cookie(None)) -> User:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
 
     return await auth_service.get_current_user(access_token)
+
+
+def require_profiling_token(x_profiling_token: str | None = Header(None)):
+    if not request_profiling.is_valid_token(x_profiling_token):
+        # the debug endpoints don't exist for anyone without the token
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
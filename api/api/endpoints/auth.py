@@ -1,9 +1,10 @@
 import os
 
-from services import auth_service, email_service
+from services import auth_service, email_service, profile_cache, recommendation_service
 from api.dependencies import get_current_user
 from schemas.user import (User, UserPrivate)
-from fastapi import APIRouter, Depends, Response, Request, status
+from schemas.recommendation import ToolRecommendation
+from fastapi import APIRouter, Depends, Query, Response, Request, status
 from pydantic import BaseModel
 
 
@@ -32,8 +33,8 @@ async def auth_google(code: str, response: Response):
 
 
 @router.post("/confirm/new")
-def confirm(request: Request, current_user: User = Depends(get_current_user)):
-    return auth_service.generate_and_send_confirmation_email(user=current_user, request=request)
+async def confirm(request: Request, current_user: User = Depends(get_current_user)):
+    return await auth_service.generate_and_send_confirmation_email(user=current_user, request=request)
 
 
 @router.get("/confirm/{token}")
@@ -51,15 +52,14 @@ async def read_users_me(current_user: User = Depends(get_current_user)):
     return await auth_service.read_users_me(user=current_user)
 
 
-@router.get("/users/{url}", response_model=UserPrivate | User)
-async def read_users_me(url: str):
-
-    user = await auth_service.get_user(url=url)
+@router.get("/users/me/recommendations", response_model=list[ToolRecommendation])
+async def read_users_me_recommendations(limit: int = Query(10, ge=1, le=50), current_user: User = Depends(get_current_user)):
+    return recommendation_service.get_recommendations(user_id=current_user.id, limit=limit)
 
-    if user is None:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
 
-    return await user.to_schema(include_tools=True, user_id=user.id)
+@router.get("/users/{url}", response_model=UserPrivate | User)
+async def read_users_me(url: str, request: Request):
+    return await profile_cache.get_profile_response(request=request, url=url)
 
 
 # TODO: move else-where
@@ -0,0 +1,22 @@
+from services import request_profiling
+from api.dependencies import require_profiling_token
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import FileResponse
+
+
+router = APIRouter(dependencies=[Depends(require_profiling_token)], include_in_schema=False)
+
+
+@router.get("/profiles")
+async def list_profiles():
+    return request_profiling.list_profiles()
+
+
+@router.get("/profiles/{request_id}")
+async def get_profile(request_id: str):
+    path = request_profiling.get_profile_path(request_id)
+
+    if path is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profile not found")
+
+    return FileResponse(path, media_type="text/html")
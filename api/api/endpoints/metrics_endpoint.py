@@ -0,0 +1,12 @@
+from services import metrics
+from fastapi import APIRouter, Response
+
+
+router = APIRouter()
+
+
+@router.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    content, content_type = metrics.generate()
+
+    return Response(content=content, media_type=content_type)
@@ -1,20 +1,71 @@
 import os
 
-from services import tool_service
+from services import audio_service, import_service, popularity_service, profile_service, recommendation_service, search_service, tool_service
 from api.dependencies import get_current_user
 from schemas.user import User
 from schemas.tool import Tool
-from fastapi import APIRouter, Depends, Response, Request, status, UploadFile, File
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, Depends, Form, Query, Response, Request, status, UploadFile, File
+from fastapi.responses import FileResponse, StreamingResponse
 from schemas.tool import ToolCreate
+from schemas.tool_ingestion_job import ToolIngestionJob
+from schemas.audio_upload import AudioUpload, AudioUploadCreate
+from schemas.popularity import ToolRankingPage
+from schemas.recommendation import ToolRecommendation
+from schemas.search import ToolSearchResult
+from uuid import UUID
 
 
 router = APIRouter()
 
 
-@router.post("/", response_model=Tool)
+@router.post("/", response_model=ToolIngestionJob, status_code=status.HTTP_202_ACCEPTED)
 async def add_tool(tool_data: ToolCreate, current_user: User = Depends(get_current_user)):
-    return await tool_service.add_tool(link=tool_data.link, user=current_user)
+    job = await tool_service.add_tool(link=tool_data.link, user=current_user)
+
+    return await job.to_schema()
+
+
+@router.post("/import")
+async def import_tools(
+    links: list[str] = Form([]),
+    file: UploadFile | None = File(None),
+    current_user: User = Depends(get_current_user),
+):
+    entries = await import_service.parse_request(links=links, file=file)
+
+    return StreamingResponse(
+        import_service.stream_import(entries=entries, user=current_user),
+        media_type="text/event-stream",
+        # proxies must not buffer the events
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/jobs/{job_id}", response_model=ToolIngestionJob)
+async def get_tool_ingestion_job(job_id: int, current_user: User = Depends(get_current_user)):
+    job = await tool_service.get_ingestion_job(id=job_id, user=current_user)
+
+    return await job.to_schema()
+
+
+@router.get("/search", response_model=list[ToolSearchResult])
+async def search_tools(q: str = Query(..., min_length=1, max_length=100), limit: int = Query(10, ge=1, le=50)):
+    return search_service.search(query=q, limit=limit)
+
+
+@router.get("/popular", response_model=ToolRankingPage)
+async def get_popular_tools(limit: int = Query(20, ge=1, le=100), cursor: str | None = None):
+    return await popularity_service.get_leaderboard(kind=popularity_service.POPULAR, limit=limit, cursor=cursor)
+
+
+@router.get("/trending", response_model=ToolRankingPage)
+async def get_trending_tools(limit: int = Query(20, ge=1, le=100), cursor: str | None = None):
+    return await popularity_service.get_leaderboard(kind=popularity_service.TRENDING, limit=limit, cursor=cursor)
+
+
+@router.get("/{tool_id}/similar", response_model=list[ToolRecommendation])
+async def get_similar_tools(tool_id: int, limit: int = Query(10, ge=1, le=50)):
+    return recommendation_service.get_similar_tools(tool_id=tool_id, limit=limit)
 
 
 @router.delete("/{tool_id}")
@@ -26,23 +77,70 @@ async def remove_tool(tool_id: int, current_user: User = Depends(get_current_use
 
 
 @router.get("/{tool_id}/review")
-async def get_tool_review(tool_id: int, user_id: int, data: bool = False):
-
-    review = await (await tool_service.get_audio_review(tool_id=tool_id, user_id=user_id)).to_schema()
+async def get_tool_review(request: Request, tool_id: int, user_id: int, data: bool = False, v: str | None = None):
 
     if data:
-        return Response(content=review.audio_data, media_type="audio/mp3")
+        playback = await audio_service.get_playback(tool_id=tool_id, user_id=user_id)
+        return audio_service.build_response(request=request, playback=playback, version=v)
 
-    del review.audio_data
-
-    return review
+    return await profile_service.get_review(tool_id=tool_id, user_id=user_id)
 
 
 @router.post("/{tool_id}/review")
-async def add_tool(tool_id: int, audio: UploadFile = File(...), current_user: User = Depends(get_current_user)):
-    review = await (await tool_service.update_audio_review(tool_id=tool_id, audio=audio, user=current_user)).to_schema()
+async def add_tool(tool_id: int, request: Request, current_user: User = Depends(get_current_user)):
+    # parsed by hand, a File(...) parameter would spool the whole body before any size check
+    form = await audio_service.read_audio_form(request)
+
+    try:
+        review = await tool_service.update_audio_review(tool_id=tool_id, audio=form["audio"], user=current_user)
+    finally:
+        await form.close()
+
+    return await review.to_schema()
+
+
+@router.post("/{tool_id}/review/uploads", response_model=AudioUpload, status_code=status.HTTP_201_CREATED)
+async def create_review_upload(tool_id: int, params: AudioUploadCreate, current_user: User = Depends(get_current_user)):
+    upload = await audio_service.create_upload(tool_id=tool_id, user=current_user, size=params.size, mime_type=params.mime_type)
+
+    return await upload.to_schema(max_size=tool_service.AUDIO_UPLOAD_MAX_BYTES)
+
+
+@router.get("/{tool_id}/review/uploads/{upload_id}", response_model=AudioUpload)
+async def get_review_upload(tool_id: int, upload_id: UUID, response: Response, current_user: User = Depends(get_current_user)):
+    upload = await audio_service.get_upload(id=upload_id, tool_id=tool_id, user=current_user)
+    response.headers["Upload-Offset"] = str(upload.offset)
 
-    del review.audio_data
+    return await upload.to_schema(max_size=tool_service.AUDIO_UPLOAD_MAX_BYTES)
 
-    return review
 
+@router.put("/{tool_id}/review/uploads/{upload_id}", response_model=AudioUpload)
+async def write_review_upload_chunk(
+    tool_id: int,
+    upload_id: UUID,
+    offset: int,
+    request: Request,
+    response: Response,
+    current_user: User = Depends(get_current_user),
+):
+    upload = await audio_service.get_upload(id=upload_id, tool_id=tool_id, user=current_user)
+    upload = await audio_service.write_chunk(upload=upload, offset=offset, chunks=request.stream())
+    response.headers["Upload-Offset"] = str(upload.offset)
+
+    return await upload.to_schema(max_size=tool_service.AUDIO_UPLOAD_MAX_BYTES)
+
+
+@router.post("/{tool_id}/review/uploads/{upload_id}/complete")
+async def complete_review_upload(tool_id: int, upload_id: UUID, current_user: User = Depends(get_current_user)):
+    upload = await audio_service.get_upload(id=upload_id, tool_id=tool_id, user=current_user)
+    review = await audio_service.complete_upload(upload=upload, user=current_user)
+
+    return await review.to_schema()
+
+
+@router.delete("/{tool_id}/review/uploads/{upload_id}")
+async def cancel_review_upload(tool_id: int, upload_id: UUID, current_user: User = Depends(get_current_user)):
+    upload = await audio_service.get_upload(id=upload_id, tool_id=tool_id, user=current_user)
+    await audio_service.cancel_upload(upload)
+
+    return
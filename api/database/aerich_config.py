@@ -0,0 +1,5 @@
+from database.database import _get_db_config
+
+
+# read by the aerich cli (pyproject.toml), the api applies the migrations itself (database.database.upgrade_schema)
+TORTOISE_ORM = _get_db_config()
@@ -0,0 +1,219 @@
+"""Instrumented asyncpg client, used as the Tortoise engine
+(`"engine": "database.client"`).
+
+Every query run through Tortoise (or `connection.execute_query`) is timed
+and reported to the query listeners with its fingerprint: the SQL with
+literals and parameters replaced by `?`, so the same query with other
+values adds up. Every pool acquire is timed as well and reported to the
+pool listeners, along with the pool occupancy.
+
+Queries slower than SLOW_QUERY_MS and acquires that waited more than
+SLOW_POOL_WAIT_MS are logged.
+"""
+import os
+import re
+import time
+import asyncio
+import logging
+import asyncpg
+
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Callable
+from tortoise.backends.asyncpg.client import AsyncpgDBClient
+
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+SLOW_POOL_WAIT_MS = float(os.getenv("SLOW_POOL_WAIT_MS", "50"))
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PARAMETER = re.compile(r"\$\d+")
+_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACES = re.compile(r"\s+")
+
+
+@dataclass
+class QueryEvent:
+    fingerprint: str
+    duration: float
+    rows: int
+    failed: bool
+
+
+@dataclass
+class PoolEvent:
+    connection_name: str
+    wait: float
+    in_use: int
+    size: int
+    max_size: int
+    waiting: int
+
+
+_query_listeners: list[Callable[[QueryEvent], None]] = []
+_pool_listeners: list[Callable[[PoolEvent], None]] = []
+_pools: dict[str, "InstrumentedPool"] = {}
+
+
+def add_query_listener(listener: Callable[[QueryEvent], None]):
+    _query_listeners.append(listener)
+
+
+def add_pool_listener(listener: Callable[[PoolEvent], None]):
+    _pool_listeners.append(listener)
+
+
+@lru_cache(maxsize=4096)
+def fingerprint(query: str) -> str:
+    query = _STRING.sub("?", query)
+    query = _PARAMETER.sub("?", query)
+    query = _NUMBER.sub("?", query)
+    query = _LIST.sub("(?+)", query)
+
+    return _SPACES.sub(" ", query).strip()
+
+
+def _notify(listeners: list, event):
+    for listener in listeners:
+        try:
+            listener(event)
+        except Exception:
+            logging.exception(f"Database listener failed: {listener=}")
+
+
+def _rows_from_status(status: str) -> int:
+    # "UPDATE 3", "INSERT 0 1", "SELECT 12"...
+    try:
+        return int(status.rsplit(" ", 1)[-1])
+    except (AttributeError, ValueError):
+        return 0
+
+
+class InstrumentedConnection(asyncpg.Connection):
+    # the pool resets every released connection, that query is not the application's
+    _resetting = False
+
+    async def reset(self, *, timeout=None):
+        self._resetting = True
+
+        try:
+            await super().reset(timeout=timeout)
+        finally:
+            self._resetting = False
+
+    async def _timed(self, query: str, run, count_rows):
+        if self._resetting:
+            return await run
+
+        start = time.perf_counter()
+        failed, rows = True, 0
+
+        try:
+            result = await run
+            failed, rows = False, count_rows(result)
+            return result
+        finally:
+            _notify(_query_listeners, QueryEvent(
+                fingerprint=fingerprint(query),
+                duration=time.perf_counter() - start,
+                rows=rows,
+                failed=failed,
+            ))
+
+    async def fetch(self, query, *args, timeout=None, record_class=None):
+        return await self._timed(query, super().fetch(query, *args, timeout=timeout, record_class=record_class), len)
+
+    async def fetchrow(self, query, *args, timeout=None, record_class=None):
+        return await self._timed(query, super().fetchrow(query, *args, timeout=timeout, record_class=record_class), lambda row: int(row is not None))
+
+    async def execute(self, query, *args, timeout=None):
+        return await self._timed(query, super().execute(query, *args, timeout=timeout), _rows_from_status)
+
+    async def executemany(self, command, args, *, timeout=None):
+        args = list(args)
+        return await self._timed(command, super().executemany(command, args, timeout=timeout), lambda _: len(args))
+
+
+class InstrumentedPool:
+    """Times the acquires of an asyncpg pool, and applies the acquire
+    timeout Tortoise doesn't pass."""
+
+    def __init__(self, pool: asyncpg.Pool, connection_name: str, acquire_timeout: float | None):
+        self._pool = pool
+        self.connection_name = connection_name
+        self.acquire_timeout = acquire_timeout
+        self.waiting = 0
+
+    async def acquire(self, *, timeout=None):
+        start = time.perf_counter()
+        self.waiting += 1
+
+        try:
+            return await self._pool.acquire(timeout=timeout or self.acquire_timeout)
+        finally:
+            self.waiting -= 1
+            _notify(_pool_listeners, PoolEvent(wait=time.perf_counter() - start, **self.get_stats()))
+
+    def get_stats(self) -> dict:
+        size = self._pool.get_size()
+
+        return {
+            "connection_name": self.connection_name,
+            "in_use": size - self._pool.get_idle_size(),
+            "size": size,
+            "max_size": self._pool.get_max_size(),
+            "waiting": self.waiting,
+        }
+
+    def __getattr__(self, name):
+        return getattr(self._pool, name)
+
+
+def get_pool_stats() -> list[dict]:
+    return [pool.get_stats() for pool in _pools.values()]
+
+
+class InstrumentedAsyncpgDBClient(AsyncpgDBClient):
+    connection_class = InstrumentedConnection
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._create_lock = asyncio.Lock()
+
+    async def create_connection(self, with_db: bool) -> None:
+        # tortoise opens the pool on first use without a lock: the background
+        # workers starting together would each open one, and release their
+        # connections to another
+        async with self._create_lock:
+            if self._pool is None:
+                await super().create_connection(with_db)
+
+    async def create_pool(self, **kwargs) -> InstrumentedPool:
+        acquire_timeout = kwargs.pop("acquire_timeout", None)
+        pool = InstrumentedPool(await super().create_pool(**kwargs), connection_name=self.connection_name, acquire_timeout=acquire_timeout)
+        _pools[self.connection_name] = pool
+
+        return pool
+
+    async def _close(self) -> None:
+        _pools.pop(self.connection_name, None)
+        await super()._close()
+
+
+def _log_slow_query(event: QueryEvent):
+    if event.duration * 1000 >= SLOW_QUERY_MS:
+        logging.warning(f"Slow query: {event.duration * 1000:.0f}ms rows={event.rows} failed={event.failed} {event.fingerprint[:1000]}")
+
+
+def _log_slow_pool_wait(event: PoolEvent):
+    if event.wait * 1000 >= SLOW_POOL_WAIT_MS:
+        logging.warning(f"Slow connection acquire: {event.wait * 1000:.0f}ms in_use={event.in_use}/{event.max_size} waiting={event.waiting} connection={event.connection_name}")
+
+
+add_query_listener(_log_slow_query)
+add_pool_listener(_log_slow_pool_wait)
+
+
+# looked up by Tortoise on the engine module
+client_class = InstrumentedAsyncpgDBClient
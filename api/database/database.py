@@ -1,6 +1,10 @@
 import os
 
 from tortoise import Tortoise
+from aerich import Command
+
+
+MIGRATIONS_LOCATION = os.path.join(os.path.dirname(os.path.dirname(__file__)), "migrations")
 
 
 def _get_db_config():
@@ -25,23 +29,39 @@ def _get_db_config():
     if POSTGRES_DB is None:
         raise ValueError(f"POSTGRES_DB env variable is not defined")
 
+    # every server worker has its own pool: workers * DB_POOL_MAX_SIZE must stay under postgres max_connections (checked by server.py)
+    DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+    DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "5"))
+    DB_POOL_ACQUIRE_TIMEOUT = float(os.getenv("DB_POOL_ACQUIRE_TIMEOUT", "10"))
+    DB_MAX_INACTIVE_CONNECTION_LIFETIME = float(os.getenv("DB_MAX_INACTIVE_CONNECTION_LIFETIME", "300"))
+    # prepared statements kept per connection, 0 behind pgbouncer in transaction mode
+    DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100"))
+    # seconds, 0 for no timeout (the default: the scripts share this config)
+    DB_COMMAND_TIMEOUT = float(os.getenv("DB_COMMAND_TIMEOUT", "0"))
+
     return {
     'connections': {
             'default': {
-                'engine': 'tortoise.backends.asyncpg',
+                # tortoise.backends.asyncpg, with query and pool instrumentation
+                'engine': 'database.client',
                 'credentials': {
                     'host': POSTGRES_HOST,
                     'port': POSTGRES_PORT,
                     'user': POSTGRES_USER,
                     'password': POSTGRES_PASSWORD,
                     'database': POSTGRES_DB,
+                    'minsize': DB_POOL_MIN_SIZE,
+                    'maxsize': DB_POOL_MAX_SIZE,
+                    'acquire_timeout': DB_POOL_ACQUIRE_TIMEOUT or None,
+                    'max_inactive_connection_lifetime': DB_MAX_INACTIVE_CONNECTION_LIFETIME,
+                    'statement_cache_size': DB_STATEMENT_CACHE_SIZE,
+                    'command_timeout': DB_COMMAND_TIMEOUT or None,
                 }
             }
         },
         'apps': {
             'models': {
-                'models': ['database.models'],
-                # 'models': ['database.models', 'aerich.models'],
+                'models': ['database.models', 'aerich.models'],
                 'default_connection': 'default',
             }
         }
@@ -55,3 +75,15 @@ async def init_db():
     # NOTE: do never use! Conflicting with aerich
     # https://github.com/tortoise/aerich/issues/324#issuecomment-1794095008
     # await Tortoise.generate_schemas()
+
+
+async def upgrade_schema() -> list[str]:
+    """Applies the aerich migrations (migrations/models) the database is missing,
+    run by server.py before the workers start and by the scripts.
+
+    New migrations come from `aerich migrate --name <change>`, see pyproject.toml."""
+
+    command = Command(tortoise_config=_get_db_config(), app="models", location=MIGRATIONS_LOCATION)
+    await command.init()
+
+    return await command.upgrade()
@@ -4,32 +4,93 @@ from schemas.user import (
     UserPrivate as _UserPrivateSchema,
 )
 from schemas.tool import Tool as ToolSchema
-from schemas.audio_review import AudioReview as AudioReviewSchema
+from schemas.audio_review import (
+    AudioReview as AudioReviewSchema,
+    AudioProcessingStatus,
+)
+from schemas.audio_upload import AudioUpload as AudioUploadSchema
+from schemas.email_outbox import EmailStatus
+from schemas.tool_ingestion_job import (
+    ToolIngestionJob as ToolIngestionJobSchema,
+    ToolIngestionJobStatus,
+)
 
 
-# TODO: move to minio
 class AudioReview(models.Model):
     id = fields.IntField(pk=True)
 
     tool = fields.ForeignKeyField('models.Tool', related_name='audio_reviews')
     user = fields.ForeignKeyField('models.User', related_name='audio_reviews')
 
-    audio_data = fields.BinaryField()
+    # recordings live in the blob storage (services/blob_storage.py), keyed by content hash
+    blob_key = fields.CharField(max_length=128, null=True, index=True)
+    size = fields.IntField(null=True)
+    mime_type = fields.CharField(max_length=64, null=True)
+
+    # legacy inline storage, emptied by `python -m scripts.migrate_audio_blobs`
+    audio_data = fields.BinaryField(null=True)
+
+    # speech-tuned rendition, duration and waveform peaks (services/audio_processing_service.py)
+    processing_status = fields.CharEnumField(AudioProcessingStatus, default=AudioProcessingStatus.PENDING, index=True)
+    processing_error = fields.TextField(null=True)
+    processing_attempts = fields.IntField(default=0)
+    processing_started_at = fields.DatetimeField(null=True)
+    processing_run_after = fields.DatetimeField(auto_now_add=True)
+    rendition_key = fields.CharField(max_length=128, null=True, index=True)
+    rendition_size = fields.IntField(null=True)
+    rendition_mime_type = fields.CharField(max_length=64, null=True)
+    duration = fields.FloatField(null=True)
+    peaks = fields.JSONField(null=True)
+
     created_at = fields.DatetimeField(auto_now_add=True)
     updated_at = fields.DatetimeField(auto_now=True)
 
-    async def to_schema(self) -> _UserSchema:
+    async def to_schema(self) -> AudioReviewSchema:
+        # the rendition is served in place of the original once it exists
+        served_key = self.rendition_key or self.blob_key
+
         return AudioReviewSchema(
             id=self.id,
             tool=await (await self.tool).to_schema(),
             user=(await (await self.user).to_schema()).to_user_private(),
-            audio_data=self.audio_data,
+            size=self.rendition_size or self.size,
+            mime_type=self.rendition_mime_type or self.mime_type,
+            content_hash=served_key.rsplit("/", 1)[-1] if served_key else None,
+            processing_status=self.processing_status,
+            duration=self.duration,
+            peaks=self.peaks,
         )
 
     class Meta:
         table = "audio_reviews"
 
 
+class AudioUpload(models.Model):
+    id = fields.UUIDField(pk=True)
+
+    tool = fields.ForeignKeyField('models.Tool', related_name='audio_uploads')
+    user = fields.ForeignKeyField('models.User', related_name='audio_uploads')
+
+    # bytes received so far, chunks are spooled to disk (see services/audio_service.py)
+    offset = fields.BigIntField(default=0)
+    size = fields.BigIntField(null=True)
+    mime_type = fields.CharField(max_length=64, null=True)
+
+    created_at = fields.DatetimeField(auto_now_add=True)
+    updated_at = fields.DatetimeField(auto_now=True)
+
+    async def to_schema(self, max_size: int) -> AudioUploadSchema:
+        return AudioUploadSchema(
+            id=self.id,
+            offset=self.offset,
+            size=self.size,
+            max_size=max_size,
+        )
+
+    class Meta:
+        table = "audio_uploads"
+
+
 class Tool(models.Model):
     id = fields.IntField(pk=True)
 
@@ -51,6 +112,8 @@ class Tool(models.Model):
 
     class Meta:
         table = "tools"
+        # one tool per domain, the existing duplicates are merged by the migration adding it
+        unique_together = (("link",),)
 
 
 class User(models.Model):
@@ -62,13 +125,14 @@ class User(models.Model):
     created_at = fields.DatetimeField(auto_now_add=True)
     picture = fields.TextField()
 
+    # bumped by every write that changes the public profile (services/profile_cache.py)
+    profile_version = fields.IntField(default=0)
+
     tools = fields.ManyToManyField('models.Tool', related_name='users')
     audio_reviews = fields.ReverseRelation['AudioReview']
 
     async def to_schema(self, include_tools: bool = False, user_id: int | None = None) -> _UserSchema:
 
-        tools = [await _tool.to_schema() for _tool in (await self.tools.all())]
-
         if user_id is None or user_id == self.id:
             schema = _UserSchema(
                 id=self.id,
@@ -87,10 +151,100 @@ class User(models.Model):
             )
 
         if include_tools:
-            schema.tools = tools
-            # setattr(schema, "tools", tools)
+            schema.tools = [ToolSchema(**tool) for tool in await self.tools.all().values("id", "link", "name", "category", "logo")]
 
         return schema
 
     class Meta:
         table = "users"
+
+
+class ToolIngestionJob(models.Model):
+    id = fields.IntField(pk=True)
+
+    user = fields.ForeignKeyField('models.User', related_name='tool_ingestion_jobs')
+    tool = fields.ForeignKeyField('models.Tool', related_name='ingestion_jobs', null=True)
+
+    link = fields.TextField()
+    domain = fields.TextField()
+    status = fields.CharEnumField(ToolIngestionJobStatus, default=ToolIngestionJobStatus.PENDING, index=True)
+    error = fields.TextField(null=True)
+    attempts = fields.IntField(default=0)
+
+    run_after = fields.DatetimeField(auto_now_add=True)
+    started_at = fields.DatetimeField(null=True)
+    finished_at = fields.DatetimeField(null=True)
+    created_at = fields.DatetimeField(auto_now_add=True)
+    updated_at = fields.DatetimeField(auto_now=True)
+
+    async def to_schema(self) -> ToolIngestionJobSchema:
+        tool = await self.tool if self.tool_id is not None else None
+
+        return ToolIngestionJobSchema(
+            id=self.id,
+            link=self.link,
+            domain=self.domain,
+            status=self.status,
+            error=self.error,
+            tool=await tool.to_schema() if tool is not None else None,
+            created_at=self.created_at,
+            finished_at=self.finished_at,
+        )
+
+    class Meta:
+        table = "tool_ingestion_jobs"
+
+
+class ToolPopularity(models.Model):
+    id = fields.IntField(pk=True)
+
+    tool = fields.OneToOneField('models.Tool', related_name='popularity')
+
+    # maintained on every membership change, corrected by the reconciler (services/popularity_service.py)
+    users_count = fields.IntField(default=0, index=True)
+    # log2 of the undecayed sum, -inf without adoption: always set by the service, a -inf default isn't valid DDL
+    trending_log_score = fields.FloatField(index=True)
+
+    updated_at = fields.DatetimeField(auto_now=True)
+
+    class Meta:
+        table = "tool_popularity"
+
+
+class DomainMetadata(models.Model):
+    id = fields.IntField(pk=True)
+
+    domain = fields.CharField(max_length=255)
+    kind = fields.CharField(max_length=32)
+
+    value = fields.JSONField(null=True)
+    is_negative = fields.BooleanField(default=False)
+    status_code = fields.IntField(null=True)
+    error = fields.TextField(null=True)
+
+    expires_at = fields.DatetimeField(index=True)
+    updated_at = fields.DatetimeField(auto_now=True)
+
+    class Meta:
+        table = "domain_metadata"
+        unique_together = (("domain", "kind"),)
+
+
+class EmailOutbox(models.Model):
+    id = fields.IntField(pk=True)
+
+    # a Mailjet v3.1 message, sent in batches by services/email_service.py
+    message = fields.JSONField()
+
+    status = fields.CharEnumField(EmailStatus, default=EmailStatus.PENDING, index=True)
+    error = fields.TextField(null=True)
+    attempts = fields.IntField(default=0)
+
+    run_after = fields.DatetimeField(auto_now_add=True)
+    started_at = fields.DatetimeField(null=True)
+    sent_at = fields.DatetimeField(null=True)
+    created_at = fields.DatetimeField(auto_now_add=True)
+    updated_at = fields.DatetimeField(auto_now=True)
+
+    class Meta:
+        table = "email_outbox"
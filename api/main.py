@@ -1,13 +1,18 @@
+import os
 import logging
 import asyncio
 
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from tortoise.contrib.fastapi import RegisterTortoise
 from contextlib import asynccontextmanager
 from database.database import _get_db_config
+from services import audio_processing_service, audio_service, background, email_service, google_auth, http_client, ingestion_service, metrics, popularity_service, profile_cache, recommendation_service, request_profiling, search_service, tool_service
 from api.endpoints.auth import router as auth_router
 from api.endpoints.tool_endpoint import router as tool_router
+from api.endpoints.metrics_endpoint import router as metrics_router
+from api.endpoints.debug_endpoint import router as debug_router
 
 
 # Configure logging
@@ -23,13 +28,34 @@ async def lifespan(app: FastAPI):
     async with RegisterTortoise(
         app=app,
         config=_get_db_config(),
-        generate_schemas=True,
         add_exception_handlers=True,
     ):
+        # the schema is brought up to date by server.py, once before the workers start
+        await http_client.open_session()
+        google_auth.start_refresher()
+        ingestion_service.start_workers()
+        audio_processing_service.start_workers()
+        popularity_service.start_reconciler()
+        recommendation_service.start_rebuilder()
+        search_service.start_rebuilder()
+        email_service.start_sender()
+        background.start("audio-upload-cleanup", audio_service.cleanup_stale_uploads)
+
         yield
 
+        await background.stop_all()
+        await http_client.close_session()
+        await profile_cache.close()
+        await tool_service.openai_client.close()
+        metrics.mark_process_dead()
 
-app = FastAPI(debug=True, lifespan=lifespan)
+
+# debug tracebacks only with the dev profile (server.py)
+app = FastAPI(
+    debug=os.getenv("APP_DEBUG") == "1",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan,
+)
 
 
 app.add_middleware(
@@ -45,8 +71,14 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(request_profiling.ProfilingMiddleware)
+# outermost, so the time spent in the other middlewares is measured too
+app.add_middleware(metrics.MetricsMiddleware)
+
 app.include_router(auth_router, prefix="/auth", tags=["auth"])
 app.include_router(tool_router, prefix="/tool", tags=["tool"])
+app.include_router(metrics_router)
+app.include_router(debug_router, prefix="/debug", tags=["debug"])
 
 from dotenv import load_dotenv
 import os
@@ -0,0 +1,44 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        CREATE TABLE IF NOT EXISTS "tools" (
+    "id" SERIAL NOT NULL PRIMARY KEY,
+    "link" TEXT NOT NULL,
+    "name" TEXT NOT NULL,
+    "category" TEXT NOT NULL,
+    "logo" TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS "users" (
+    "id" SERIAL NOT NULL PRIMARY KEY,
+    "url" VARCHAR(255) NOT NULL UNIQUE,
+    "username" VARCHAR(255) NOT NULL UNIQUE,
+    "email" VARCHAR(255) NOT NULL UNIQUE,
+    "created_at" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "picture" TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS "audio_reviews" (
+    "id" SERIAL NOT NULL PRIMARY KEY,
+    "audio_data" BYTEA NOT NULL,
+    "created_at" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "updated_at" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "tool_id" INT NOT NULL REFERENCES "tools" ("id") ON DELETE CASCADE,
+    "user_id" INT NOT NULL REFERENCES "users" ("id") ON DELETE CASCADE
+);
+CREATE TABLE IF NOT EXISTS "aerich" (
+    "id" SERIAL NOT NULL PRIMARY KEY,
+    "version" VARCHAR(255) NOT NULL,
+    "app" VARCHAR(100) NOT NULL,
+    "content" JSONB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS "users_tools" (
+    "users_id" INT NOT NULL REFERENCES "users" ("id") ON DELETE CASCADE,
+    "tool_id" INT NOT NULL REFERENCES "tools" ("id") ON DELETE CASCADE
+);
+CREATE UNIQUE INDEX IF NOT EXISTS "uidx_users_tools_users_i_2b768b" ON "users_tools" ("users_id", "tool_id");"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        """
@@ -0,0 +1,116 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        ALTER TABLE "audio_reviews" ADD "blob_key" VARCHAR(128);
+        ALTER TABLE "audio_reviews" ADD "size" INT;
+        ALTER TABLE "audio_reviews" ADD "mime_type" VARCHAR(64);
+        ALTER TABLE "audio_reviews" ALTER COLUMN "audio_data" DROP NOT NULL;
+        ALTER TABLE "audio_reviews" ADD "processing_status" VARCHAR(7) NOT NULL  DEFAULT 'pending';
+        ALTER TABLE "audio_reviews" ADD "processing_error" TEXT;
+        ALTER TABLE "audio_reviews" ADD "processing_attempts" INT NOT NULL  DEFAULT 0;
+        ALTER TABLE "audio_reviews" ADD "processing_started_at" TIMESTAMPTZ;
+        ALTER TABLE "audio_reviews" ADD "processing_run_after" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP;
+        ALTER TABLE "audio_reviews" ADD "rendition_key" VARCHAR(128);
+        ALTER TABLE "audio_reviews" ADD "rendition_size" INT;
+        ALTER TABLE "audio_reviews" ADD "rendition_mime_type" VARCHAR(64);
+        ALTER TABLE "audio_reviews" ADD "duration" DOUBLE PRECISION;
+        ALTER TABLE "audio_reviews" ADD "peaks" JSONB;
+        COMMENT ON COLUMN "audio_reviews"."processing_status" IS 'PENDING: pending\nRUNNING: running\nDONE: done\nFAILED: failed';
+        CREATE INDEX "idx_audio_revie_blob_ke_210002" ON "audio_reviews" ("blob_key");
+        CREATE INDEX "idx_audio_revie_process_c45e2a" ON "audio_reviews" ("processing_status");
+        CREATE INDEX "idx_audio_revie_renditi_8b32fd" ON "audio_reviews" ("rendition_key");
+        CREATE TABLE IF NOT EXISTS "audio_uploads" (
+    "id" UUID NOT NULL  PRIMARY KEY,
+    "offset" BIGINT NOT NULL  DEFAULT 0,
+    "size" BIGINT,
+    "mime_type" VARCHAR(64),
+    "created_at" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "updated_at" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "tool_id" INT NOT NULL REFERENCES "tools" ("id") ON DELETE CASCADE,
+    "user_id" INT NOT NULL REFERENCES "users" ("id") ON DELETE CASCADE
+);
+        ALTER TABLE "users" ADD "profile_version" INT NOT NULL  DEFAULT 0;
+        ALTER TABLE "users_tools" ADD "created_at" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP;
+        CREATE TABLE IF NOT EXISTS "tool_ingestion_jobs" (
+    "id" SERIAL NOT NULL PRIMARY KEY,
+    "link" TEXT NOT NULL,
+    "domain" TEXT NOT NULL,
+    "status" VARCHAR(7) NOT NULL  DEFAULT 'pending',
+    "error" TEXT,
+    "attempts" INT NOT NULL  DEFAULT 0,
+    "run_after" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "started_at" TIMESTAMPTZ,
+    "finished_at" TIMESTAMPTZ,
+    "created_at" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "updated_at" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "tool_id" INT REFERENCES "tools" ("id") ON DELETE CASCADE,
+    "user_id" INT NOT NULL REFERENCES "users" ("id") ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS "idx_tool_ingest_status_15f157" ON "tool_ingestion_jobs" ("status");
+COMMENT ON COLUMN "tool_ingestion_jobs"."status" IS 'PENDING: pending\nRUNNING: running\nDONE: done\nFAILED: failed';
+        CREATE TABLE IF NOT EXISTS "tool_popularity" (
+    "id" SERIAL NOT NULL PRIMARY KEY,
+    "users_count" INT NOT NULL  DEFAULT 0,
+    "trending_log_score" DOUBLE PRECISION NOT NULL,
+    "updated_at" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "tool_id" INT NOT NULL UNIQUE REFERENCES "tools" ("id") ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS "idx_tool_popula_users_c_e6eb98" ON "tool_popularity" ("users_count");
+CREATE INDEX IF NOT EXISTS "idx_tool_popula_trendin_24f991" ON "tool_popularity" ("trending_log_score");
+        CREATE TABLE IF NOT EXISTS "domain_metadata" (
+    "id" SERIAL NOT NULL PRIMARY KEY,
+    "domain" VARCHAR(255) NOT NULL,
+    "kind" VARCHAR(32) NOT NULL,
+    "value" JSONB,
+    "is_negative" BOOL NOT NULL  DEFAULT False,
+    "status_code" INT,
+    "error" TEXT,
+    "expires_at" TIMESTAMPTZ NOT NULL,
+    "updated_at" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT "uid_domain_meta_domain_542221" UNIQUE ("domain", "kind")
+);
+CREATE INDEX IF NOT EXISTS "idx_domain_meta_expires_f91af1" ON "domain_metadata" ("expires_at");
+        CREATE TABLE IF NOT EXISTS "email_outbox" (
+    "id" SERIAL NOT NULL PRIMARY KEY,
+    "message" JSONB NOT NULL,
+    "status" VARCHAR(7) NOT NULL  DEFAULT 'pending',
+    "error" TEXT,
+    "attempts" INT NOT NULL  DEFAULT 0,
+    "run_after" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "started_at" TIMESTAMPTZ,
+    "sent_at" TIMESTAMPTZ,
+    "created_at" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "updated_at" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS "idx_email_outbo_status_9da17e" ON "email_outbox" ("status");
+COMMENT ON COLUMN "email_outbox"."status" IS 'PENDING: pending\nSENDING: sending\nSENT: sent\nDEAD: dead';"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP TABLE IF EXISTS "email_outbox";
+        DROP TABLE IF EXISTS "domain_metadata";
+        DROP TABLE IF EXISTS "tool_popularity";
+        DROP TABLE IF EXISTS "tool_ingestion_jobs";
+        ALTER TABLE "users_tools" DROP COLUMN "created_at";
+        ALTER TABLE "users" DROP COLUMN "profile_version";
+        DROP TABLE IF EXISTS "audio_uploads";
+        DROP INDEX "idx_audio_revie_renditi_8b32fd";
+        DROP INDEX "idx_audio_revie_process_c45e2a";
+        DROP INDEX "idx_audio_revie_blob_ke_210002";
+        ALTER TABLE "audio_reviews" DROP COLUMN "peaks";
+        ALTER TABLE "audio_reviews" DROP COLUMN "duration";
+        ALTER TABLE "audio_reviews" DROP COLUMN "rendition_mime_type";
+        ALTER TABLE "audio_reviews" DROP COLUMN "rendition_size";
+        ALTER TABLE "audio_reviews" DROP COLUMN "rendition_key";
+        ALTER TABLE "audio_reviews" DROP COLUMN "processing_run_after";
+        ALTER TABLE "audio_reviews" DROP COLUMN "processing_started_at";
+        ALTER TABLE "audio_reviews" DROP COLUMN "processing_attempts";
+        ALTER TABLE "audio_reviews" DROP COLUMN "processing_error";
+        ALTER TABLE "audio_reviews" DROP COLUMN "processing_status";
+        ALTER TABLE "audio_reviews" ALTER COLUMN "audio_data" SET NOT NULL;
+        ALTER TABLE "audio_reviews" DROP COLUMN "mime_type";
+        ALTER TABLE "audio_reviews" DROP COLUMN "size";
+        ALTER TABLE "audio_reviews" DROP COLUMN "blob_key";"""
@@ -0,0 +1,40 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    # one tool per domain, compared case-insensitively: the oldest one is kept and gets the memberships,
+    # audio reviews, uploads and ingestion jobs of the others. Popularity is corrected by the reconciler at startup
+    return """
+        CREATE TEMP TABLE "tool_merges" ON COMMIT DROP AS
+SELECT "duplicate_id", "kept_id" FROM (
+    SELECT "id" AS "duplicate_id", FIRST_VALUE("id") OVER (PARTITION BY LOWER("link") ORDER BY "id") AS "kept_id"
+    FROM "tools"
+) AS "ranked"
+WHERE "duplicate_id" <> "kept_id";
+        UPDATE "users" SET "profile_version" = "profile_version" + 1
+WHERE "id" IN (SELECT "users_id" FROM "users_tools" WHERE "tool_id" IN (SELECT "duplicate_id" FROM "tool_merges"));
+        INSERT INTO "users_tools" ("users_id", "tool_id", "created_at")
+SELECT "membership"."users_id", "tool_merges"."kept_id", MIN("membership"."created_at")
+FROM "users_tools" AS "membership"
+JOIN "tool_merges" ON "membership"."tool_id" = "tool_merges"."duplicate_id"
+WHERE NOT EXISTS (
+    SELECT 1 FROM "users_tools" AS "kept"
+    WHERE "kept"."users_id" = "membership"."users_id" AND "kept"."tool_id" = "tool_merges"."kept_id"
+)
+GROUP BY "membership"."users_id", "tool_merges"."kept_id";
+        DELETE FROM "users_tools" WHERE "tool_id" IN (SELECT "duplicate_id" FROM "tool_merges");
+        UPDATE "audio_reviews" SET "tool_id" = "tool_merges"."kept_id"
+FROM "tool_merges" WHERE "audio_reviews"."tool_id" = "tool_merges"."duplicate_id";
+        UPDATE "audio_uploads" SET "tool_id" = "tool_merges"."kept_id"
+FROM "tool_merges" WHERE "audio_uploads"."tool_id" = "tool_merges"."duplicate_id";
+        UPDATE "tool_ingestion_jobs" SET "tool_id" = "tool_merges"."kept_id"
+FROM "tool_merges" WHERE "tool_ingestion_jobs"."tool_id" = "tool_merges"."duplicate_id";
+        DELETE FROM "tool_popularity" WHERE "tool_id" IN (SELECT "duplicate_id" FROM "tool_merges");
+        DELETE FROM "tools" WHERE "id" IN (SELECT "duplicate_id" FROM "tool_merges");
+        UPDATE "tools" SET "link" = LOWER("link") WHERE "link" <> LOWER("link");
+        CREATE UNIQUE INDEX "uid_tools_link_260f31" ON "tools" ("link");"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP INDEX "uid_tools_link_260f31";"""
@@ -1,13 +1,28 @@
 import pydantic
 
+from enum import Enum
+from typing import Optional
 from schemas.tool import Tool
 from schemas.user import UserPrivate
 
 
+class AudioProcessingStatus(str, Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+
 class AudioReview(pydantic.BaseModel):
     id: int
 
     tool: Tool
     user: UserPrivate
 
-    audio_data: bytes
+    size: Optional[int] = None
+    mime_type: Optional[str] = None
+    content_hash: Optional[str] = None
+
+    processing_status: Optional[AudioProcessingStatus] = None
+    duration: Optional[float] = None
+    peaks: Optional[list[float]] = None
@@ -0,0 +1,16 @@
+import pydantic
+
+from uuid import UUID
+from typing import Optional
+
+
+class AudioUploadCreate(pydantic.BaseModel):
+    size: Optional[int] = pydantic.Field(None, gt=0)
+    mime_type: Optional[str] = None
+
+
+class AudioUpload(pydantic.BaseModel):
+    id: UUID
+    offset: int
+    size: Optional[int] = None
+    max_size: int
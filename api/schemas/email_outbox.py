@@ -0,0 +1,8 @@
+from enum import Enum
+
+
+class EmailStatus(str, Enum):
+    PENDING = "pending"
+    SENDING = "sending"
+    SENT = "sent"
+    DEAD = "dead"
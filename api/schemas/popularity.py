@@ -0,0 +1,15 @@
+import pydantic
+
+from typing import Optional
+from schemas.tool import Tool
+
+
+class ToolRanking(pydantic.BaseModel):
+    tool: Tool
+    users_count: int
+    score: float
+
+
+class ToolRankingPage(pydantic.BaseModel):
+    items: list[ToolRanking]
+    next_cursor: Optional[str] = None
@@ -0,0 +1,8 @@
+import pydantic
+
+from schemas.tool import Tool
+
+
+class ToolRecommendation(pydantic.BaseModel):
+    tool: Tool
+    score: float
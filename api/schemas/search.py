@@ -0,0 +1,8 @@
+import pydantic
+
+from schemas.tool import Tool
+
+
+class ToolSearchResult(pydantic.BaseModel):
+    tool: Tool
+    score: float
@@ -0,0 +1,23 @@
+import pydantic
+
+from enum import Enum
+from typing import Optional
+from schemas.tool import Tool
+
+
+class ToolImportStatus(str, Enum):
+    UNRESOLVED = "unresolved"
+    ALREADY_ADDED = "already_added"
+    DUPLICATE = "duplicate"
+    LIMIT_REACHED = "limit_reached"
+    ADDED = "added"
+    FAILED = "failed"
+
+
+class ToolImportItem(pydantic.BaseModel):
+    index: int
+    source: str
+    domain: Optional[str] = None
+    status: ToolImportStatus
+    tool: Optional[Tool] = None
+    error: Optional[str] = None
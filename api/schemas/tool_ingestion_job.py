@@ -0,0 +1,24 @@
+import pydantic
+
+from enum import Enum
+from typing import Optional
+from datetime import datetime
+from schemas.tool import Tool
+
+
+class ToolIngestionJobStatus(str, Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+
+class ToolIngestionJob(pydantic.BaseModel):
+    id: int
+    link: str
+    domain: str
+    status: ToolIngestionJobStatus
+    error: Optional[str] = None
+    tool: Optional[Tool] = None
+    created_at: datetime
+    finished_at: Optional[datetime] = None
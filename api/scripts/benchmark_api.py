@@ -0,0 +1,452 @@
+"""Load scenarios against the whole API, every external service replaced by
+the local stand-ins (scripts/fake_services.py).
+
+    python -m scripts.seed_benchmark_data                       # once, POSTGRES_DB=<name>_bench
+    python -m scripts.benchmark_api --save-baseline benchmark_baseline.json
+    python -m scripts.benchmark_api --baseline benchmark_baseline.json --tolerance 0.15
+
+Starts the stand-ins and `python server.py` (or targets `--api-url`), signs
+in `--concurrency` seeded users through the Google stand-in, then runs each
+scenario for `--duration` seconds with that many closed-loop clients:
+
+    profile_read     GET /auth/users/{url} of random seeded users
+    login            Google sign-in callback, token exchange and ID token check
+    tool_add         POST /tool/ of a new domain, polled until the ingestion is done
+    review_upload    POST /tool/{id}/review of a 20s WAV on a tool of the user
+    review_playback  GET /tool/{id}/review?data=true of seeded reviews, body read
+
+Reports throughput, p50 / p95 / p99 latency, errors and the peak RSS of the
+server processes (Linux), per scenario. With `--baseline`, exits with 1
+when a scenario is slower, serves less, or uses more memory than the
+baseline by more than `--tolerance`.
+"""
+import os
+import sys
+import json
+import time
+import random
+import signal
+import asyncio
+import logging
+import argparse
+import subprocess
+import aiohttp
+import numpy as np
+
+from urllib.parse import urlencode
+from scripts import fake_services
+
+
+SCENARIOS = ["profile_read", "login", "tool_add", "review_upload", "review_playback"]
+
+# compared with the baseline: (metric, higher is better)
+COMPARED_METRICS = [("throughput", True), ("p95_ms", False), ("p99_ms", False), ("peak_rss_mb", False)]
+
+JOB_POLL_INTERVAL = 0.1
+JOB_TIMEOUT = 60
+
+
+class ScenarioError(Exception):
+    pass
+
+
+def _process_tree(pid: int) -> list[int]:
+    children = {}
+
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # the command name can contain spaces, the fields after it can't
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+
+    tree, stack = [], [pid]
+    while stack:
+        current = stack.pop()
+        tree.append(current)
+        stack.extend(children.get(current, []))
+
+    return tree
+
+
+def _rss_bytes(pid: int) -> int:
+    total = 0
+
+    for process in _process_tree(pid):
+        try:
+            with open(f"/proc/{process}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1]) * 1024
+        except OSError:
+            pass
+
+    return total
+
+
+class RSSSampler:
+
+    def __init__(self, pid: int | None):
+        self.pid = pid
+        self.peak = 0
+        self._task = None
+
+    async def _run(self):
+        while True:
+            self.peak = max(self.peak, await asyncio.to_thread(_rss_bytes, self.pid))
+            await asyncio.sleep(0.2)
+
+    def start(self):
+        self.peak = 0
+        if self.pid is not None and os.path.isdir("/proc"):
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> float | None:
+        if self._task is None:
+            return None
+
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+        return self.peak / 1e6
+
+
+async def _wait_ready(url: str, timeout: float):
+    deadline = time.monotonic() + timeout
+
+    async with aiohttp.ClientSession() as session:
+        while time.monotonic() < deadline:
+            try:
+                async with session.get(url) as response:
+                    if response.status == 200:
+                        return
+            except aiohttp.ClientError:
+                pass
+
+            await asyncio.sleep(0.5)
+
+    raise TimeoutError(f"Not ready after {timeout}s: {url}")
+
+
+def _start(command: list[str], env: dict, log_path: str) -> subprocess.Popen:
+    return subprocess.Popen(
+        command,
+        env=env,
+        stdout=open(log_path, "w"),
+        stderr=subprocess.STDOUT,
+        start_new_session=True,
+    )
+
+
+def _stop(process: subprocess.Popen):
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        os.killpg(process.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+async def login(session: aiohttp.ClientSession, api_url: str, code: str) -> str:
+    """The auth cookie of a seeded user, signed in through the Google stand-in."""
+
+    async with session.get(f"{api_url}/auth/callback/google?{urlencode({'code': code})}", allow_redirects=False) as response:
+        await response.read()
+
+        if response.status != 307:
+            raise ScenarioError(f"login answered {response.status}")
+
+        for header in response.headers.getall("Set-Cookie", []):
+            if header.startswith("access_token="):
+                return header.split(";", 1)[0]
+
+    raise ScenarioError("login set no access_token cookie")
+
+
+class Client:
+    """A virtual user: a seeded user, signed in, with its own random stream."""
+
+    def __init__(self, index: int, api_url: str, user: dict, manifest: dict, audio: bytes, run_id: str, seed: int):
+        self.index = index
+        self.api_url = api_url
+        self.user = user
+        self.manifest = manifest
+        self.audio = audio
+        self.run_id = run_id
+        self.rng = random.Random(seed * 10_000 + index)
+        self.cookie = None
+        self.nb_tools_added = 0
+        self.session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=1))
+
+    async def close(self):
+        await self.session.close()
+
+    def _headers(self) -> dict:
+        return {"Cookie": self.cookie} if self.cookie else {}
+
+    async def _expect(self, response: aiohttp.ClientResponse, *statuses: int) -> bytes:
+        body = await response.read()
+
+        if response.status not in statuses:
+            raise ScenarioError(f"{response.method} {response.url.path} answered {response.status}")
+
+        return body
+
+    async def profile_read(self):
+        user = self.rng.choice(self.manifest["users"])
+
+        async with self.session.get(f"{self.api_url}/auth/users/{user['url']}") as response:
+            await self._expect(response, 200)
+
+    async def login(self):
+        await login(self.session, self.api_url, self.rng.choice(self.manifest["users"])["code"])
+
+    async def tool_add(self):
+        self.nb_tools_added += 1
+        link = f"https://bench-{self.run_id}-{self.index}-{self.nb_tools_added}.test"
+
+        async with self.session.post(f"{self.api_url}/tool/", json={"link": link}, headers=self._headers()) as response:
+            job = json.loads(await self._expect(response, 202))
+
+        deadline = time.monotonic() + JOB_TIMEOUT
+        while job["status"] not in ("done", "failed"):
+            if time.monotonic() > deadline:
+                raise ScenarioError(f"ingestion job {job['id']} not done after {JOB_TIMEOUT}s")
+
+            await asyncio.sleep(JOB_POLL_INTERVAL)
+
+            async with self.session.get(f"{self.api_url}/tool/jobs/{job['id']}", headers=self._headers()) as response:
+                job = json.loads(await self._expect(response, 200))
+
+        if job["status"] == "failed":
+            raise ScenarioError(f"ingestion job failed: {job.get('error')}")
+
+    async def review_upload(self):
+        tool_id = self.rng.choice(self.user["tools"])
+
+        form = aiohttp.FormData()
+        form.add_field("audio", self.audio, filename="review.wav", content_type="audio/wav")
+
+        async with self.session.post(f"{self.api_url}/tool/{tool_id}/review", data=form, headers=self._headers()) as response:
+            await self._expect(response, 200)
+
+    async def review_playback(self):
+        review = self.rng.choice(self.manifest["reviews"])
+        url = f"{self.api_url}/tool/{review['tool_id']}/review?user_id={review['user_id']}&data=true"
+
+        async with self.session.get(url) as response:
+            await self._expect(response, 200)
+
+
+async def run_scenario(name: str, clients: list[Client], duration: float, sampler: RSSSampler) -> dict:
+    durations, errors = [], {}
+    deadline = time.monotonic() + duration
+
+    async def loop(client: Client):
+        operation = getattr(client, name)
+
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            try:
+                await operation()
+                durations.append(time.perf_counter() - start)
+            except (ScenarioError, aiohttp.ClientError, asyncio.TimeoutError) as e:
+                message = str(e) or type(e).__name__
+                errors[message] = errors.get(message, 0) + 1
+
+    sampler.start()
+    start = time.perf_counter()
+    await asyncio.gather(*[loop(client) for client in clients])
+    elapsed = time.perf_counter() - start
+    peak_rss = await sampler.stop()
+
+    def percentile(p: float) -> float | None:
+        return round(float(np.percentile(durations, p)) * 1000, 2) if durations else None
+
+    return {
+        "requests": len(durations),
+        "errors": sum(errors.values()),
+        "error_messages": dict(sorted(errors.items(), key=lambda item: -item[1])[:5]),
+        "throughput": round(len(durations) / elapsed, 2),
+        "p50_ms": percentile(50),
+        "p95_ms": percentile(95),
+        "p99_ms": percentile(99),
+        "peak_rss_mb": round(peak_rss, 1) if peak_rss is not None else None,
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    regressions = []
+
+    for scenario, result in results.items():
+        reference = baseline.get("scenarios", {}).get(scenario)
+        if reference is None:
+            continue
+
+        for metric, higher_is_better in COMPARED_METRICS:
+            value, expected = result.get(metric), reference.get(metric)
+            if value is None or not expected:
+                continue
+
+            change = (value - expected) / expected
+            if (higher_is_better and change < -tolerance) or (not higher_is_better and change > tolerance):
+                regressions.append(f"{scenario}.{metric}: {expected} -> {value} ({change:+.0%})")
+
+    return regressions
+
+
+def _log_results(results: dict):
+    logging.info(f"{'scenario':<16} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7} {'peak RSS MB':>12}")
+
+    for scenario, result in results.items():
+        logging.info(
+            f"{scenario:<16} {result['throughput']:>8} {result['p50_ms'] or '-':>9} {result['p95_ms'] or '-':>9} "
+            f"{result['p99_ms'] or '-':>9} {result['errors']:>7} {result['peak_rss_mb'] or '-':>12}"
+        )
+
+        if result["error_messages"]:
+            logging.warning(f"{scenario} errors: {result['error_messages']}")
+
+
+async def main(args):
+    with open(args.manifest) as f:
+        manifest = json.load(f)
+
+    processes = []
+    fakes_url = f"http://127.0.0.1:{args.fakes_port}"
+    api_url = args.api_url
+    server_pid = None
+    clients = []
+
+    try:
+        if api_url is None:
+            processes.append(_start(
+                [sys.executable, "-m", "scripts.fake_services", "--port", str(args.fakes_port), "--seed", str(args.seed),
+                 "--latency", args.latency, "--error-rate", args.error_rate],
+                env=os.environ.copy(),
+                log_path=os.path.join(args.log_dir, "fake_services.log"),
+            ))
+            await _wait_ready(f"{fakes_url}/health", timeout=30)
+
+            env = {
+                "JWT_SECRET_KEY": "benchmark",
+                "APP_URL": "http://127.0.0.1:3000",
+                "BLOB_STORAGE_BACKEND": "local",
+                **os.environ,
+                **fake_services.service_env(fakes_url),
+                "HOST": "127.0.0.1",
+                "PORT": str(args.port),
+                # the scenarios add tools without ever removing them
+                "MAX_NB_TOOLS": "100000",
+            }
+            if args.workers:
+                env["WEB_CONCURRENCY"] = str(args.workers)
+
+            server = _start([sys.executable, "server.py"], env=env, log_path=os.path.join(args.log_dir, "server.log"))
+            processes.append(server)
+            server_pid = server.pid
+
+            api_url = f"http://127.0.0.1:{args.port}"
+            await _wait_ready(f"{api_url}/tool/popular", timeout=args.startup_timeout)
+
+        audio = fake_services.generate_audio(np.random.default_rng(args.seed), duration=20)
+        run_id = f"{int(time.time()):x}"
+        users = random.Random(args.seed).sample(manifest["users"], k=min(args.concurrency, len(manifest["users"])))
+
+        for index, user in enumerate(users):
+            client = Client(index, api_url, user, manifest, audio, run_id=run_id, seed=args.seed)
+            clients.append(client)
+            client.cookie = await login(client.session, api_url, user["code"])
+
+        sampler = RSSSampler(server_pid)
+        results = {}
+
+        for scenario in args.scenarios:
+            logging.info(f"Running {scenario} for {args.duration}s with {len(clients)} clients")
+            results[scenario] = await run_scenario(scenario, clients, duration=args.duration, sampler=sampler)
+
+    finally:
+        for client in clients:
+            await client.close()
+        for process in reversed(processes):
+            _stop(process)
+
+    _log_results(results)
+
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "settings": {
+            key: getattr(args, key)
+            for key in ("concurrency", "duration", "workers", "latency", "error_rate", "seed")
+        },
+        "manifest": {"users": len(manifest["users"]), "reviews": len(manifest["reviews"])},
+        "scenarios": results,
+    }
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        logging.info(f"Baseline saved to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+        if baseline.get("settings") != report["settings"]:
+            logging.warning(f"Settings differ from the baseline: {baseline.get('settings')} != {report['settings']}")
+
+        regressions = compare(results, baseline, tolerance=args.tolerance)
+
+        if regressions:
+            for regression in regressions:
+                logging.error(f"Regression: {regression}")
+            sys.exit(1)
+
+        logging.info(f"No regression against {args.baseline} (tolerance {args.tolerance:.0%})")
+
+
+def _scenarios(value: str) -> list[str]:
+    scenarios = [scenario.strip() for scenario in value.split(",") if scenario.strip()]
+
+    for scenario in scenarios:
+        if scenario not in SCENARIOS:
+            raise argparse.ArgumentTypeError(f"Unknown scenario {scenario!r}, expected some of {SCENARIOS}")
+
+    return scenarios
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Load scenarios against the API with local stand-ins for the external services")
+    parser.add_argument("--scenarios", type=_scenarios, default=SCENARIOS, help=f"comma separated, among {','.join(SCENARIOS)}")
+    parser.add_argument("--manifest", default="benchmark_data.json", help="written by scripts.seed_benchmark_data")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=20, help="seconds per scenario")
+    parser.add_argument("--workers", type=int, default=None, help="server workers, one per CPU by default")
+    parser.add_argument("--latency", default="", help="stand-in latencies, e.g. openai=0.8,jina=0.4")
+    parser.add_argument("--error-rate", default="", help="stand-in error rates, e.g. openai=0.05")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--api-url", default=None, help="target a running API (with its own stand-ins) instead of starting one")
+    parser.add_argument("--port", type=int, default=8200)
+    parser.add_argument("--fakes-port", type=int, default=8030)
+    parser.add_argument("--startup-timeout", type=float, default=120)
+    parser.add_argument("--log-dir", default=".", help="where the stand-ins and server logs go")
+    parser.add_argument("--output", default=None, help="write the results as JSON")
+    parser.add_argument("--save-baseline", default=None)
+    parser.add_argument("--baseline", default=None)
+    parser.add_argument("--tolerance", type=float, default=0.15)
+
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,104 @@
+"""Build time, memory and query latency of the recommendation index, on
+synthetic memberships. Needs no database.
+
+    python -m scripts.benchmark_recommendations
+    python -m scripts.benchmark_recommendations --users 1000 10000 100000 --tools 20000
+
+Tool popularity follows a Zipf law, every user has between 1 and
+MAX_NB_TOOLS tools.
+"""
+import os
+import time
+import logging
+import argparse
+import tracemalloc
+import numpy as np
+
+from services.recommendation_index import RecommendationIndex
+
+
+def generate_memberships(nb_users: int, nb_tools: int, max_tools: int, seed: int) -> tuple[np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(seed)
+
+    tools_per_user = rng.integers(1, max_tools + 1, size=nb_users)
+    user_ids = np.repeat(np.arange(nb_users), tools_per_user)
+    tool_ids = (rng.zipf(1.3, size=len(user_ids)) - 1) % nb_tools
+
+    return user_ids, tool_ids
+
+
+def _percentile_ms(durations: list[float], percentile: float) -> float:
+    return float(np.percentile(durations, percentile)) * 1000
+
+
+def benchmark(nb_users: int, nb_tools: int, max_tools: int, top_k: int, nb_queries: int, seed: int) -> dict:
+    user_ids, tool_ids = generate_memberships(nb_users, nb_tools, max_tools, seed)
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    index = RecommendationIndex.build(user_ids, tool_ids, top_k=top_k)
+    build_time = time.perf_counter() - start
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    rng = np.random.default_rng(seed + 1)
+    queries = list(zip(rng.choice(tool_ids, nb_queries).tolist(), rng.integers(0, nb_users, nb_queries).tolist()))
+    similar, recommend, updates, similar_after_update = [], [], [], []
+
+    for tool_id, user_id in queries:
+        start = time.perf_counter()
+        index.similar(tool_id)
+        similar.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        index.recommend(user_id, limit=10)
+        recommend.append(time.perf_counter() - start)
+
+    # worst case: every read recomputes the top-K the previous write made dirty
+    for tool_id, user_id in queries:
+        start = time.perf_counter()
+        index.add(user_id, tool_id)
+        updates.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        index.similar(tool_id)
+        similar_after_update.append(time.perf_counter() - start)
+
+    return {
+        "users": nb_users,
+        "memberships": len(user_ids),
+        "build_s": round(build_time, 2),
+        "retained_mb": round(retained / 2 ** 20, 1),
+        "peak_mb": round(peak / 2 ** 20, 1),
+        "update_p99_ms": round(_percentile_ms(updates, 99), 3),
+        "similar_p99_ms": round(_percentile_ms(similar, 99), 3),
+        "recommend_p99_ms": round(_percentile_ms(recommend, 99), 3),
+        "similar_after_update_p99_ms": round(_percentile_ms(similar_after_update, 99), 3),
+    }
+
+
+def main(args):
+    for nb_users in args.users:
+        result = benchmark(
+            nb_users=nb_users,
+            nb_tools=args.tools,
+            max_tools=args.max_tools,
+            top_k=args.top_k,
+            nb_queries=args.queries,
+            seed=args.seed,
+        )
+        logging.info(" ".join(f"{key}={value}" for key, value in result.items()))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Benchmark the recommendation index on synthetic data")
+    parser.add_argument("--users", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--tools", type=int, default=10_000)
+    parser.add_argument("--max-tools", type=int, default=int(os.getenv("MAX_NB_TOOLS", "10")))
+    parser.add_argument("--top-k", type=int, default=50)
+    parser.add_argument("--queries", type=int, default=1_000)
+    parser.add_argument("--seed", type=int, default=0)
+
+    main(parser.parse_args())
@@ -0,0 +1,114 @@
+"""Latency of the tool search index (services/search_index.py) on a
+synthetic catalog. Needs no database.
+
+    python -m scripts.benchmark_search
+    python -m scripts.benchmark_search --tools 100000 --queries 5000 --budget-ms 20
+
+Queries are prefixes of existing names, misspelled names, domains and
+categories, as typed in a search box. Exits with 1 when the p99 is over
+the budget.
+"""
+import sys
+import time
+import string
+import logging
+import argparse
+import numpy as np
+
+from services.search_index import SearchIndex
+
+
+CATEGORIES = [
+    "front-end framework", "programming language", "database system", "web server",
+    "message queue", "ci/cd platform", "monitoring tool", "code editor", "orm",
+    "testing framework", "cloud provider", "container runtime", "design tool",
+    "project management", "static site generator", "search engine", "cache",
+]
+
+TLDS = ["com", "io", "dev", "org", "app", "sh"]
+
+
+def _word(rng: np.random.Generator) -> str:
+    return "".join(rng.choice(list(string.ascii_lowercase), size=rng.integers(3, 10)))
+
+
+def generate_tools(nb_tools: int, seed: int) -> list[dict]:
+    rng = np.random.default_rng(seed)
+    tools = []
+
+    for tool_id in range(1, nb_tools + 1):
+        name = " ".join(_word(rng) for _ in range(rng.integers(1, 3)))
+        tools.append({
+            "id": tool_id,
+            "name": name.title(),
+            "category": CATEGORIES[rng.integers(len(CATEGORIES))],
+            "link": f"{name.replace(' ', '')}.{TLDS[rng.integers(len(TLDS))]}",
+        })
+
+    return tools
+
+
+def generate_queries(tools: list[dict], nb_queries: int, seed: int) -> list[str]:
+    rng = np.random.default_rng(seed)
+    queries = []
+
+    for _ in range(nb_queries):
+        tool = tools[rng.integers(len(tools))]
+        kind = rng.integers(4)
+
+        if kind == 0:
+            # typing, one more letter at a time
+            queries.append(tool["name"][:rng.integers(1, len(tool["name"]) + 1)])
+        elif kind == 1:
+            # one letter swapped
+            name = list(tool["name"].lower())
+            i = rng.integers(len(name))
+            name[i] = rng.choice(list(string.ascii_lowercase))
+            queries.append("".join(name))
+        elif kind == 2:
+            queries.append(tool["link"])
+        else:
+            queries.append(tool["category"][:rng.integers(3, len(tool["category"]) + 1)])
+
+    return queries
+
+
+def main(args):
+    tools = generate_tools(args.tools, seed=args.seed)
+
+    start = time.perf_counter()
+    index = SearchIndex.build(tools)
+    logging.info(f"Built index of {len(tools)} tools in {time.perf_counter() - start:.2f}s")
+
+    # tools created after the build go through the unfrozen path
+    for tool in generate_tools(args.recent, seed=args.seed + 1):
+        index.add({**tool, "id": tool["id"] + args.tools})
+
+    queries = generate_queries(tools, args.queries, seed=args.seed + 2)
+    durations = []
+
+    for query in queries:
+        start = time.perf_counter()
+        index.search(query, limit=args.limit)
+        durations.append(time.perf_counter() - start)
+
+    p50, p99, worst = (float(np.percentile(durations, p)) * 1000 for p in (50, 99, 100))
+    logging.info(f"{len(queries)} queries: p50={p50:.2f}ms p99={p99:.2f}ms max={worst:.2f}ms budget={args.budget_ms}ms")
+
+    if p99 > args.budget_ms:
+        logging.error("p99 over budget")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Benchmark the tool search index on a synthetic catalog")
+    parser.add_argument("--tools", type=int, default=100_000)
+    parser.add_argument("--recent", type=int, default=1_000, help="tools indexed after the build")
+    parser.add_argument("--queries", type=int, default=5_000)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--budget-ms", type=float, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+
+    main(parser.parse_args())
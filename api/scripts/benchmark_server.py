@@ -0,0 +1,129 @@
+"""Requests per second of the API under the previous launch command
+(single process, --reload, debug) and under server.py.
+
+    python -m scripts.benchmark_server
+    python -m scripts.benchmark_server --path "/tool/search?q=rea" --concurrency 64 --duration 20
+
+Each command is started on its own port with the current environment (the
+database must be reachable, as for the app itself), warmed up, then loaded
+for `--duration` seconds by `--concurrency` keep-alive clients. Reports
+requests per second, p50 / p99 latency and errors of each command.
+"""
+import os
+import sys
+import time
+import signal
+import asyncio
+import logging
+import argparse
+import subprocess
+import aiohttp
+import numpy as np
+
+
+COMMANDS = {
+    "uvicorn --reload": ["uvicorn", "main:app", "--host", "127.0.0.1", "--port", "{port}", "--reload"],
+    "server.py": [sys.executable, "server.py"],
+}
+
+
+async def _wait_ready(url: str, timeout: float):
+    deadline = time.monotonic() + timeout
+
+    async with aiohttp.ClientSession() as session:
+        while time.monotonic() < deadline:
+            try:
+                async with session.get(url) as response:
+                    if response.status < 500:
+                        return
+            except aiohttp.ClientError:
+                pass
+
+            await asyncio.sleep(0.5)
+
+    raise TimeoutError(f"Server not ready after {timeout}s: {url}")
+
+
+async def _load(url: str, concurrency: int, duration: float) -> tuple[list[float], int]:
+    durations, errors = [], 0
+    deadline = time.monotonic() + duration
+
+    async def client(session: aiohttp.ClientSession):
+        nonlocal errors
+
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            try:
+                async with session.get(url) as response:
+                    await response.read()
+                    if response.status >= 400:
+                        errors += 1
+            except aiohttp.ClientError:
+                errors += 1
+                continue
+
+            durations.append(time.perf_counter() - start)
+
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        await asyncio.gather(*[client(session) for _ in range(concurrency)])
+
+    return durations, errors
+
+
+async def benchmark(name: str, command: list[str], port: int, args) -> dict:
+    env = {**os.environ, "PORT": str(port), "HOST": "127.0.0.1"}
+    if name != "server.py":
+        env["APP_DEBUG"] = "1"
+
+    process = subprocess.Popen(
+        [part.format(port=port) for part in command],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+
+    url = f"http://127.0.0.1:{port}{args.path}"
+
+    try:
+        await _wait_ready(url, timeout=args.startup_timeout)
+        await _load(url, concurrency=args.concurrency, duration=args.warmup)
+        durations, errors = await _load(url, concurrency=args.concurrency, duration=args.duration)
+    finally:
+        os.killpg(process.pid, signal.SIGTERM)
+        process.wait()
+
+    return {
+        "rps": len(durations) / args.duration,
+        "p50": float(np.percentile(durations, 50)) * 1000 if durations else float("nan"),
+        "p99": float(np.percentile(durations, 99)) * 1000 if durations else float("nan"),
+        "errors": errors,
+    }
+
+
+async def main(args):
+    results = {}
+
+    for i, (name, command) in enumerate(COMMANDS.items()):
+        results[name] = await benchmark(name, command, port=args.port + i, args=args)
+        result = results[name]
+        logging.info(f"{name}: {result['rps']:.0f} req/s p50={result['p50']:.1f}ms p99={result['p99']:.1f}ms errors={result['errors']}")
+
+    baseline, candidate = results.values()
+    if baseline["rps"]:
+        logging.info(f"server.py serves {candidate['rps'] / baseline['rps']:.2f}x the requests per second")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Compare the requests per second of the launch commands")
+    parser.add_argument("--path", default="/tool/popular?limit=20")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--warmup", type=float, default=2)
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--startup-timeout", type=float, default=60)
+
+    asyncio.run(main(parser.parse_args()))
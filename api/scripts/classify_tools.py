@@ -0,0 +1,84 @@
+"""(Re-)classify the tools table in bulk.
+
+    python -m scripts.classify_tools                  # packed requests, every tool
+    python -m scripts.classify_tools --only-unknown   # only tools the single path couldn't classify
+    python -m scripts.classify_tools --offline        # submit an OpenAI batch job, prints its id
+    python -m scripts.classify_tools --collect <id>   # write back the results of a finished batch job
+"""
+import time
+import asyncio
+import logging
+import argparse
+
+from tortoise import Tortoise
+from database.database import init_db, upgrade_schema
+from database.models import Tool as ToolModel
+from services import classification_service, http_client, tool_service
+
+
+async def main(args):
+    await init_db()
+    await http_client.open_session()
+
+    try:
+        await upgrade_schema()
+
+        if args.collect:
+            results = await classification_service.collect_offline_batch(args.collect)
+
+            if results is None:
+                logging.info(f"Batch {args.collect} is still running, try again later")
+                return
+
+            updated = await classification_service.save_results(results)
+            logging.info(f"Collected {len(results)} results from batch {args.collect}, {updated} tools updated")
+            return
+
+        query = ToolModel.all().order_by("id")
+
+        if args.only_unknown:
+            query = query.filter(category="Unknown")
+
+        if args.limit:
+            query = query.limit(args.limit)
+
+        tools = await query
+        start = time.perf_counter()
+
+        contents = await classification_service.fetch_contents(tools, concurrency=args.concurrency)
+        logging.info(f"Fetched content of {len(contents)}/{len(tools)} tools in {time.perf_counter() - start:.1f}s")
+
+        if args.offline:
+            batch_id = await classification_service.submit_offline_batch(contents)
+            logging.info(f"Submitted batch {batch_id}, collect it with `python -m scripts.classify_tools --collect {batch_id}`")
+            return
+
+        results = await classification_service.classify_many(
+            contents,
+            batch_size=args.batch_size,
+            concurrency=args.concurrency,
+        )
+        updated = await classification_service.save_results(results)
+
+        # failed batches and sites without content have no result
+        elapsed = time.perf_counter() - start
+        logging.info(f"Classified {len(results)}/{len(tools)} tools in {elapsed:.1f}s ({60 * len(results) / elapsed:.0f} tools/min), {updated} updated")
+
+    finally:
+        await http_client.close_session()
+        await tool_service.openai_client.close()
+        await Tortoise.close_connections()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Classify the tools table in bulk")
+    parser.add_argument("--only-unknown", action="store_true", help="only tools categorized as Unknown")
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--batch-size", type=int, default=classification_service.CLASSIFICATION_BATCH_SIZE)
+    parser.add_argument("--concurrency", type=int, default=classification_service.CLASSIFICATION_CONCURRENCY)
+    parser.add_argument("--offline", action="store_true", help="submit an OpenAI batch job instead of classifying now")
+    parser.add_argument("--collect", metavar="BATCH_ID", help="save the results of a finished batch job")
+
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,129 @@
+"""Local stand-in for the Google OpenID Connect endpoints used by the
+sign-in callback.
+
+    python -m scripts.fake_google [--port 8026] [--keys-max-age 3600] [--latency 0.1]
+    GOOGLE_DISCOVERY_URL=http://localhost:8026/.well-known/openid-configuration uvicorn main:app
+
+Serves the discovery document, the signing keys (JWKS), the token endpoint
+and userinfo. The token endpoint accepts any code: the user is derived from
+it, so `code=alice` signs in alice@example.com. ID tokens are signed RS256
+with a key generated at startup, POST /rotate replaces it to exercise the
+key rotation path.
+"""
+import time
+import uuid
+import json
+import asyncio
+import logging
+import argparse
+import jwt
+
+from aiohttp import web
+from jwt.algorithms import RSAAlgorithm
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+
+def _generate_key() -> tuple[str, rsa.RSAPrivateKey]:
+    return uuid.uuid4().hex, rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+
+def create_app(base_url: str, keys_max_age: int, latency: float) -> web.Application:
+    keys = [_generate_key()]
+    users = {}
+
+    def _headers(max_age: int) -> dict:
+        return {"Cache-Control": f"public, max-age={max_age}, must-revalidate, no-transform"}
+
+    async def discovery(request: web.Request) -> web.Response:
+        await asyncio.sleep(latency)
+
+        return web.json_response({
+            "issuer": base_url,
+            "authorization_endpoint": f"{base_url}/o/oauth2/v2/auth",
+            "token_endpoint": f"{base_url}/token",
+            "userinfo_endpoint": f"{base_url}/v1/userinfo",
+            "jwks_uri": f"{base_url}/oauth2/v3/certs",
+            "id_token_signing_alg_values_supported": ["RS256"],
+        }, headers=_headers(keys_max_age))
+
+    async def certs(request: web.Request) -> web.Response:
+        await asyncio.sleep(latency)
+
+        jwks = []
+        for kid, private_key in keys:
+            jwk = json.loads(RSAAlgorithm.to_jwk(private_key.public_key()))
+            jwks.append({**jwk, "kid": kid, "alg": "RS256", "use": "sig"})
+
+        return web.json_response({"keys": jwks}, headers=_headers(keys_max_age))
+
+    async def token(request: web.Request) -> web.Response:
+        await asyncio.sleep(latency)
+
+        form = await request.post()
+        code = form.get("code") or form.get("refresh_token")
+
+        if not code:
+            return web.json_response({"error": "invalid_grant"}, status=400)
+
+        name = str(code).split("-")[0].capitalize()
+        user = {"sub": name.lower(), "email": f"{name.lower()}@example.com", "name": name, "picture": f"{base_url}/{name.lower()}.png"}
+        access_token = uuid.uuid4().hex
+        users[access_token] = user
+
+        now = int(time.time())
+        kid, private_key = keys[-1]
+        id_token = jwt.encode(
+            {**user, "iss": base_url, "aud": form.get("client_id", ""), "iat": now, "exp": now + 3600, "email_verified": True},
+            private_key,
+            algorithm="RS256",
+            headers={"kid": kid},
+        )
+
+        logging.info(f"Issued tokens for {user['email']} signed with {kid=}")
+
+        return web.json_response({
+            "access_token": access_token,
+            "expires_in": 3599,
+            "token_type": "Bearer",
+            "id_token": id_token,
+        })
+
+    async def userinfo(request: web.Request) -> web.Response:
+        await asyncio.sleep(latency)
+
+        user = users.get(request.headers.get("Authorization", "").removeprefix("Bearer "))
+
+        if user is None:
+            return web.json_response({"error": "invalid_token"}, status=401)
+
+        return web.json_response({**user, "id": user["sub"], "verified_email": True})
+
+    async def rotate(request: web.Request) -> web.Response:
+        keys.append(_generate_key())
+        del keys[:-2]
+
+        return web.json_response({"kids": [kid for kid, _ in keys]})
+
+    app = web.Application()
+    app.router.add_get("/.well-known/openid-configuration", discovery)
+    app.router.add_get("/oauth2/v3/certs", certs)
+    app.router.add_post("/token", token)
+    app.router.add_get("/v1/userinfo", userinfo)
+    app.router.add_post("/rotate", rotate)
+
+    return app
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Local stand-in for the Google OpenID Connect endpoints")
+    parser.add_argument("--port", type=int, default=8026)
+    parser.add_argument("--keys-max-age", type=int, default=3600, help="Cache-Control max-age of the discovery document and the keys")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every call")
+    args = parser.parse_args()
+
+    web.run_app(
+        create_app(base_url=f"http://localhost:{args.port}", keys_max_age=args.keys_max_age, latency=args.latency),
+        port=args.port,
+    )
@@ -0,0 +1,74 @@
+"""Local stand-in for the Mailjet v3.1 send API.
+
+    python -m scripts.fake_mailjet [--port 8025] [--fail-rate 0.2] [--latency 0.1]
+    MAILJET_API_URL=http://localhost:8025/v3.1/send uvicorn main:app
+
+Answers like Mailjet does: one result per message, a 400 when some of them
+were rejected. Messages sent to an address containing "invalid" are
+rejected, `--fail-rate` of the calls get a 503 to exercise the retries.
+Accepted messages are logged, and listed on GET /v3.1/messages.
+"""
+import random
+import asyncio
+import logging
+import argparse
+
+from aiohttp import web
+
+
+def _result(message: dict) -> dict:
+    recipients = [recipient.get("Email", "") for recipient in message.get("To", [])]
+
+    if not recipients or any("invalid" in email for email in recipients):
+        return {
+            "Status": "error",
+            "Errors": [{"ErrorCode": "mj-0013", "StatusCode": 400, "ErrorMessage": f"\"{recipients}\" is an invalid email address."}],
+        }
+
+    return {
+        "Status": "success",
+        "To": [{"Email": email, "MessageID": random.getrandbits(48)} for email in recipients],
+    }
+
+
+def create_app(fail_rate: float, latency: float) -> web.Application:
+    sent = []
+
+    async def send(request: web.Request) -> web.Response:
+        await asyncio.sleep(latency)
+
+        if random.random() < fail_rate:
+            return web.json_response({"ErrorMessage": "Service unavailable"}, status=503)
+
+        messages = (await request.json()).get("Messages", [])
+        results = [_result(message) for message in messages]
+
+        for message, result in zip(messages, results):
+            if result["Status"] == "success":
+                sent.append(message)
+                logging.info(f"Sent: {message.get('Subject')!r} to {[recipient['Email'] for recipient in message.get('To', [])]}")
+
+        status = 200 if all(result["Status"] == "success" for result in results) else 400
+
+        return web.json_response({"Messages": results}, status=status)
+
+    async def list_messages(request: web.Request) -> web.Response:
+        return web.json_response(sent)
+
+    app = web.Application()
+    app.router.add_post("/v3.1/send", send)
+    app.router.add_get("/v3.1/messages", list_messages)
+
+    return app
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Local stand-in for the Mailjet v3.1 send API")
+    parser.add_argument("--port", type=int, default=8025)
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="share of the calls answered with a 503")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every call")
+    args = parser.parse_args()
+
+    web.run_app(create_app(fail_rate=args.fail_rate, latency=args.latency), port=args.port)
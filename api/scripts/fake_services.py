@@ -0,0 +1,227 @@
+"""Local stand-ins for every external service the API calls, on one port.
+
+    python -m scripts.fake_services [--port 8030] [--latency openai=0.8,jina=0.4] [--error-rate openai=0.05] [--print-env]
+
+    /sites/{domain}               the tool websites (reachability probe)
+    /jina/{domain}                r.jina.ai reader, markdown of a made up product page
+    /openai/v1/chat/completions   OpenAI, classifies the product page above
+    /favicons/s2/favicons         Google favicons
+    /mailjet/...                  Mailjet send API (scripts/fake_mailjet.py)
+    /google/...                   Google OpenID Connect (scripts/fake_google.py)
+
+Every service answers after its latency (DEFAULT_LATENCY unless overridden,
+jittered by +-50%), and with a 503 for its share of `--error-rate`. The
+answers only depend on the domain, so runs are reproducible.
+`service_env()` / `--print-env` give the environment pointing the API here.
+"""
+import io
+import re
+import time
+import wave
+import random
+import asyncio
+import hashlib
+import logging
+import argparse
+import numpy as np
+
+from aiohttp import web
+from scripts import fake_google, fake_mailjet
+
+
+# seconds, roughly what the real services take
+DEFAULT_LATENCY = {
+    "sites": 0.15,
+    "jina": 0.8,
+    "openai": 0.9,
+    "favicons": 0.05,
+    "mailjet": 0.15,
+    "google": 0.08,
+}
+
+CATEGORIES = [
+    "front-end framework", "programming language", "database system", "web server",
+    "message queue", "monitoring tool", "code editor", "testing framework", "design tool",
+]
+
+_TITLE = re.compile(r"^Title: (.+)$", re.MULTILINE)
+
+# 1x1 transparent PNG, padded to the size of a real 256px favicon
+FAVICON = bytes.fromhex(
+    "89504e470d0a1a0a0000000d4948445200000001000000010806000000"
+    "1f15c4890000000d49444154789c6360000002000154a24f5d0000000049454e44ae426082"
+) + bytes(4096)
+
+# of the generated audio reviews
+SAMPLE_RATE = 16_000
+
+
+def service_env(base_url: str) -> dict:
+    return {
+        "TOOL_WEBSITE_URL": f"{base_url}/sites/{{domain}}",
+        "JINA_READER_URL": f"{base_url}/jina",
+        "FAVICON_API_URL": f"{base_url}/favicons/s2/favicons",
+        "OPENAI_BASE_URL": f"{base_url}/openai/v1",
+        "OPENAI_API_KEY": "fake",
+        "MAILJET_API_URL": f"{base_url}/mailjet/v3.1/send",
+        "GOOGLE_DISCOVERY_URL": f"{base_url}/google/.well-known/openid-configuration",
+        "GOOGLE_CLIENT_ID": "fake",
+        "GOOGLE_CLIENT_SECRET": "fake",
+        "GOOGLE_REDIRECT_URI": f"{base_url}/google/callback",
+    }
+
+
+def generate_audio(rng: np.random.Generator, duration: float) -> bytes:
+    """A voice-like signal: a few harmonics under noise, with pauses."""
+
+    t = np.arange(int(duration * SAMPLE_RATE)) / SAMPLE_RATE
+    pitch = rng.uniform(90, 220)
+    signal = sum(np.sin(2 * np.pi * pitch * k * t) / k for k in range(1, 5))
+    envelope = (np.sin(2 * np.pi * rng.uniform(0.2, 0.6) * t) > -0.3).astype(np.float32)
+    samples = (signal * envelope + rng.normal(0, 0.05, len(t))) * 6000
+
+    output = io.BytesIO()
+    with wave.open(output, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLE_RATE)
+        wav.writeframes(samples.astype(np.int16).tobytes())
+
+    return output.getvalue()
+
+
+def _parse_rates(value: str) -> dict[str, float]:
+    rates = {}
+
+    for pair in filter(None, value.split(",")):
+        service, rate = pair.split("=")
+        if service not in DEFAULT_LATENCY:
+            raise argparse.ArgumentTypeError(f"Unknown service {service!r}, expected one of {list(DEFAULT_LATENCY)}")
+        rates[service] = float(rate)
+
+    return rates
+
+
+def _product(domain: str) -> tuple[str, str]:
+    digest = hashlib.sha256(domain.encode()).digest()
+    name = domain.split(".")[0].replace("-", " ").title()
+
+    return name, CATEGORIES[digest[0] % len(CATEGORIES)]
+
+
+def _page(domain: str) -> str:
+    name, category = _product(domain)
+    rng = random.Random(domain)
+    words = ["fast", "simple", "open source", "scalable", "typed", "modern", "secure", "lightweight", "extensible"]
+
+    paragraphs = [
+        " ".join(f"{name} is a {rng.choice(words)} {category}." for _ in range(rng.randint(5, 15)))
+        for _ in range(rng.randint(20, 60))
+    ]
+
+    return f"Title: {name}\n\nURL Source: https://{domain}\n\nMarkdown Content:\n# {name}\n\n" + "\n\n".join(paragraphs)
+
+
+def _chaos(service: str, latency: float, error_rate: float, rng: random.Random):
+
+    @web.middleware
+    async def middleware(request: web.Request, handler):
+        await asyncio.sleep(latency * rng.uniform(0.5, 1.5))
+
+        if rng.random() < error_rate:
+            return web.json_response({"error": f"{service} unavailable"}, status=503)
+
+        return await handler(request)
+
+    return middleware
+
+
+async def site(request: web.Request) -> web.Response:
+    name, _ = _product(request.match_info["domain"])
+    return web.Response(text=f"<html><head><title>{name}</title></head><body><h1>{name}</h1></body></html>", content_type="text/html")
+
+
+async def jina(request: web.Request) -> web.Response:
+    return web.Response(text=_page(request.match_info["domain"]), content_type="text/plain")
+
+
+async def chat_completion(request: web.Request) -> web.Response:
+    body = await request.json()
+    prompt = body["messages"][-1]["content"]
+
+    match = _TITLE.search(prompt)
+    if match:
+        name = match.group(1)
+        _, category = _product(name.lower().replace(" ", "-"))
+        content = f"<name>{name}</name>\n<category>{category}</category>"
+    else:
+        content = "<name>Unknown</name>\n<category>Unknown</category>"
+
+    return web.json_response({
+        "id": f"chatcmpl-{random.getrandbits(64):x}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "gpt-4o-mini"),
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": 20, "total_tokens": len(prompt) // 4 + 20},
+    })
+
+
+async def health(request: web.Request) -> web.Response:
+    return web.Response(text="ok")
+
+
+async def favicon(request: web.Request) -> web.Response:
+    return web.Response(body=FAVICON, content_type="image/png")
+
+
+def create_app(base_url: str, latency: dict[str, float], error_rate: dict[str, float], seed: int) -> web.Application:
+    rng = random.Random(seed)
+
+    def sub_app(service: str, app: web.Application | None = None) -> web.Application:
+        app = app or web.Application()
+        app.middlewares.append(_chaos(service, latency.get(service, DEFAULT_LATENCY[service]), error_rate.get(service, 0.0), rng))
+        return app
+
+    sites = sub_app("sites")
+    sites.router.add_get("/{domain}", site)
+
+    jina_app = sub_app("jina")
+    jina_app.router.add_get("/{domain}", jina)
+
+    openai = sub_app("openai")
+    openai.router.add_post("/v1/chat/completions", chat_completion)
+
+    favicons = sub_app("favicons")
+    favicons.router.add_get("/s2/favicons", favicon)
+
+    app = web.Application()
+    app.router.add_get("/health", health)
+    app.add_subapp("/sites", sites)
+    app.add_subapp("/jina", jina_app)
+    app.add_subapp("/openai", openai)
+    app.add_subapp("/favicons", favicons)
+    app.add_subapp("/mailjet", sub_app("mailjet", fake_mailjet.create_app(fail_rate=0.0, latency=0.0)))
+    app.add_subapp("/google", sub_app("google", fake_google.create_app(base_url=f"{base_url}/google", keys_max_age=3600, latency=0.0)))
+
+    return app
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Local stand-ins for the external services")
+    parser.add_argument("--port", type=int, default=8030)
+    parser.add_argument("--latency", type=_parse_rates, default={}, help="seconds per service, e.g. openai=0.8,jina=0.4")
+    parser.add_argument("--error-rate", type=_parse_rates, default={}, help="share of 503 answers per service, e.g. openai=0.05")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--print-env", action="store_true", help="print the environment pointing the API here, and exit")
+    args = parser.parse_args()
+
+    base_url = f"http://127.0.0.1:{args.port}"
+
+    if args.print_env:
+        for key, value in service_env(base_url).items():
+            print(f"{key}={value}")
+    else:
+        web.run_app(create_app(base_url, latency=args.latency, error_rate=args.error_rate, seed=args.seed), port=args.port, access_log=None)
@@ -0,0 +1,69 @@
+"""Move audio reviews stored inline in Postgres to the blob storage.
+
+    python -m scripts.migrate_audio_blobs [--batch-size 50]
+
+Brings the schema up to date first (database.database.upgrade_schema, the API
+does the same at startup), then moves rows over in batches: every row gets
+its blob key, size and MIME type and its `audio_data` is cleared in the
+same UPDATE. Safe to interrupt and re-run. Run `VACUUM FULL audio_reviews`
+afterwards to give the space back to the OS.
+"""
+import asyncio
+import logging
+import argparse
+
+from tortoise import Tortoise
+from database.database import init_db, upgrade_schema
+from database.models import AudioReview as AudioReviewModel
+from services import blob_storage
+
+
+async def migrate_batch(batch_size: int) -> int:
+    rows = await AudioReviewModel.filter(
+        blob_key__isnull=True,
+        audio_data__isnull=False,
+    ).order_by("id").limit(batch_size).values("id", "audio_data")
+
+    storage = blob_storage.get_storage()
+
+    for row in rows:
+        audio_data = bytes(row["audio_data"])
+        blob = await storage.store_bytes(
+            audio_data,
+            content_type=blob_storage.sniff_audio_mime_type(audio_data[:16]),
+        )
+
+        await AudioReviewModel.filter(id=row["id"]).update(
+            blob_key=blob.key,
+            size=blob.size,
+            mime_type=blob.content_type,
+            audio_data=None,
+        )
+
+    return len(rows)
+
+
+async def main(args):
+    await init_db()
+
+    try:
+        await upgrade_schema()
+
+        migrated = 0
+        while batch := await migrate_batch(batch_size=args.batch_size):
+            migrated += batch
+            logging.info(f"Moved {migrated} audio reviews to the blob storage")
+
+        logging.info(f"Done, {migrated} audio reviews moved")
+
+    finally:
+        await Tortoise.close_connections()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Move inline audio reviews to the blob storage")
+    parser.add_argument("--batch-size", type=int, default=50)
+
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,41 @@
+"""Queue every audio review for processing again.
+
+    python -m scripts.reprocess_audio_reviews
+
+E.g. after changing AUDIO_RENDITION_FORMAT or the bitrate. The audio
+processing workers of the API (services/audio_processing_service.py) pick
+them up, the current rendition keeps being served until the new one is
+ready and is released then.
+"""
+import asyncio
+import logging
+
+from datetime import datetime, timezone
+from tortoise import Tortoise
+from database.database import init_db, upgrade_schema
+from database.models import AudioReview as AudioReviewModel
+from schemas.audio_review import AudioProcessingStatus
+
+
+async def main():
+    await init_db()
+
+    try:
+        await upgrade_schema()
+
+        queued = await AudioReviewModel.all().update(
+            processing_status=AudioProcessingStatus.PENDING,
+            processing_attempts=0,
+            processing_error=None,
+            processing_run_after=datetime.now(timezone.utc),
+        )
+        logging.info(f"Done, {queued} audio reviews queued for processing")
+
+    finally:
+        await Tortoise.close_connections()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    asyncio.run(main())
@@ -0,0 +1,163 @@
+"""Fills a benchmark database with seeded users, tools, memberships and
+audio reviews, and writes the manifest the load scenarios read
+(scripts/benchmark_api.py).
+
+    POSTGRES_DB=anyrecs_bench BLOB_STORAGE_BACKEND=local python -m scripts.seed_benchmark_data
+    python -m scripts.seed_benchmark_data --users 2000 --tools 5000 --reviews 3000 --seed 1 --manifest bench.json
+
+Every table of the app is emptied first, so the database name must end
+with `_bench` (or `--force`). The same seed gives the same data.
+
+- users `user<n>`, signing in as user<n>@example.com through the Google
+  stand-in (scripts/fake_google.py with code `user<n>`)
+- tools per user drawn from a Zipf law, a few tools own most memberships
+- audio reviews are WAV files of 10 to 60 seconds (16 kHz mono, 320 kB to
+  1.9 MB), already processed so the audio workers leave them alone
+"""
+import os
+import sys
+import json
+import asyncio
+import logging
+import argparse
+import numpy as np
+
+from datetime import datetime, timezone, timedelta
+from tortoise import Tortoise
+from database.database import init_db, upgrade_schema
+from database.models import (
+    User as UserModel,
+    Tool as ToolModel,
+    AudioReview as AudioReviewModel,
+)
+from schemas.audio_review import AudioProcessingStatus
+from services import blob_storage, popularity_service
+from scripts.benchmark_search import CATEGORIES, TLDS, _word
+from scripts.fake_services import generate_audio
+
+
+TABLES = [
+    "audio_uploads", "audio_reviews", "tool_ingestion_jobs", "tool_popularity",
+    "domain_metadata", "email_outbox", "{through}", "tools", "users",
+]
+
+
+async def _reset():
+    through, _, _ = popularity_service.membership_table()
+    connection = Tortoise.get_connection("default")
+
+    tables = ", ".join(f'"{table.format(through=through)}"' for table in TABLES)
+    await connection.execute_script(f"TRUNCATE {tables} RESTART IDENTITY CASCADE;")
+
+
+async def main(args):
+    database = os.getenv("POSTGRES_DB", "")
+
+    if not database.endswith("_bench") and not args.force:
+        logging.error(f"Refusing to empty {database=}, its name must end with _bench (or use --force)")
+        sys.exit(1)
+
+    await init_db()
+
+    try:
+        # a fresh benchmark database has no schema yet
+        await upgrade_schema()
+        await _reset()
+
+        rng = np.random.default_rng(args.seed)
+        now = datetime.now(timezone.utc)
+
+        links = set()
+        tools = []
+        while len(tools) < args.tools:
+            name = " ".join(_word(rng) for _ in range(rng.integers(1, 3)))
+            link = f"{name.replace(' ', '')}.{TLDS[rng.integers(len(TLDS))]}"
+
+            if link not in links:
+                links.add(link)
+                tools.append(ToolModel(
+                    name=name.title(),
+                    category=CATEGORIES[rng.integers(len(CATEGORIES))],
+                    link=link,
+                    logo=f"https://www.google.com/s2/favicons?domain={link}&size=256",
+                ))
+
+        await ToolModel.bulk_create(tools, batch_size=1000)
+        tool_ids = await ToolModel.all().order_by("id").values_list("id", flat=True)
+
+        await UserModel.bulk_create([
+            UserModel(url=f"User{n}", username=f"User{n}", email=f"user{n}@example.com", picture=f"https://example.com/user{n}.png")
+            for n in range(args.users)
+        ], batch_size=1000)
+        users = await UserModel.all().order_by("id").values("id", "url")
+
+        # zipf ranks over a shuffled catalog: popularity doesn't follow the ids
+        popularity_order = rng.permutation(tool_ids)
+        memberships = {}
+        for user in users:
+            nb_tools = int(rng.integers(1, args.max_tools_per_user + 1))
+            ranks = np.minimum(rng.zipf(args.zipf, size=nb_tools * 2), len(tool_ids)) - 1
+            memberships[user["id"]] = list(dict.fromkeys(int(popularity_order[rank]) for rank in ranks))[:nb_tools]
+
+        through, user_key, tool_key = popularity_service.membership_table()
+        rows = [
+            (user_id, tool_id, now - timedelta(hours=float(rng.exponential(24 * 14))))
+            for user_id, user_tools in memberships.items()
+            for tool_id in user_tools
+        ]
+        await Tortoise.get_connection("default").execute_many(
+            f'INSERT INTO "{through}" ("{user_key}", "{tool_key}", "created_at") VALUES ($1, $2, $3)', rows,
+        )
+
+        storage = blob_storage.get_storage()
+        candidates = [(user_id, tool_id) for user_id, user_tools in memberships.items() for tool_id in user_tools]
+        reviewed = [candidates[i] for i in rng.choice(len(candidates), size=min(args.reviews, len(candidates)), replace=False)]
+        reviews = []
+
+        for user_id, tool_id in reviewed:
+            duration = float(rng.uniform(10, 60))
+            blob = await storage.store_bytes(generate_audio(rng, duration), content_type="audio/wav")
+            reviews.append(AudioReviewModel(
+                tool_id=tool_id,
+                user_id=user_id,
+                blob_key=blob.key,
+                size=blob.size,
+                mime_type=blob.content_type,
+                duration=duration,
+                processing_status=AudioProcessingStatus.DONE,
+            ))
+
+        await AudioReviewModel.bulk_create(reviews, batch_size=500)
+        await popularity_service.reconcile()
+
+        manifest = {
+            "seed": args.seed,
+            "users": [{"id": user["id"], "url": user["url"], "code": user["url"].lower(), "tools": memberships[user["id"]]} for user in users],
+            "reviews": [{"user_id": user_id, "tool_id": tool_id} for user_id, tool_id in reviewed],
+        }
+        with open(args.manifest, "w") as f:
+            json.dump(manifest, f)
+
+        logging.info(
+            f"Seeded {len(users)} users, {len(tools)} tools, {len(rows)} memberships, {len(reviews)} reviews "
+            f"({sum(review.size for review in reviews) / 1e6:.0f} MB of audio), manifest in {args.manifest}"
+        )
+
+    finally:
+        await Tortoise.close_connections()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Seed a benchmark database")
+    parser.add_argument("--users", type=int, default=1_000)
+    parser.add_argument("--tools", type=int, default=2_000)
+    parser.add_argument("--max-tools-per-user", type=int, default=10)
+    parser.add_argument("--zipf", type=float, default=1.3, help="exponent of the tool popularity law")
+    parser.add_argument("--reviews", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--manifest", default="benchmark_data.json")
+    parser.add_argument("--force", action="store_true", help="seed a database whose name doesn't end with _bench")
+
+    asyncio.run(main(parser.parse_args()))
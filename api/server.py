@@ -0,0 +1,161 @@
+"""Entry point of the API server.
+
+    python server.py                  # production: one worker per CPU, uvloop, httptools
+    python server.py --profile dev    # one worker, auto-reload, debug tracebacks
+
+Every setting can be overridden from the environment:
+WEB_CONCURRENCY (workers), MAX_REQUESTS (recycle a worker after that many
+requests, 0 to disable), GRACEFUL_TIMEOUT (seconds given to in-flight
+requests on shutdown), KEEP_ALIVE, HOST, PORT.
+
+The workers write their metrics to PROMETHEUS_MULTIPROC_DIR
+(services/metrics.py), emptied here before they start. The database schema
+is brought up to date here too, once, and the pools of all the workers
+(workers * DB_POOL_MAX_SIZE) are checked against Postgres max_connections.
+
+Background workers (ingestion, email sender, reconcilers...) run in every
+server worker, they claim their jobs with SKIP LOCKED / advisory locks so
+running several of them is safe. In-memory indexes and caches are per worker.
+"""
+import os
+import math
+import shutil
+import asyncio
+import logging
+import argparse
+import uvicorn
+
+from tortoise import Tortoise
+from database.database import _get_db_config, init_db, upgrade_schema
+
+
+PROD = "prod"
+DEV = "dev"
+
+
+def _cgroup_cpu_limit() -> float | None:
+    """CPUs allowed by the container's CPU quota, None when unlimited."""
+
+    try:
+        # cgroup v2
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            return int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+
+    try:
+        # cgroup v1
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+            quota = int(f.read())
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+            period = int(f.read())
+        if quota > 0:
+            return quota / period
+    except (OSError, ValueError):
+        pass
+
+    return None
+
+
+def get_nb_workers() -> int:
+    if os.getenv("WEB_CONCURRENCY"):
+        return max(1, int(os.getenv("WEB_CONCURRENCY")))
+
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+
+    limit = _cgroup_cpu_limit()
+    if limit is not None:
+        cpus = min(cpus, math.ceil(limit))
+
+    return max(1, cpus)
+
+
+def prepare_metrics_dir():
+    path = os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/anyrecs-metrics")
+
+    # samples of the previous run would add up with the new ones
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path)
+
+
+async def prepare_database(workers: int):
+    """Applies the migrations before the workers start, they would race on
+    a fresh database otherwise."""
+
+    await init_db()
+
+    try:
+        for version in await upgrade_schema():
+            logging.info(f"Migration applied: {version=}")
+
+        _, rows = await Tortoise.get_connection("default").execute_query(
+            "SELECT current_setting('max_connections')::int - current_setting('superuser_reserved_connections')::int AS \"available\""
+        )
+    finally:
+        await Tortoise.close_connections()
+
+    pool_size = _get_db_config()["connections"]["default"]["credentials"]["maxsize"]
+    total = workers * pool_size
+    available = rows[0]["available"]
+
+    if total > available:
+        raise ValueError(f"{workers} workers * DB_POOL_MAX_SIZE={pool_size} = {total} connections, postgres only allows {available}: lower WEB_CONCURRENCY or DB_POOL_MAX_SIZE")
+
+    logging.info(f"Database ready: up to {total} connections ({workers} workers * {pool_size}) out of {available}")
+
+
+def get_config(profile: str) -> dict:
+    host = os.getenv("HOST", "0.0.0.0")
+    port = int(os.getenv("PORT", "8000"))
+
+    if profile == DEV:
+        # read by main.py, in the reloaded process as well
+        os.environ["APP_DEBUG"] = "1"
+
+        return {
+            "app": "main:app",
+            "host": host,
+            "port": port,
+            "reload": True,
+            "log_level": "debug",
+        }
+
+    workers = get_nb_workers()
+
+    return {
+        "app": "main:app",
+        "host": host,
+        "port": port,
+        "workers": workers,
+        "loop": "uvloop",
+        "http": "httptools",
+        # a single worker is run without supervisor, reaching the limit would stop the server
+        "limit_max_requests": (int(os.getenv("MAX_REQUESTS", "10000")) or None) if workers > 1 else None,
+        "timeout_graceful_shutdown": int(os.getenv("GRACEFUL_TIMEOUT", "30")),
+        "timeout_keep_alive": int(os.getenv("KEEP_ALIVE", "5")),
+        "backlog": 2048,
+        # behind the reverse proxy
+        "proxy_headers": True,
+        "forwarded_allow_ips": os.getenv("FORWARDED_ALLOW_IPS", "*"),
+        "access_log": False,
+    }
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Run the API server")
+    parser.add_argument("--profile", choices=[PROD, DEV], default=os.getenv("APP_PROFILE", PROD))
+    args = parser.parse_args()
+
+    prepare_metrics_dir()
+    config = get_config(args.profile)
+    asyncio.run(prepare_database(workers=config.get("workers", 1)))
+    logging.info(f"Starting API server: profile={args.profile} " + " ".join(f"{key}={value}" for key, value in config.items() if key != "app"))
+
+    uvicorn.run(**config)
@@ -0,0 +1,179 @@
+import os
+import asyncio
+import logging
+import tempfile
+import numpy as np
+
+from datetime import datetime, timezone, timedelta
+from schemas.audio_review import AudioProcessingStatus
+from services import background, blob_storage, tool_service
+from database.models import AudioReview as AudioReviewModel
+
+
+FFMPEG_PATH = os.getenv("FFMPEG_PATH", "ffmpeg")
+
+AUDIO_PROCESSING_WORKERS = int(os.getenv("AUDIO_PROCESSING_WORKERS", "2"))
+AUDIO_PROCESSING_POLL_INTERVAL = float(os.getenv("AUDIO_PROCESSING_POLL_INTERVAL", "1"))
+AUDIO_PROCESSING_MAX_ATTEMPTS = int(os.getenv("AUDIO_PROCESSING_MAX_ATTEMPTS", "3"))
+AUDIO_PROCESSING_RETRY_BASE = float(os.getenv("AUDIO_PROCESSING_RETRY_BASE", "30"))
+
+# ffmpeg gets killed past this, a running review older than twice that is reclaimed
+AUDIO_PROCESSING_TIMEOUT = float(os.getenv("AUDIO_PROCESSING_TIMEOUT", "60"))
+
+# opus (webm) is the smallest, aac (mp4) plays everywhere including old Safari
+AUDIO_RENDITION_FORMAT = os.getenv("AUDIO_RENDITION_FORMAT", "opus")
+AUDIO_RENDITION_BITRATE = os.getenv("AUDIO_RENDITION_BITRATE", "24k")
+
+AUDIO_PEAKS = int(os.getenv("AUDIO_PEAKS", "200"))
+
+# the waveform doesn't need more, keeps the decoded samples small
+PEAKS_SAMPLE_RATE = 8000
+
+# high-pass below the voice range, then EBU R128 loudness normalization (single pass)
+SPEECH_FILTERS = "highpass=f=80,loudnorm=I=-16:TP=-1.5:LRA=11,aresample=48000"
+
+RENDITION_FORMATS = {
+    "opus": {
+        "args": ["-c:a", "libopus", "-application", "voip", "-vbr", "on", "-f", "webm"],
+        "mime_type": "audio/webm",
+    },
+    "aac": {
+        # moov atom up front so playback can start before the whole file is downloaded
+        "args": ["-c:a", "aac", "-movflags", "+faststart", "-f", "mp4"],
+        "mime_type": "audio/mp4",
+    },
+}
+
+queue = background.JobQueue(
+    AudioReviewModel,
+    pending=AudioProcessingStatus.PENDING,
+    running=AudioProcessingStatus.RUNNING,
+    lease=timedelta(seconds=2 * AUDIO_PROCESSING_TIMEOUT),
+    status_field="processing_status",
+    started_at_field="processing_started_at",
+    attempts_field="processing_attempts",
+    run_after_field="processing_run_after",
+    # legacy reviews get processed once moved to the blob storage
+    blob_key__isnull=False,
+)
+
+
+class AudioProcessingError(Exception):
+    pass
+
+
+def compute_peaks(samples: np.ndarray, nb_peaks: int = AUDIO_PEAKS) -> list[float]:
+    """Max absolute amplitude of `nb_peaks` equal buckets, scaled to [0, 1]."""
+
+    if samples.size == 0:
+        return []
+
+    nb_peaks = min(nb_peaks, samples.size)
+    usable = samples.size // nb_peaks * nb_peaks
+
+    peaks = np.abs(samples[:usable]).reshape(nb_peaks, -1).max(axis=1).astype(np.float64)
+
+    if (loudest := peaks.max()) > 0:
+        peaks = peaks / loudest
+
+    return np.round(peaks, 3).tolist()
+
+
+async def _run_ffmpeg(input_path: str, output_path: str) -> bytes:
+    """Writes the speech rendition to `output_path` and returns the same
+    audio as raw mono float32 samples, both from a single decode."""
+
+    rendition = RENDITION_FORMATS[AUDIO_RENDITION_FORMAT]
+
+    process = await asyncio.create_subprocess_exec(
+        FFMPEG_PATH, "-nostdin", "-hide_banner", "-loglevel", "error", "-y",
+        "-i", input_path,
+        "-filter_complex", f"[0:a:0]{SPEECH_FILTERS},asplit=2[rendition][peaks]",
+        "-map", "[rendition]", "-ac", "1", "-b:a", AUDIO_RENDITION_BITRATE, *rendition["args"], output_path,
+        "-map", "[peaks]", "-ac", "1", "-ar", str(PEAKS_SAMPLE_RATE), "-f", "f32le", "pipe:1",
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+
+    try:
+        async with asyncio.timeout(AUDIO_PROCESSING_TIMEOUT):
+            stdout, stderr = await process.communicate()
+    except TimeoutError:
+        process.kill()
+        await process.wait()
+        raise AudioProcessingError(f"ffmpeg timed out after {AUDIO_PROCESSING_TIMEOUT}s")
+
+    if process.returncode != 0:
+        raise AudioProcessingError(f"ffmpeg exited with {process.returncode}: {stderr.decode(errors='replace')[-500:]}")
+
+    return stdout
+
+
+async def _download(key: str, path: str):
+    storage = blob_storage.get_storage()
+
+    with open(path, "wb") as file:
+        async for chunk in storage.iter_range(key):
+            await asyncio.to_thread(file.write, chunk)
+
+
+async def process_review(review: AudioReviewModel):
+    rendition = RENDITION_FORMATS[AUDIO_RENDITION_FORMAT]
+
+    try:
+        with tempfile.TemporaryDirectory(prefix="anyrecs-audio-") as directory:
+            input_path = os.path.join(directory, "input")
+            output_path = os.path.join(directory, "rendition")
+
+            await _download(review.blob_key, input_path)
+            raw_samples = await _run_ffmpeg(input_path, output_path)
+
+            samples = np.frombuffer(raw_samples, dtype="<f4")
+            peaks = await asyncio.to_thread(compute_peaks, samples)
+
+            async def set_rendition(blob: blob_storage.StoredBlob, connection) -> int:
+                return await AudioReviewModel.filter(id=review.id).using_db(connection).update(
+                    processing_status=AudioProcessingStatus.DONE,
+                    processing_error=None,
+                    rendition_key=blob.key,
+                    rendition_size=blob.size,
+                    rendition_mime_type=blob.content_type,
+                    duration=round(samples.size / PEAKS_SAMPLE_RATE, 2),
+                    peaks=peaks,
+                )
+
+            with open(output_path, "rb") as file:
+                blob, updated = await tool_service.store_audio_blob(file, content_type=rendition["mime_type"], reference=set_rendition)
+
+    except Exception as e:
+        logging.warning(f"Couldn't process audio review: {review.id=} {review.processing_attempts=} {e!r}")
+
+        failed = review.processing_attempts >= AUDIO_PROCESSING_MAX_ATTEMPTS
+        await AudioReviewModel.filter(id=review.id).update(
+            processing_status=AudioProcessingStatus.FAILED if failed else AudioProcessingStatus.PENDING,
+            processing_error=str(e),
+            # not picked up again right away while ffmpeg or the storage keeps failing
+            processing_run_after=datetime.now(timezone.utc) + background.retry_delay(review.processing_attempts, base=AUDIO_PROCESSING_RETRY_BASE),
+        )
+        return
+
+    if not updated:
+        # re-recorded or deleted in the meantime, don't leak the rendition
+        await tool_service.release_audio_blob(key=blob.key)
+        return
+
+    # reprocessed (new format or bitrate), the previous rendition is no longer served
+    if review.rendition_key is not None and review.rendition_key != blob.key:
+        await tool_service.release_audio_blob(key=review.rendition_key)
+
+    logging.info(f"Audio review processed: {review.id=} {review.size=} {blob.size=} duration={samples.size / PEAKS_SAMPLE_RATE:.1f}s")
+
+
+def start_workers():
+    background.start_queue_workers(
+        "audio-processing-worker",
+        queue,
+        process_review,
+        workers=AUDIO_PROCESSING_WORKERS,
+        poll_interval=AUDIO_PROCESSING_POLL_INTERVAL,
+    )
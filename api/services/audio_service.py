@@ -0,0 +1,432 @@
+import os
+import re
+import asyncio
+import hashlib
+import shutil
+import logging
+import tempfile
+
+from uuid import UUID, uuid4
+from dataclasses import dataclass
+from typing import AsyncIterator
+from starlette.datastructures import FormData, UploadFile
+from starlette.requests import ClientDisconnect
+from datetime import datetime, timezone, timedelta
+from fastapi import HTTPException, Request, Response, status
+from fastapi.responses import StreamingResponse
+from services import blob_storage, tool_service
+from database.models import (
+    User as UserModel,
+    AudioReview as AudioReviewModel,
+    AudioUpload as AudioUploadModel,
+)
+
+
+AUDIO_CACHE_MAX_AGE = int(os.getenv("AUDIO_CACHE_MAX_AGE", str(60 * 60 * 24 * 365)))
+
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+# resumable uploads are spooled here until finalized, must be shared by all the workers of a host
+AUDIO_UPLOAD_SPOOL_PATH = os.getenv("AUDIO_UPLOAD_SPOOL_PATH", os.path.join(tempfile.gettempdir(), "anyrecs-uploads"))
+AUDIO_UPLOAD_MAX_OPEN_SESSIONS = int(os.getenv("AUDIO_UPLOAD_MAX_OPEN_SESSIONS", "3"))
+AUDIO_UPLOAD_SESSION_TTL = timedelta(hours=int(os.getenv("AUDIO_UPLOAD_SESSION_TTL_HOURS", "24")))
+
+# multipart boundaries and part headers on top of the recording itself
+AUDIO_FORM_OVERHEAD = 64 * 1024
+
+
+@dataclass
+class AudioPlayback:
+    size: int
+    mime_type: str
+    content_hash: str
+    blob_key: str | None = None
+    # reviews not migrated to the blob storage yet
+    legacy_data: bytes | None = None
+
+
+def content_hash(blob_key: str | None) -> str | None:
+    # blob keys end with the sha256 of the content, see blob_storage.BlobStorage.store
+    return blob_key.rsplit("/", 1)[-1] if blob_key else None
+
+
+async def get_playback(tool_id: int, user_id: int) -> AudioPlayback:
+    review = await AudioReviewModel.filter(
+        tool_id=tool_id,
+        user_id=user_id,
+    ).order_by("-id").first().values(
+        "id", "blob_key", "size", "mime_type",
+        "rendition_key", "rendition_size", "rendition_mime_type",
+    )
+
+    if review is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Review not found")
+
+    if review["blob_key"] is None:
+        legacy = await AudioReviewModel.filter(id=review["id"]).first().values("audio_data")
+        data = bytes(legacy["audio_data"])
+
+        return AudioPlayback(
+            size=len(data),
+            mime_type=blob_storage.sniff_audio_mime_type(data[:16]),
+            content_hash=hashlib.sha256(data).hexdigest(),
+            legacy_data=data,
+        )
+
+    if review["rendition_key"] is not None:
+        return AudioPlayback(
+            size=review["rendition_size"],
+            mime_type=review["rendition_mime_type"],
+            content_hash=content_hash(review["rendition_key"]),
+            blob_key=review["rendition_key"],
+        )
+
+    return AudioPlayback(
+        size=review["size"],
+        mime_type=review["mime_type"] or "audio/mpeg",
+        content_hash=content_hash(review["blob_key"]),
+        blob_key=review["blob_key"],
+    )
+
+
+def _parse_range(header: str, size: int) -> tuple[int, int] | None:
+    """Returns the (first, last) byte positions of a single `bytes=` range.
+    Multiple ranges are not supported and get the full content instead."""
+
+    match = _RANGE.match(header.strip())
+
+    if match is None:
+        return None
+
+    first, last = match.groups()
+
+    if first == "" and last == "":
+        return None
+
+    if first == "":
+        # suffix range, the last N bytes
+        first, last = max(0, size - int(last)), size - 1
+    else:
+        first, last = int(first), min(int(last), size - 1) if last else size - 1
+
+    if first >= size or first > last:
+        raise HTTPException(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            detail="Requested range not satisfiable",
+            headers={"Content-Range": f"bytes */{size}"},
+        )
+
+    return first, last
+
+
+def etag_matches(header: str, etag: str) -> bool:
+    candidates = [candidate.strip().removeprefix("W/") for candidate in header.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+def build_response(request: Request, playback: AudioPlayback, version: str | None = None) -> Response:
+    """Streams a recording with range support (206), a strong content ETag
+    and conditional GET (304).
+
+    URLs carrying the current content hash as `version` never change and are
+    cached for a year, the others have to be revalidated."""
+
+    etag = f'"{playback.content_hash}"'
+
+    if version == playback.content_hash:
+        cache_control = f"public, max-age={AUDIO_CACHE_MAX_AGE}, immutable"
+    else:
+        cache_control = "public, no-cache"
+
+    headers = {
+        "ETag": etag,
+        "Cache-Control": cache_control,
+        "Accept-Ranges": "bytes",
+    }
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None and etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    byte_range = None
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+
+    if range_header is not None and (if_range is None or if_range.strip() == etag):
+        byte_range = _parse_range(range_header, size=playback.size)
+
+    if byte_range is None:
+        first, last = 0, playback.size - 1
+        status_code = status.HTTP_200_OK
+    else:
+        first, last = byte_range
+        status_code = status.HTTP_206_PARTIAL_CONTENT
+        headers["Content-Range"] = f"bytes {first}-{last}/{playback.size}"
+
+    length = max(0, last - first + 1)
+    headers["Content-Length"] = str(length)
+
+    if playback.legacy_data is not None:
+        return Response(
+            content=playback.legacy_data[first:last + 1],
+            status_code=status_code,
+            headers=headers,
+            media_type=playback.mime_type,
+        )
+
+    return StreamingResponse(
+        blob_storage.get_storage().iter_range(playback.blob_key, start=first, length=length),
+        status_code=status_code,
+        headers=headers,
+        media_type=playback.mime_type,
+    )
+
+
+def _spool_dir(upload_id: UUID) -> str:
+    return os.path.join(AUDIO_UPLOAD_SPOOL_PATH, str(upload_id))
+
+
+def _part_path(upload_id: UUID, offset: int) -> str:
+    return os.path.join(_spool_dir(upload_id), f"{offset:012d}")
+
+
+def _create_spool_dir(upload_id: UUID):
+    os.makedirs(_spool_dir(upload_id), exist_ok=True)
+
+
+def _remove_spool_dir(upload_id: UUID):
+    shutil.rmtree(_spool_dir(upload_id), ignore_errors=True)
+
+
+def _remove_file(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _assemble_parts(upload_id: UUID) -> tuple[str, int]:
+    """Concatenates the contiguous parts from offset 0 into a single file,
+    returns its path and size."""
+
+    directory = _spool_dir(upload_id)
+    offsets = sorted(int(name) for name in os.listdir(directory) if name.isdigit())
+    path = os.path.join(directory, "assembled")
+    size = 0
+
+    with open(path, "wb") as output:
+        for offset in offsets:
+            if offset != size:
+                break
+
+            with open(_part_path(upload_id, offset), "rb") as part:
+                shutil.copyfileobj(part, output)
+
+            size = output.tell()
+
+    return path, size
+
+
+async def create_upload(
+    tool_id: int,
+    user: UserModel,
+    size: int | None = None,
+    mime_type: str | None = None,
+) -> AudioUploadModel:
+
+    await tool_service.get_tool(id=tool_id)
+
+    if size is not None and size > tool_service.AUDIO_UPLOAD_MAX_BYTES:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="Audio review too large")
+
+    if await AudioUploadModel.filter(user_id=user.id).count() >= AUDIO_UPLOAD_MAX_OPEN_SESSIONS:
+        raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail="Too many uploads in progress")
+
+    upload = await AudioUploadModel.create(
+        tool_id=tool_id,
+        user=user,
+        size=size,
+        mime_type=mime_type,
+    )
+
+    await asyncio.to_thread(_create_spool_dir, upload.id)
+
+    return upload
+
+
+async def get_upload(
+    id: UUID,
+    tool_id: int,
+    user: UserModel,
+) -> AudioUploadModel:
+
+    upload = await AudioUploadModel.get_or_none(id=id, tool_id=tool_id, user_id=user.id)
+
+    if upload is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Upload not found")
+
+    return upload
+
+
+async def read_audio_form(request: Request) -> FormData:
+    """Parses a single-request review upload (`audio` file field), refused with
+    a 413 as soon as the body goes past AUDIO_UPLOAD_MAX_BYTES instead of
+    after spooling all of it. The caller closes the form."""
+
+    max_bytes = tool_service.AUDIO_UPLOAD_MAX_BYTES + AUDIO_FORM_OVERHEAD
+    content_length = request.headers.get("content-length")
+
+    if content_length is not None and content_length.isdigit() and int(content_length) > max_bytes:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="Audio review too large")
+
+    received = 0
+
+    # chunked bodies have no content-length, they are counted as they arrive
+    async def receive():
+        nonlocal received
+
+        message = await request.receive()
+
+        if message["type"] == "http.request":
+            received += len(message.get("body", b""))
+
+            if received > max_bytes:
+                raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="Audio review too large")
+
+        return message
+
+    try:
+        form = await Request(request.scope, receive).form(max_files=1, max_fields=1)
+    except HTTPException:
+        raise
+    except Exception:
+        # same answer as FastAPI's own body parsing
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="There was an error parsing the body")
+
+    if not isinstance(form.get("audio"), UploadFile):
+        await form.close()
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Missing audio file")
+
+    return form
+
+
+def _offset_conflict(upload: AudioUploadModel) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail=f"Upload is at offset {upload.offset}",
+        headers={"Upload-Offset": str(upload.offset)},
+    )
+
+
+async def write_chunk(
+    upload: AudioUploadModel,
+    offset: int,
+    chunks: AsyncIterator[bytes],
+) -> AudioUploadModel:
+    """Streams a chunk straight from the request body to a part file of its
+    own, kept if the offset can still be moved past it. Bytes received before
+    a client disconnect are kept so the upload can resume from there.
+
+    Writers racing at the same offset (two tabs, a retried request landing on
+    another worker) never share a file: the conditional offset update picks
+    one, the other part is dropped."""
+
+    if offset != upload.offset:
+        raise _offset_conflict(upload)
+
+    max_size = min(upload.size or tool_service.AUDIO_UPLOAD_MAX_BYTES, tool_service.AUDIO_UPLOAD_MAX_BYTES)
+    part_path = _part_path(upload.id, offset)
+    temp_path = f"{part_path}.{uuid4().hex}"
+    updated = 0
+    written = 0
+
+    try:
+        file = await asyncio.to_thread(open, temp_path, "wb")
+
+        try:
+            async for chunk in chunks:
+                if offset + written + len(chunk) > max_size:
+                    raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="Audio review too large")
+
+                await asyncio.to_thread(file.write, chunk)
+                written += len(chunk)
+
+        except ClientDisconnect:
+            logging.info(f"Client disconnected during audio upload, keeping received bytes: {upload.id=} {written=}")
+
+        finally:
+            await asyncio.to_thread(file.close)
+
+        if not written:
+            return upload
+
+        updated = await AudioUploadModel.filter(id=upload.id, offset=offset).update(offset=offset + written)
+
+        if updated:
+            await asyncio.to_thread(os.replace, temp_path, part_path)
+
+    finally:
+        if not updated:
+            await asyncio.to_thread(_remove_file, temp_path)
+
+    if not updated:
+        await upload.refresh_from_db(fields=["offset"])
+        raise _offset_conflict(upload)
+
+    upload.offset = offset + written
+
+    return upload
+
+
+async def complete_upload(
+    upload: AudioUploadModel,
+    user: UserModel,
+) -> AudioReviewModel:
+
+    if upload.offset == 0 or (upload.size is not None and upload.offset != upload.size):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Upload is incomplete ({upload.offset}/{upload.size} bytes)",
+            headers={"Upload-Offset": str(upload.offset)},
+        )
+
+    path, size = await asyncio.to_thread(_assemble_parts, upload.id)
+
+    if size != upload.offset:
+        # a worker died between moving the offset and keeping its part, the client resends from there
+        logging.warning(f"Audio upload is missing parts, rewinding it: {upload.id=} {upload.offset=} {size=}")
+        await AudioUploadModel.filter(id=upload.id, offset=upload.offset).update(offset=size)
+        upload.offset = size
+        raise _offset_conflict(upload)
+
+    file = await asyncio.to_thread(open, path, "rb")
+
+    try:
+        review = await tool_service.save_audio_review(
+            tool_id=upload.tool_id,
+            file=file,
+            mime_type=upload.mime_type,
+            user=user,
+        )
+    finally:
+        await asyncio.to_thread(file.close)
+
+    await cancel_upload(upload)
+
+    return review
+
+
+async def cancel_upload(upload: AudioUploadModel):
+    await upload.delete()
+    await asyncio.to_thread(_remove_spool_dir, upload.id)
+
+
+async def cleanup_stale_uploads():
+    while True:
+        expired = await AudioUploadModel.filter(updated_at__lt=datetime.now(timezone.utc) - AUDIO_UPLOAD_SESSION_TTL)
+
+        for upload in expired:
+            logging.info(f"Removing abandoned audio upload: {upload.id=} {upload.offset=}")
+            await cancel_upload(upload)
+
+        await asyncio.sleep(60 * 60)
@@ -1,7 +1,9 @@
 import os
 import jwt
+import time
+import asyncio
 import logging
-import requests
+import aiohttp
 
 from database.models import User as UserModel
 from pydantic import BaseModel
@@ -11,6 +13,8 @@ from fastapi.responses import RedirectResponse
 from datetime import datetime, timezone, timedelta
 from fastapi import HTTPException, status, Response, Request
 from itsdangerous import URLSafeTimedSerializer, BadSignature
+from tortoise.signals import post_save, post_delete
+from services import cache, google_auth, http_client, profile_service
 from services.email_service import send_confirmation_email, send_password_reset_email
 
 
@@ -22,10 +26,20 @@ PASSWORD_RESET_SALT = "password-reset-salt"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 VALIDATION_TOKEN_MAX_AGE = 60 * 60 * 24 * 7 # 7 days
 
+# authenticated users, keyed by token subject so most requests don't need the database to authenticate.
+# the cache is per worker, the other workers aren't told about a change: a user changed or deleted
+# through one of them keeps authenticating as before on the others for PRINCIPAL_CACHE_TTL at most,
+# so it stays a few seconds (same trade-off as profile_cache's PROFILE_VERSION_TTL)
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000"))
+PRINCIPAL_CACHE_TTL = min(float(os.getenv("PRINCIPAL_CACHE_TTL", "5")), 30)
+
 
 serializer = URLSafeTimedSerializer(JWT_SECRET_KEY)
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# hit rate on /metrics: cache_lookups_total{cache="principals"}
+_principals = cache.TTLCache(maxsize=PRINCIPAL_CACHE_SIZE, ttl=PRINCIPAL_CACHE_TTL, name="principals")
+
 
 class CredentialsException(HTTPException):
     def __init__(self):
@@ -85,6 +99,29 @@ def set_auth_cookie(response: Response, token: str):
     )
 
 
+def _principal_row(user: UserModel) -> dict:
+    return {column: getattr(user, field) for field, column in user._meta.fields_db_projection.items()}
+
+
+def _principal_keys(user: UserModel) -> list[tuple]:
+    return [("uid", user.id), ("sub", user.email)]
+
+
+def invalidate_principal(user: UserModel):
+    for key in _principal_keys(user):
+        _principals.pop(key)
+
+
+@post_save(UserModel)
+async def _on_user_saved(sender, instance: UserModel, created, using_db, update_fields):
+    invalidate_principal(instance)
+
+
+@post_delete(UserModel)
+async def _on_user_deleted(sender, instance: UserModel, using_db):
+    invalidate_principal(instance)
+
+
 async def get_current_user(token: str) -> UserModel:
     try:
         payload = jwt.decode(token.split()[1], JWT_SECRET_KEY, algorithms=[ALGORITHM])
@@ -95,30 +132,45 @@ async def get_current_user(token: str) -> UserModel:
     except jwt.InvalidTokenError:
         raise HTTPInvalidTokenError()
 
-    user = await get_user(email=email)
+    # tokens issued before the uid claim was added only have the email
+    user_id: int | None = payload.get("uid")
+    key = ("uid", user_id) if user_id is not None else ("sub", email)
+
+    row = _principals.get(key)
+
+    if row is not None:
+        # a new instance per request from the cached columns: relations fetched
+        # on it (`user.tools`) are never shared with another request
+        return UserModel._init_from_db(**row)
+
+    user = await get_user(id=user_id) if user_id is not None else await get_user(email=email)
 
     if user is None:
         logging.info("No user found with such email, returning 401.")
         raise CredentialsException()
 
+    # never outlive the token
+    _principals.set(key, _principal_row(user), ttl=payload.get("exp", time.time() + PRINCIPAL_CACHE_TTL) - time.time())
+
     return user
 
 
-def generate_and_send_confirmation_email(user: UserModel, request: Request):
+async def generate_and_send_confirmation_email(user: UserModel, request: Request):
     token = serializer.dumps(user.email, salt=EMAIL_SALT)
     verification_endpoint = f"https://{request.url.hostname}/auth/confirm/{token}"
-    send_confirmation_email(
+    await send_confirmation_email(
         email=user.email,
         verification_endpoint=verification_endpoint,
     )
 
 
-def get_google_userinfo(google_access_token: str):
+async def get_google_userinfo(google_access_token: str):
 
-    response = requests.get(
-        "https://www.googleapis.com/oauth2/v1/userinfo",
+    response = await http_client.get(
+        await google_auth.get_endpoint("userinfo_endpoint"),
         headers={"Authorization": f"Bearer {google_access_token}"},
         timeout=5,
+        service="google_userinfo",
     )
 
     if response.status_code != 200:
@@ -128,8 +180,31 @@ def get_google_userinfo(google_access_token: str):
     return response.json()
 
 
+async def _get_google_identity(tokens: dict) -> dict:
+    """email, name and picture of the user, from the ID token returned with
+    the access token when possible, saving the userinfo round trip"""
+
+    id_token = tokens.get("id_token")
+
+    if id_token:
+        try:
+            claims = await google_auth.verify_id_token(id_token, audience=os.getenv('GOOGLE_CLIENT_ID'))
+
+            if all(claims.get(claim) for claim in ("email", "name", "picture")):
+                return claims
+
+        except jwt.InvalidTokenError as e:
+            logging.warning(f"Invalid google id token: {e}")
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Incorrect Google credentials")
+
+        except (google_auth.GoogleAuthError, aiohttp.ClientError, asyncio.TimeoutError, ValueError, KeyError) as e:
+            logging.warning(f"Couldn't verify google id token locally ({type(e).__name__}), falling back to userinfo")
+
+    return await get_google_userinfo(google_access_token=tokens.get("access_token"))
+
+
 async def auth_google_callback(code: str, response: Response):
-    token_url = "https://accounts.google.com/o/oauth2/token"
+    token_url = await google_auth.get_endpoint("token_endpoint")
 
     data = {
         "code": code,
@@ -139,17 +214,16 @@ async def auth_google_callback(code: str, response: Response):
         "grant_type": "authorization_code",
     }
 
-    token_response = requests.post(token_url, data=data, timeout=5)
+    token_response = await http_client.post(token_url, data=data, timeout=5, service="google_token")
 
     if token_response.status_code != 200:
         logging.warning(f"Received non-200 status code on google callback: {token_response.status_code=} {token_response.text=}")
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Incorrect Google credentials")
 
-    google_access_token = token_response.json().get("access_token")
-    user_info = get_google_userinfo(google_access_token=google_access_token)
+    user_info = await _get_google_identity(tokens=token_response.json())
 
     # {
-    #     'id': 'str',
+    #     'sub' (id token) / 'id' (userinfo): 'str',
     #     'email': 'str',
     #     'verified_email': bool,
     #     'name': 'str (full name)',
@@ -174,6 +248,7 @@ async def auth_google_callback(code: str, response: Response):
     # Create JWT access token
     jwt_token = create_access_token(data={
         "sub": user.email,
+        "uid": user.id,
     })
 
     response = RedirectResponse(
@@ -186,7 +261,7 @@ async def auth_google_callback(code: str, response: Response):
 
 
 async def refresh_google_token(refresh_token):
-    token_url = "https://accounts.google.com/o/oauth2/token"
+    token_url = await google_auth.get_endpoint("token_endpoint")
 
     data = {
         "client_id": os.getenv('GOOGLE_CLIENT_ID'),
@@ -195,7 +270,7 @@ async def refresh_google_token(refresh_token):
         "grant_type": "refresh_token",
     }
 
-    response = requests.post(token_url, data=data, timeout=5)
+    response = await http_client.post(token_url, data=data, timeout=5, service="google_token")
 
     if response.status_code != 200:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Failed to refresh Google token")
@@ -215,9 +290,7 @@ async def logout(response: Response):
 
 
 async def read_users_me(user: UserModel):
-    user = await user.to_schema(include_tools=True)
-
-    return user
+    return await profile_service.get_me(user=user)
 
 
 async def confirm_user(user: UserModel, token: str):
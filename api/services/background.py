@@ -0,0 +1,160 @@
+import asyncio
+import logging
+
+from enum import Enum
+from typing import Awaitable, Callable
+from tortoise.models import Model
+from tortoise.expressions import Q, F
+from tortoise.transactions import in_transaction
+from datetime import datetime, timezone, timedelta
+
+
+_tasks: list[asyncio.Task] = []
+
+
+async def _run_forever(name: str, coro_fn, *args):
+    while True:
+        try:
+            await coro_fn(*args)
+            return
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logging.exception(f"Background task crashed, restarting in 1s: {name=}")
+            await asyncio.sleep(1)
+
+
+def start(name: str, coro_fn, *args) -> asyncio.Task:
+    task = asyncio.create_task(_run_forever(name, coro_fn, *args), name=name)
+    _tasks.append(task)
+    return task
+
+
+async def stop_all():
+    for task in _tasks:
+        task.cancel()
+
+    await asyncio.gather(*_tasks, return_exceptions=True)
+    _tasks.clear()
+
+
+def retry_delay(attempts: int, base: float) -> timedelta:
+    """Exponential backoff: `base` seconds after the first attempt, doubled after every other one."""
+
+    return timedelta(seconds=base * 2 ** (attempts - 1))
+
+
+class JobQueue:
+    """A table used as a job queue by the workers of every server process.
+
+    Rows are claimed with SELECT ... FOR UPDATE SKIP LOCKED, so two workers
+    never get the same one. A claimed row is leased for `lease`: past that
+    its worker is considered dead (crashed, killed on deploy) and the row
+    gets claimed again, its attempts counter tells how many times.
+    """
+
+    def __init__(
+        self,
+        model: type[Model],
+        *,
+        pending: Enum,
+        running: Enum,
+        lease: timedelta,
+        status_field: str = "status",
+        started_at_field: str = "started_at",
+        attempts_field: str = "attempts",
+        # rows are only claimed once it is past, for backoff
+        run_after_field: str | None = "run_after",
+        **filters,
+    ):
+        self.model = model
+        self.pending = pending
+        self.running = running
+        self.lease = lease
+        self.status_field = status_field
+        self.started_at_field = started_at_field
+        self.attempts_field = attempts_field
+        self.run_after_field = run_after_field
+        self.filters = filters
+
+    async def claim(self, limit: int = 1) -> list[Model]:
+        now = datetime.now(timezone.utc)
+
+        ready = Q(**{self.status_field: self.pending})
+        if self.run_after_field is not None:
+            ready &= Q(**{f"{self.run_after_field}__lte": now})
+
+        abandoned = Q(**{self.status_field: self.running, f"{self.started_at_field}__lt": now - self.lease})
+
+        async with in_transaction() as connection:
+            rows = await self.model.filter(ready | abandoned, **self.filters).order_by("id").limit(limit).select_for_update(
+                skip_locked=True,
+            ).using_db(connection)
+
+            if not rows:
+                return []
+
+            await self.model.filter(id__in=[row.id for row in rows]).using_db(connection).update(**{
+                self.status_field: self.running,
+                self.started_at_field: now,
+                self.attempts_field: F(self.attempts_field) + 1,
+            })
+
+        for row in rows:
+            setattr(row, self.status_field, self.running)
+            setattr(row, self.started_at_field, now)
+            setattr(row, self.attempts_field, getattr(row, self.attempts_field) + 1)
+
+        return rows
+
+    async def claim_one(self) -> Model | None:
+        rows = await self.claim(limit=1)
+        return rows[0] if rows else None
+
+
+async def _run_queue_worker(
+    queue: JobQueue,
+    handle: Callable[..., Awaitable],
+    poll_interval: float,
+    batch_size: int | None,
+    wakeup: asyncio.Event | None,
+):
+    while True:
+        rows = await queue.claim(limit=batch_size or 1)
+
+        if rows:
+            if batch_size is None:
+                await handle(rows[0])
+            else:
+                await handle(rows)
+            continue
+
+        if wakeup is None:
+            await asyncio.sleep(poll_interval)
+            continue
+
+        wakeup.clear()
+
+        try:
+            await asyncio.wait_for(wakeup.wait(), timeout=poll_interval)
+        except asyncio.TimeoutError:
+            pass
+
+
+def start_queue_workers(
+    name: str,
+    queue: JobQueue,
+    handle: Callable[..., Awaitable],
+    *,
+    workers: int = 1,
+    poll_interval: float = 1,
+    batch_size: int | None = None,
+    wakeup: asyncio.Event | None = None,
+):
+    """Runs `workers` loops claiming rows of `queue` and handing them to
+    `handle`, one at a time, or as a list of up to `batch_size` rows when
+    given. An idle loop polls every `poll_interval` seconds, or as soon as
+    `wakeup` is set."""
+
+    for i in range(workers):
+        start(f"{name}-{i}", _run_queue_worker, queue, handle, poll_interval, batch_size, wakeup)
@@ -0,0 +1,235 @@
+import os
+import hashlib
+import asyncio
+import tempfile
+import threading
+
+from abc import ABC, abstractmethod
+from minio import Minio
+from minio.error import S3Error
+from typing import BinaryIO
+from dataclasses import dataclass
+
+
+BLOB_STORAGE_BACKEND = os.getenv("BLOB_STORAGE_BACKEND", "local")
+BLOB_STORAGE_PATH = os.getenv("BLOB_STORAGE_PATH", "./blobs")
+
+S3_ENDPOINT = os.getenv("S3_ENDPOINT", "minio:9000")
+S3_ACCESS_KEY = os.getenv("S3_ACCESS_KEY")
+S3_SECRET_KEY = os.getenv("S3_SECRET_KEY")
+S3_BUCKET = os.getenv("S3_BUCKET", "anyrecs")
+S3_SECURE = os.getenv("S3_SECURE", "false").lower() == "true"
+
+CHUNK_SIZE = 64 * 1024
+
+
+@dataclass
+class StoredBlob:
+    key: str
+    size: int
+    content_type: str
+
+
+def sniff_audio_mime_type(head: bytes, default: str = "audio/mpeg") -> str:
+    if head.startswith(b"\x1a\x45\xdf\xa3"):
+        return "audio/webm"
+    if head.startswith(b"OggS"):
+        return "audio/ogg"
+    if head[4:8] == b"ftyp":
+        return "audio/mp4"
+    if head.startswith(b"RIFF") and head[8:12] == b"WAVE":
+        return "audio/wav"
+    if head.startswith(b"ID3") or head[:2] in (b"\xff\xfb", b"\xff\xf3", b"\xff\xf2"):
+        return "audio/mpeg"
+    return default
+
+
+class _LimitedReader:
+
+    def __init__(self, file: BinaryIO, length: int | None):
+        self._file = file
+        self._remaining = length
+
+    def read(self, size: int) -> bytes:
+        if self._remaining is not None:
+            size = min(size, self._remaining)
+            if size <= 0:
+                return b""
+
+        chunk = self._file.read(size)
+
+        if self._remaining is not None:
+            self._remaining -= len(chunk)
+
+        return chunk
+
+    def close(self):
+        self._file.close()
+
+
+class _S3Reader:
+
+    def __init__(self, response):
+        self._response = response
+
+    def read(self, size: int) -> bytes:
+        return self._response.read(size)
+
+    def close(self):
+        self._response.close()
+        self._response.release_conn()
+
+
+class BlobStorage(ABC):
+    """Content-addressed object store. Subclasses implement the blocking
+    primitives, which are always run in a worker thread."""
+
+    @abstractmethod
+    def _exists(self, key: str) -> bool: ...
+
+    @abstractmethod
+    def _put(self, key: str, file: BinaryIO, size: int, content_type: str): ...
+
+    @abstractmethod
+    def _open(self, key: str, start: int, length: int | None): ...
+
+    @abstractmethod
+    def _delete(self, key: str): ...
+
+    async def exists(self, key: str) -> bool:
+        return await asyncio.to_thread(self._exists, key)
+
+    async def delete(self, key: str):
+        await asyncio.to_thread(self._delete, key)
+
+    async def store(self, file: BinaryIO, content_type: str, prefix: str = "audio") -> StoredBlob:
+        """Stores a seekable file under the sha256 of its content. Identical
+        content is only uploaded once."""
+
+        def digest() -> tuple[str, int]:
+            file.seek(0)
+            sha256 = hashlib.sha256()
+            size = 0
+            while chunk := file.read(CHUNK_SIZE):
+                sha256.update(chunk)
+                size += len(chunk)
+            file.seek(0)
+            return sha256.hexdigest(), size
+
+        content_hash, size = await asyncio.to_thread(digest)
+        key = f"{prefix}/{content_hash[:2]}/{content_hash}"
+
+        if not await self.exists(key):
+            await asyncio.to_thread(self._put, key, file, size, content_type)
+
+        return StoredBlob(key=key, size=size, content_type=content_type)
+
+    async def store_bytes(self, data: bytes, content_type: str, prefix: str = "audio") -> StoredBlob:
+        with tempfile.SpooledTemporaryFile(max_size=len(data) + 1) as file:
+            file.write(data)
+            return await self.store(file, content_type=content_type, prefix=prefix)
+
+    async def iter_range(self, key: str, start: int = 0, length: int | None = None, chunk_size: int = CHUNK_SIZE):
+        reader = await asyncio.to_thread(self._open, key, start, length)
+
+        try:
+            while chunk := await asyncio.to_thread(reader.read, chunk_size):
+                yield chunk
+        finally:
+            await asyncio.to_thread(reader.close)
+
+    async def read(self, key: str) -> bytes:
+        return b"".join([chunk async for chunk in self.iter_range(key)])
+
+
+class LocalBlobStorage(BlobStorage):
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, *key.split("/"))
+
+    def _exists(self, key: str) -> bool:
+        return os.path.exists(self._path(key))
+
+    def _put(self, key: str, file: BinaryIO, size: int, content_type: str):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # write next to the destination and rename, readers never see a partial blob
+        with tempfile.NamedTemporaryFile(dir=os.path.dirname(path), delete=False) as tmp:
+            while chunk := file.read(CHUNK_SIZE):
+                tmp.write(chunk)
+
+        os.replace(tmp.name, path)
+
+    def _open(self, key: str, start: int, length: int | None):
+        file = open(self._path(key), "rb")
+        file.seek(start)
+        return _LimitedReader(file, length)
+
+    def _delete(self, key: str):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+
+class S3BlobStorage(BlobStorage):
+
+    def __init__(self, endpoint: str, access_key: str, secret_key: str, bucket: str, secure: bool):
+        self.bucket = bucket
+        self.client = Minio(endpoint, access_key=access_key, secret_key=secret_key, secure=secure)
+        self._bucket_ready = False
+        self._bucket_lock = threading.Lock()
+
+    def _ensure_bucket(self):
+        # on the first write, from a worker thread like every other call
+        with self._bucket_lock:
+            if not self._bucket_ready:
+                if not self.client.bucket_exists(self.bucket):
+                    self.client.make_bucket(self.bucket)
+                self._bucket_ready = True
+
+    def _exists(self, key: str) -> bool:
+        try:
+            self.client.stat_object(self.bucket, key)
+            return True
+        except S3Error as e:
+            if e.code in ("NoSuchKey", "NoSuchObject", "NoSuchBucket"):
+                return False
+            raise
+
+    def _put(self, key: str, file: BinaryIO, size: int, content_type: str):
+        self._ensure_bucket()
+        self.client.put_object(self.bucket, key, file, length=size, content_type=content_type)
+
+    def _open(self, key: str, start: int, length: int | None):
+        return _S3Reader(self.client.get_object(self.bucket, key, offset=start, length=length or 0))
+
+    def _delete(self, key: str):
+        self.client.remove_object(self.bucket, key)
+
+
+_storage: BlobStorage | None = None
+
+
+def get_storage() -> BlobStorage:
+    global _storage
+
+    if _storage is None:
+        if BLOB_STORAGE_BACKEND == "s3":
+            _storage = S3BlobStorage(
+                endpoint=S3_ENDPOINT,
+                access_key=S3_ACCESS_KEY,
+                secret_key=S3_SECRET_KEY,
+                bucket=S3_BUCKET,
+                secure=S3_SECURE,
+            )
+        elif BLOB_STORAGE_BACKEND == "local":
+            _storage = LocalBlobStorage(root=BLOB_STORAGE_PATH)
+        else:
+            raise ValueError(f"Unknown BLOB_STORAGE_BACKEND: {BLOB_STORAGE_BACKEND}")
+
+    return _storage
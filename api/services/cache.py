@@ -0,0 +1,72 @@
+import time
+
+from collections import OrderedDict
+from services import metrics
+
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Bounded in-process LRU where every entry expires after its own TTL.
+
+    A `name` reports its lookups and size on /metrics (cache_lookups_total, cache_entries)."""
+
+    def __init__(self, maxsize: int, ttl: float, name: str | None = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict = OrderedDict()
+
+        self._hits = metrics.CACHE_LOOKUPS.labels(name, "hit") if name else None
+        self._misses = metrics.CACHE_LOOKUPS.labels(name, "miss") if name else None
+        self._entries = metrics.CACHE_ENTRIES.labels(name) if name else None
+
+    def _record_size(self):
+        if self._entries is not None:
+            self._entries.set(len(self._data))
+
+    def get(self, key, default=None):
+        entry = self._data.get(key, _MISSING)
+
+        if entry is _MISSING or entry[0] <= time.monotonic():
+            if entry is not _MISSING:
+                del self._data[key]
+                self._record_size()
+            if self._misses is not None:
+                self._misses.inc()
+            return default
+
+        self._data.move_to_end(key)
+        if self._hits is not None:
+            self._hits.inc()
+        return entry[1]
+
+    def set(self, key, value, ttl: float | None = None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else min(ttl, self.ttl))
+
+        self._data[key] = (expires_at, value)
+        self._data.move_to_end(key)
+
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+        self._record_size()
+
+    def pop(self, key, default=None):
+        entry = self._data.pop(key, _MISSING)
+        if entry is _MISSING:
+            return default
+
+        self._record_size()
+        return entry[1]
+
+    def clear(self):
+        self._data.clear()
+        self._record_size()
+
+    def __contains__(self, key) -> bool:
+        entry = self._data.get(key, _MISSING)
+        return entry is not _MISSING and entry[0] > time.monotonic()
+
+    def __len__(self):
+        return len(self._data)
@@ -0,0 +1,215 @@
+import io
+import os
+import re
+import json
+import asyncio
+import logging
+
+from services import metrics, profile_cache, tool_service
+from database.models import Tool as ToolModel
+
+
+CLASSIFICATION_MODEL = "gpt-4o-mini"
+
+CLASSIFICATION_BATCH_SIZE = int(os.getenv("CLASSIFICATION_BATCH_SIZE", "20"))
+CLASSIFICATION_CONCURRENCY = int(os.getenv("CLASSIFICATION_CONCURRENCY", "4"))
+
+# every site of a packed request shares the context window
+BATCH_SITE_CONTENT_CHARS = int(os.getenv("BATCH_SITE_CONTENT_CHARS", "6000"))
+
+
+BATCH_PROMPT = """You will be given the content of several websites, each wrapped in a <website> tag with an id. For each website, identify the name of the product being described and determine its category (e.g., "front-end framework", "programming language", "database system", etc.).
+
+{{WEBSITES}}
+
+For every website, look for prominent mentions of a product name (headings, titles, first paragraph) and analyze its description and features to determine its category.
+
+Format your response as one <result> tag per website, reusing the website id:
+
+<result id="1">
+   <name>Insert the product name here</name>
+   <category>Insert the product category here</category>
+</result>
+
+Remember:
+- The product name should be the specific name of the tool or technology, not a generic description.
+- The category should be a brief (1-4 words) description of the type of product, such as "front-end framework", "programming language", or "database system".
+- If you cannot confidently determine either the name or the category, use "Unknown" as the value.
+- Answer for every website, in any order.
+
+Provide only the <result> tags without any additional explanation or commentary."""
+
+
+def _parse_batch_completion(completion: str) -> dict[int, dict]:
+    results = {}
+
+    for match in re.finditer(r'<result id="(\d+)">(.*?)</result>', completion, re.DOTALL):
+        results[int(match.group(1))] = {
+            "name": tool_service.extract_tag_content(text=match.group(2), tag_name="name"),
+            "category": tool_service.extract_tag_content(text=match.group(2), tag_name="category"),
+        }
+
+    return results
+
+
+async def classify_batch(sites: dict[int, str]) -> dict[int, dict]:
+    """Classifies several websites (id -> content) with a single completion."""
+
+    websites = "\n\n".join(
+        f'<website id="{site_id}">\n{content[:BATCH_SITE_CONTENT_CHARS]}\n</website>'
+        for site_id, content in sites.items()
+    )
+
+    with metrics.time_outbound("openai"):
+        completion = (await tool_service.openai_client.chat.completions.create(
+            model=CLASSIFICATION_MODEL,
+            messages=[
+                {"role": "user", "content": BATCH_PROMPT.replace("{{WEBSITES}}", websites)}
+            ],
+            timeout=120,
+        )).choices[0].message.content
+
+    results = _parse_batch_completion(completion)
+
+    if missing := set(sites) - set(results):
+        logging.warning(f"Batch classification is missing results: {sorted(missing)=}")
+
+    return results
+
+
+async def classify_many(
+    sites: dict[int, str],
+    batch_size: int = CLASSIFICATION_BATCH_SIZE,
+    concurrency: int = CLASSIFICATION_CONCURRENCY,
+) -> dict[int, dict]:
+    """Packs sites into batches classified with bounded concurrency. Sites
+    of a failed batch, or missing from its answer, fall back to one request
+    each."""
+
+    semaphore = asyncio.Semaphore(concurrency)
+    site_ids = list(sites)
+    results = {}
+
+    async def classify_one(site_id: int):
+        async with semaphore:
+            try:
+                results[site_id] = await tool_service.classify_website(content=sites[site_id])
+            except Exception:
+                logging.exception(f"Couldn't classify website: {site_id=}")
+
+    async def classify_chunk(chunk: list[int]):
+        async with semaphore:
+            try:
+                results.update(await classify_batch({site_id: sites[site_id] for site_id in chunk}))
+            except Exception:
+                logging.exception(f"Batch classification failed, falling back to one request per site: {len(chunk)=}")
+
+        await asyncio.gather(*[classify_one(site_id) for site_id in chunk if site_id not in results])
+
+    await asyncio.gather(*[
+        classify_chunk(site_ids[i:i + batch_size])
+        for i in range(0, len(site_ids), batch_size)
+    ])
+
+    return results
+
+
+async def submit_offline_batch(sites: dict[int, str]) -> str:
+    """Submits one completion per site to the OpenAI Batch API (24h window,
+    half the price of the synchronous API) and returns the batch id."""
+
+    lines = [
+        json.dumps({
+            "custom_id": str(site_id),
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": {
+                "model": CLASSIFICATION_MODEL,
+                "messages": [
+                    {"role": "user", "content": tool_service.PRODUCT_INFO_PROMPT.replace("{{WEBSITE_CONTENT}}", content)}
+                ],
+            },
+        })
+        for site_id, content in sites.items()
+    ]
+
+    input_file = await tool_service.openai_client.files.create(
+        file=("tools.jsonl", io.BytesIO("\n".join(lines).encode())),
+        purpose="batch",
+    )
+
+    batch = await tool_service.openai_client.batches.create(
+        input_file_id=input_file.id,
+        endpoint="/v1/chat/completions",
+        completion_window="24h",
+    )
+
+    return batch.id
+
+
+async def collect_offline_batch(batch_id: str) -> dict[int, dict] | None:
+    """Returns the results of a finished offline batch, None while it is still running."""
+
+    batch = await tool_service.openai_client.batches.retrieve(batch_id)
+
+    if batch.status in ("validating", "in_progress", "finalizing"):
+        return None
+
+    if batch.status != "completed":
+        raise RuntimeError(f"Offline batch {batch_id} ended with status {batch.status}")
+
+    output = await tool_service.openai_client.files.content(batch.output_file_id)
+    results = {}
+
+    for line in output.text.splitlines():
+        item = json.loads(line)
+
+        if item.get("error") or item["response"]["status_code"] != 200:
+            logging.warning(f"Offline classification failed: {item['custom_id']=} {item.get('error')=}")
+            continue
+
+        completion = item["response"]["body"]["choices"][0]["message"]["content"]
+        results[int(item["custom_id"])] = {
+            "name": tool_service.extract_tag_content(text=completion, tag_name="name"),
+            "category": tool_service.extract_tag_content(text=completion, tag_name="category"),
+        }
+
+    return results
+
+
+async def fetch_contents(tools: list[ToolModel], concurrency: int = CLASSIFICATION_CONCURRENCY) -> dict[int, str]:
+    semaphore = asyncio.Semaphore(concurrency)
+    contents = {}
+
+    async def fetch(tool: ToolModel):
+        async with semaphore:
+            try:
+                contents[tool.id] = await tool_service.get_website_content(domain=tool.link)
+            except Exception as e:
+                logging.warning(f"Couldn't fetch website content: {tool.id=} {tool.link=} {e!r}")
+
+    await asyncio.gather(*[fetch(tool) for tool in tools])
+
+    return contents
+
+
+async def save_results(results: dict[int, dict]) -> int:
+    """Writes the names and categories that changed, returns how many tools were updated."""
+
+    tools = await ToolModel.filter(id__in=list(results))
+    changed = []
+
+    for tool in tools:
+        name = results[tool.id]["name"] or "Unknown"
+        category = results[tool.id]["category"] or "Unknown"
+
+        if (tool.name, tool.category) != (name, category):
+            tool.name, tool.category = name, category
+            changed.append(tool)
+
+    if changed:
+        await ToolModel.bulk_update(changed, fields=["name", "category"], batch_size=500)
+        # both are shown on the profiles of the tools' users
+        await profile_cache.bump_tool_users([tool.id for tool in changed])
+
+    return len(changed)
@@ -0,0 +1,197 @@
+import os
+import re
+
+from dataclasses import dataclass
+from html.parser import HTMLParser
+
+
+# hard cap on the bytes read from the reader service, the rest of the body is never downloaded
+CONTENT_MAX_BYTES = int(os.getenv("CONTENT_MAX_BYTES", str(512 * 1024)))
+
+# prompt budget for the website content, the prompt template itself comes on top
+CONTENT_TOKEN_BUDGET = int(os.getenv("CONTENT_TOKEN_BUDGET", "2000"))
+
+CONTENT_MAX_HEADINGS = int(os.getenv("CONTENT_MAX_HEADINGS", "20"))
+CONTENT_MAX_PARAGRAPHS = int(os.getenv("CONTENT_MAX_PARAGRAPHS", "8"))
+
+# rough average for english text with the gpt-4o tokenizer, good enough for budgeting
+CHARS_PER_TOKEN = 4
+
+_MARKDOWN_HEADING = re.compile(r"^#{1,6}\s+(.+)$")
+_MARKDOWN_LINK = re.compile(r"!?\[([^\]]*)\]\([^)]*\)")
+_HTML_HINT = re.compile(r"<(?:!doctype|html|head|body)\b", re.IGNORECASE)
+_USEFUL_META = {"description", "keywords", "application-name", "og:title", "og:site_name", "og:description", "twitter:title", "twitter:description"}
+
+
+@dataclass
+class PreparedContent:
+    text: str
+    raw_bytes: int
+    raw_truncated: bool
+    kept_bytes: int
+    estimated_tokens: int
+    dropped_tokens: int
+
+    @property
+    def dropped_bytes(self) -> int:
+        return self.raw_bytes - self.kept_bytes
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+class _SignalHTMLParser(HTMLParser):
+
+    def __init__(self):
+        super().__init__()
+        self.title = []
+        self.meta = []
+        self.headings = []
+        self.paragraphs = []
+        self._current = None
+        self._buffer = []
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in ("script", "style", "noscript", "svg"):
+            self._skip_depth += 1
+            return
+
+        if tag == "meta":
+            attrs = dict(attrs)
+            name = (attrs.get("name") or attrs.get("property") or "").lower()
+            if name in _USEFUL_META and attrs.get("content"):
+                self.meta.append(f"{name}: {attrs['content'].strip()}")
+            return
+
+        if tag in ("title", "h1", "h2", "h3", "p"):
+            self._current = tag
+            self._buffer = []
+
+    def handle_endtag(self, tag):
+        if tag in ("script", "style", "noscript", "svg"):
+            self._skip_depth = max(0, self._skip_depth - 1)
+            return
+
+        if tag != self._current:
+            return
+
+        text = " ".join("".join(self._buffer).split())
+        self._current = None
+
+        if not text:
+            return
+
+        if tag == "title":
+            self.title.append(text)
+        elif tag == "p":
+            self.paragraphs.append(text)
+        else:
+            self.headings.append(text)
+
+    def handle_data(self, data):
+        if self._current is not None and not self._skip_depth:
+            self._buffer.append(data)
+
+
+def _extract_html_signal(text: str) -> list[str]:
+    parser = _SignalHTMLParser()
+    parser.feed(text)
+    parser.close()
+
+    return [
+        *(f"Title: {title}" for title in parser.title[:1]),
+        *parser.meta,
+        *(f"# {heading}" for heading in parser.headings[:CONTENT_MAX_HEADINGS]),
+        *[paragraph for paragraph in parser.paragraphs if len(paragraph) > 40][:CONTENT_MAX_PARAGRAPHS],
+    ]
+
+
+def _extract_markdown_signal(text: str) -> list[str]:
+    """r.jina.ai answers with a `Title:` / `URL Source:` header followed by the page as markdown."""
+
+    header = []
+    headings = []
+    paragraphs = []
+
+    for block in re.split(r"\n\s*\n", text):
+        block = _MARKDOWN_LINK.sub(r"\1", block).strip()
+
+        if not block:
+            continue
+
+        if block.startswith(("Title:", "Description:")):
+            header.append(" ".join(block.split()))
+            continue
+
+        if block.startswith(("URL Source:", "Published Time:", "Markdown Content:")):
+            continue
+
+        for line in block.splitlines():
+            if match := _MARKDOWN_HEADING.match(line.strip()):
+                headings.append(f"# {match.group(1).strip()}")
+
+        prose = " ".join(line.strip() for line in block.splitlines() if not _MARKDOWN_HEADING.match(line.strip()))
+
+        # skip navigation bars, link lists and other short fragments
+        if len(prose) > 40 and sum(c.isalpha() for c in prose) > 0.5 * len(prose):
+            paragraphs.append(" ".join(prose.split()))
+
+    return [
+        *header,
+        *headings[:CONTENT_MAX_HEADINGS],
+        *paragraphs[:CONTENT_MAX_PARAGRAPHS],
+    ]
+
+
+def _fit_to_budget(parts: list[str], token_budget: int) -> str:
+    kept = []
+    used = 0
+
+    for part in parts:
+        tokens = estimate_tokens(part) + 1
+
+        if used + tokens > token_budget:
+            remaining = token_budget - used
+            # cut the first part that doesn't fit at a word boundary, drop everything after it
+            if remaining > 16:
+                kept.append(part[:remaining * CHARS_PER_TOKEN].rsplit(" ", 1)[0] + " …")
+            break
+
+        kept.append(part)
+        used += tokens
+
+    return "\n\n".join(kept)
+
+
+def prepare_content(
+    raw: bytes,
+    raw_truncated: bool = False,
+    token_budget: int = CONTENT_TOKEN_BUDGET,
+) -> PreparedContent:
+    """Keeps the part of a web page useful to name and categorize a product
+    (title, meta/og tags, headings, first paragraphs) within a token budget."""
+
+    text = raw.decode("utf-8", errors="replace")
+
+    if _HTML_HINT.search(text[:2048]):
+        parts = _extract_html_signal(text)
+    else:
+        parts = _extract_markdown_signal(text)
+
+    if not parts:
+        # nothing recognizable, fall back to the beginning of the page
+        parts = [" ".join(text.split())]
+
+    prepared = _fit_to_budget(parts, token_budget=token_budget)
+    estimated_tokens = estimate_tokens(prepared)
+
+    return PreparedContent(
+        text=prepared,
+        raw_bytes=len(raw),
+        raw_truncated=raw_truncated,
+        kept_bytes=len(prepared.encode()),
+        estimated_tokens=estimated_tokens,
+        dropped_tokens=max(0, estimate_tokens(text) - estimated_tokens),
+    )
@@ -0,0 +1,123 @@
+import os
+import logging
+
+from dataclasses import dataclass
+from fastapi import HTTPException
+from tortoise.exceptions import IntegrityError
+from datetime import datetime, timezone, timedelta
+from services import metrics
+from services.cache import TTLCache
+from database.models import DomainMetadata as DomainMetadataModel
+
+
+VERIFY = "verify"
+FAVICON = "favicon"
+PRODUCT_INFO = "product_info"
+
+TTLS = {
+    VERIFY: timedelta(hours=int(os.getenv("DOMAIN_CACHE_VERIFY_TTL_HOURS", "24"))),
+    FAVICON: timedelta(hours=int(os.getenv("DOMAIN_CACHE_FAVICON_TTL_HOURS", str(24 * 7)))),
+    PRODUCT_INFO: timedelta(hours=int(os.getenv("DOMAIN_CACHE_PRODUCT_INFO_TTL_HOURS", str(24 * 30)))),
+}
+
+# failures ("couldn't reach domain") are remembered for much less time than successes
+NEGATIVE_TTL = timedelta(minutes=int(os.getenv("DOMAIN_CACHE_NEGATIVE_TTL_MINUTES", "10")))
+
+_lru = TTLCache(
+    maxsize=int(os.getenv("DOMAIN_CACHE_SIZE", "4096")),
+    ttl=int(os.getenv("DOMAIN_CACHE_LRU_TTL", "3600")),
+    name="domain_metadata",
+)
+
+# lookups that reach the `domain_metadata` table
+_db_hits = metrics.CACHE_LOOKUPS.labels("domain_metadata_db", "hit")
+_db_misses = metrics.CACHE_LOOKUPS.labels("domain_metadata_db", "miss")
+
+
+@dataclass
+class _Entry:
+    value: dict | None
+    is_negative: bool = False
+    status_code: int | None = None
+    error: str | None = None
+
+    def unwrap(self):
+        if self.is_negative:
+            raise HTTPException(status_code=self.status_code, detail=self.error)
+
+        return self.value
+
+
+def _key(domain: str, kind: str) -> tuple[str, str]:
+    return domain.lower(), kind
+
+
+async def load(domain: str):
+    """Warms the in-process tier with every fresh entry of a domain, in one query."""
+
+    missing_kinds = [kind for kind in TTLS if _key(domain, kind) not in _lru]
+
+    if not missing_kinds:
+        return
+
+    now = datetime.now(timezone.utc)
+    rows = await DomainMetadataModel.filter(
+        domain=domain.lower(),
+        kind__in=missing_kinds,
+        expires_at__gt=now,
+    )
+
+    _db_hits.inc(len(rows))
+    _db_misses.inc(len(missing_kinds) - len(rows))
+
+    for row in rows:
+        _lru.set(
+            _key(domain, row.kind),
+            _Entry(value=row.value, is_negative=row.is_negative, status_code=row.status_code, error=row.error),
+            ttl=(row.expires_at - now).total_seconds(),
+        )
+
+
+async def _store(domain: str, kind: str, entry: _Entry, ttl: timedelta):
+    _lru.set(_key(domain, kind), entry, ttl=ttl.total_seconds())
+
+    try:
+        await DomainMetadataModel.update_or_create(
+            domain=domain.lower(),
+            kind=kind,
+            defaults={
+                "value": entry.value,
+                "is_negative": entry.is_negative,
+                "status_code": entry.status_code,
+                "error": entry.error,
+                "expires_at": datetime.now(timezone.utc) + ttl,
+            },
+        )
+    except IntegrityError:
+        # another worker stored the same entry concurrently
+        pass
+
+
+async def cached(kind: str, domain: str, fetch):
+    """Returns the cached result of `fetch()` for a domain, calling it on a miss.
+
+    Client errors (4xx HTTPException) are cached as negative entries and
+    re-raised on every hit until they expire. Server errors are not cached.
+    """
+
+    entry = _lru.get(_key(domain, kind))
+
+    if entry is not None:
+        return entry.unwrap()
+
+    try:
+        value = await fetch()
+    except HTTPException as e:
+        if e.status_code < 500:
+            logging.info(f"Caching negative domain metadata: {domain=} {kind=} {e.detail=}")
+            await _store(domain, kind, _Entry(value=None, is_negative=True, status_code=e.status_code, error=e.detail), ttl=NEGATIVE_TTL)
+        raise
+
+    await _store(domain, kind, _Entry(value=value), ttl=TTLS[kind])
+
+    return value
@@ -1,19 +1,136 @@
+"""Outgoing emails go through the `email_outbox` table: requests only
+insert a row and return. A background sender claims up to EMAIL_BATCH_SIZE
+pending emails at a time and posts them to Mailjet in a single v3.1 call
+(`Messages` array).
+
+Whole-call failures (network, 429, 5xx) are retried with exponential
+backoff, EMAIL_MAX_ATTEMPTS times at most. Emails Mailjet rejects
+individually, and the ones out of attempts, are dead-lettered (`dead`)
+with the error kept for inspection.
+"""
 import os
+import json
+import asyncio
 import logging
+import aiohttp
+
+from datetime import datetime, timezone, timedelta
+from schemas.email_outbox import EmailStatus
+from services import background, http_client
+from database.models import EmailOutbox as EmailOutboxModel
+
+
+# point it to a local stand-in (scripts/fake_mailjet.py) outside of production
+MAILJET_API_URL = os.getenv("MAILJET_API_URL", "https://api.mailjet.com/v3.1/send")
+MAILJET_API_KEY = os.getenv("MAILJET_API_KEY")
+MAILJET_SECRET_KEY = os.getenv("MAILJET_SECRET_KEY")
+
+# Mailjet accepts up to 50 messages per call
+EMAIL_BATCH_SIZE = min(int(os.getenv("EMAIL_BATCH_SIZE", "50")), 50)
+EMAIL_POLL_INTERVAL = float(os.getenv("EMAIL_POLL_INTERVAL", "5"))
+EMAIL_MAX_ATTEMPTS = int(os.getenv("EMAIL_MAX_ATTEMPTS", "6"))
+EMAIL_RETRY_BASE = float(os.getenv("EMAIL_RETRY_BASE", "10"))
+EMAIL_SEND_TIMEOUT = float(os.getenv("EMAIL_SEND_TIMEOUT", "30"))
+
+# lease of a batch being sent, see background.JobQueue
+EMAIL_CLAIM_TIMEOUT = timedelta(seconds=int(os.getenv("EMAIL_CLAIM_TIMEOUT", "300")))
+
+queue = background.JobQueue(
+    EmailOutboxModel,
+    pending=EmailStatus.PENDING,
+    running=EmailStatus.SENDING,
+    lease=EMAIL_CLAIM_TIMEOUT,
+)
 
-from mailjet_rest import Client
+# emails enqueued by this worker are sent right away instead of at the next poll
+_wakeup = asyncio.Event()
 
 
-mailjet_client = Client(
-    auth=(
-        os.getenv("MAILJET_API_KEY"),
-        os.getenv("MAILJET_SECRET_KEY"),
-    ),
-    version='v3.1',
-)
+async def enqueue(message: dict) -> EmailOutboxModel:
+    email = await EmailOutboxModel.create(message=message)
+    _wakeup.set()
+
+    return email
+
+
+async def claim_batch() -> list[EmailOutboxModel]:
+    return await queue.claim(limit=EMAIL_BATCH_SIZE)
+
+
+async def _retry_later(emails: list[EmailOutboxModel], error: str):
+    now = datetime.now(timezone.utc)
+
+    for email in emails:
+        if email.attempts >= EMAIL_MAX_ATTEMPTS:
+            logging.error(f"Email failed too many times, dead-lettering it: {email.id=} {error=}")
+            await EmailOutboxModel.filter(id=email.id).update(status=EmailStatus.DEAD, error=error)
+            continue
+
+        await EmailOutboxModel.filter(id=email.id).update(
+            status=EmailStatus.PENDING,
+            error=error,
+            run_after=now + background.retry_delay(email.attempts, base=EMAIL_RETRY_BASE),
+        )
+
+
+async def send_batch(emails: list[EmailOutboxModel]):
+    try:
+        response = await http_client.post(
+            MAILJET_API_URL,
+            json={"Messages": [email.message for email in emails]},
+            auth=aiohttp.BasicAuth(MAILJET_API_KEY or "", MAILJET_SECRET_KEY or ""),
+            timeout=EMAIL_SEND_TIMEOUT,
+            service="mailjet",
+        )
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        logging.warning(f"Couldn't reach mailjet ({type(e).__name__}): {len(emails)=}")
+        await _retry_later(emails, error=type(e).__name__)
+        return
+
+    # a 400 still has a result per message when only some of them were rejected
+    try:
+        results = response.json()["Messages"] if response.status_code in (200, 400) else None
+    except (ValueError, KeyError, TypeError):
+        results = None
 
+    if results is None or len(results) != len(emails):
+        logging.warning(f"Mailjet call failed ({response.status_code}): {len(emails)=} {response.text[:500]}")
+        await _retry_later(emails, error=f"{response.status_code}: {response.text[:500]}")
+        return
 
-def send_confirmation_email(
+    sent = []
+
+    for email, result in zip(emails, results):
+        if result.get("Status") == "success":
+            sent.append(email.id)
+            continue
+
+        error = json.dumps(result.get("Errors"))
+        logging.error(f"Mailjet rejected email, dead-lettering it: {email.id=} {error=}")
+        await EmailOutboxModel.filter(id=email.id).update(status=EmailStatus.DEAD, error=error)
+
+    if sent:
+        await EmailOutboxModel.filter(id__in=sent).update(
+            status=EmailStatus.SENT,
+            error=None,
+            sent_at=datetime.now(timezone.utc),
+        )
+
+    logging.info(f"Email batch sent: sent={len(sent)} rejected={len(emails) - len(sent)}")
+
+
+def start_sender():
+    background.start_queue_workers(
+        "email-sender",
+        queue,
+        send_batch,
+        poll_interval=EMAIL_POLL_INTERVAL,
+        batch_size=EMAIL_BATCH_SIZE,
+        wakeup=_wakeup,
+    )
+
+
+async def send_confirmation_email(
     email, verification_endpoint,
 ):
 
@@ -46,31 +163,24 @@ If you didn't create an account with us, please disregard this email.
 Best regards,
 AppSquad"""
 
-    data = {
-        'Messages': [{
-            "Subject": "Verify Email Address",
-
-            "From": {
-                "Email": sender_email,
-                "Name": sender_name,
-            },
-            "To": [{
-                "Email": email,
-                "Name": "You"
-            }],
+    await enqueue({
+        "Subject": "Verify Email Address",
 
-            "TextPart": text_content,
-            "HTMLPart": html_content,
-        }]
-    }
+        "From": {
+            "Email": sender_email,
+            "Name": sender_name,
+        },
+        "To": [{
+            "Email": email,
+            "Name": "You"
+        }],
 
-    result = mailjet_client.send.create(data=data)
+        "TextPart": text_content,
+        "HTMLPart": html_content,
+    })
 
-    if result.status_code != 200:
-        logging.error(f"mailjet sent non-200 status code ({result.status_code}): {result.json()}")
 
-
-def send_password_reset_email(email, reset_endpoint):
+async def send_password_reset_email(email, reset_endpoint):
     sender_email = "no-reply@appsquad.com"
     sender_name = "No reply"
 
@@ -103,50 +213,36 @@ If you didn't request a password reset, please contact our support team immediat
 Best regards,
 AppSquad"""
 
-    data = {
-        'Messages': [{
-            "Subject": "Password Reset Request",
-            "From": {
-                "Email": sender_email,
-                "Name": sender_name,
-            },
-            "To": [{
-                "Email": email,
-                "Name": "You"
-            }],
-            "TextPart": text_content,
-            "HTMLPart": html_content,
-        }]
-    }
-
-    result = mailjet_client.send.create(data=data)
-
-    if result.status_code != 200:
-        logging.error(f"mailjet sent non-200 status code ({result.status_code}): {result.json()}")
+    await enqueue({
+        "Subject": "Password Reset Request",
+        "From": {
+            "Email": sender_email,
+            "Name": sender_name,
+        },
+        "To": [{
+            "Email": email,
+            "Name": "You"
+        }],
+        "TextPart": text_content,
+        "HTMLPart": html_content,
+    })
 
 
 async def send_feedback_by_email(feedback, rating, user_email: str):
     subject = f"New Feedback (Rating: {rating}/5)"
     content = f"User Email: {user_email}\n\nRating: {rating}/5\n\nFeedback:\n{feedback}"
 
-    data = {
-        'Messages': [{
-            "From": {
-                "Email": "no-reply@appsquad.com",
-                "Name": "AppSquad Feedback"
-            },
-            "To": [{
-                "Email": "vltn.dematos@gmail.com",
-                "Name": "Feedback Recipient"
-            }],
-            "Subject": subject,
-            "TextPart": content,
-        }]
-    }
-
-    response = mailjet_client.send.create(data=data)
-
-    if response.status_code != 200:
-        raise Exception("Failed to send feedback email")
+    await enqueue({
+        "From": {
+            "Email": "no-reply@appsquad.com",
+            "Name": "AppSquad Feedback"
+        },
+        "To": [{
+            "Email": "vltn.dematos@gmail.com",
+            "Name": "Feedback Recipient"
+        }],
+        "Subject": subject,
+        "TextPart": content,
+    })
 
     return {"message": "Feedback submitted successfully"}
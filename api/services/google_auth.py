@@ -0,0 +1,174 @@
+"""Google OpenID Connect: discovery document, signing keys and local
+verification of the `id_token` returned by the token exchange.
+
+The discovery document and the JWKS are cached for as long as their
+Cache-Control allows and refreshed in the background before they expire.
+A token signed with a key we don't know yet (rotation) triggers a refresh,
+at most once every GOOGLE_KEYS_MIN_REFRESH_INTERVAL seconds. Between two
+refreshes such a token raises GoogleAuthError, not InvalidTokenError: it
+can't be checked locally, which doesn't make it invalid.
+"""
+import os
+import re
+import time
+import asyncio
+import logging
+import aiohttp
+import jwt
+
+from dataclasses import dataclass
+from services import background, http_client
+
+
+GOOGLE_DISCOVERY_URL = os.getenv("GOOGLE_DISCOVERY_URL", "https://accounts.google.com/.well-known/openid-configuration")
+GOOGLE_ISSUERS = {"https://accounts.google.com", "accounts.google.com"}
+
+# used until the discovery document could be fetched once
+DEFAULT_ENDPOINTS = {
+    "token_endpoint": "https://oauth2.googleapis.com/token",
+    "userinfo_endpoint": "https://openidconnect.googleapis.com/v1/userinfo",
+}
+
+GOOGLE_KEYS_DEFAULT_TTL = int(os.getenv("GOOGLE_KEYS_DEFAULT_TTL", "3600"))
+GOOGLE_KEYS_MIN_REFRESH_INTERVAL = int(os.getenv("GOOGLE_KEYS_MIN_REFRESH_INTERVAL", "30"))
+
+# refresh this long before expiry, so requests never wait on it
+REFRESH_MARGIN = 300
+
+# tolerated clock difference with Google on exp/iat
+LEEWAY = 60
+
+_MAX_AGE = re.compile(r"max-age=(\d+)")
+
+
+class GoogleAuthError(Exception):
+    pass
+
+
+@dataclass
+class _Cached:
+    value: dict
+    expires_at: float
+
+    @property
+    def is_fresh(self) -> bool:
+        return self.expires_at > time.monotonic()
+
+
+_discovery: _Cached | None = None
+_jwks: _Cached | None = None
+_keys: dict[str, jwt.PyJWK] = {}
+_last_keys_refresh = 0.0
+_refresh_lock = asyncio.Lock()
+
+
+def _ttl(headers: dict) -> float:
+    headers = {name.lower(): value for name, value in headers.items()}
+    match = _MAX_AGE.search(headers.get("cache-control", ""))
+
+    if match is None:
+        return GOOGLE_KEYS_DEFAULT_TTL
+
+    return max(0, int(match.group(1)) - int(headers.get("age", "0") or 0))
+
+
+async def _fetch(url: str) -> _Cached:
+    response = await http_client.get(url, timeout=5, service="google_keys")
+
+    if response.status_code != 200:
+        raise GoogleAuthError(f"{url} answered {response.status_code}")
+
+    return _Cached(value=response.json(), expires_at=time.monotonic() + _ttl(response.headers))
+
+
+async def get_discovery() -> dict:
+    global _discovery
+
+    if _discovery is None or not _discovery.is_fresh:
+        async with _refresh_lock:
+            if _discovery is None or not _discovery.is_fresh:
+                _discovery = await _fetch(GOOGLE_DISCOVERY_URL)
+
+    return _discovery.value
+
+
+async def get_endpoint(name: str) -> str:
+    """An endpoint of the discovery document, the well-known default when
+    the document can't be fetched."""
+
+    try:
+        return (await get_discovery()).get(name) or DEFAULT_ENDPOINTS[name]
+    except (GoogleAuthError, aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+        logging.warning(f"Couldn't fetch google discovery document ({type(e).__name__}), using default {name}")
+        return DEFAULT_ENDPOINTS[name]
+
+
+async def refresh_keys():
+    global _discovery, _jwks, _keys, _last_keys_refresh
+
+    async with _refresh_lock:
+        _last_keys_refresh = time.monotonic()
+
+        if _discovery is None or not _discovery.is_fresh:
+            _discovery = await _fetch(GOOGLE_DISCOVERY_URL)
+
+        jwks = await _fetch(_discovery.value["jwks_uri"])
+        _keys = {key["kid"]: jwt.PyJWK(key) for key in jwks.value.get("keys", []) if "kid" in key}
+        _jwks = jwks
+
+    logging.info(f"Google signing keys refreshed: kids={list(_keys)} ttl={jwks.expires_at - time.monotonic():.0f}s")
+
+
+async def _get_key(kid: str) -> jwt.PyJWK:
+    stale = _jwks is None or not _jwks.is_fresh
+
+    if (stale or kid not in _keys) and time.monotonic() - _last_keys_refresh > GOOGLE_KEYS_MIN_REFRESH_INTERVAL:
+        await refresh_keys()
+
+    if _jwks is None:
+        raise GoogleAuthError("Google signing keys unavailable")
+
+    if kid not in _keys:
+        # rotated since our last refresh, the caller checks the token some other way until the next one
+        raise GoogleAuthError(f"Unknown signing key: {kid=}")
+
+    return _keys[kid]
+
+
+async def verify_id_token(id_token: str, audience: str) -> dict:
+    """The claims of a Google ID token, after checking its signature,
+    audience, issuer and expiry. Raises jwt.InvalidTokenError, or
+    GoogleAuthError when the signing key can't be obtained."""
+
+    header = jwt.get_unverified_header(id_token)
+    key = await _get_key(header.get("kid", ""))
+
+    claims = jwt.decode(
+        id_token,
+        key.key,
+        algorithms=["RS256"],
+        audience=audience,
+        leeway=LEEWAY,
+        options={"require": ["exp", "iat", "iss", "aud", "sub"]},
+    )
+
+    if claims["iss"] not in GOOGLE_ISSUERS | {(_discovery.value if _discovery else {}).get("issuer")}:
+        raise jwt.InvalidIssuerError(f"Invalid issuer: {claims['iss']}")
+
+    return claims
+
+
+async def run_refresher():
+    while True:
+        try:
+            await refresh_keys()
+            delay = max(GOOGLE_KEYS_MIN_REFRESH_INTERVAL, _jwks.expires_at - time.monotonic() - REFRESH_MARGIN)
+        except (GoogleAuthError, aiohttp.ClientError, asyncio.TimeoutError, ValueError, KeyError) as e:
+            logging.warning(f"Couldn't refresh google signing keys ({type(e).__name__}), retrying in 60s")
+            delay = 60
+
+        await asyncio.sleep(delay)
+
+
+def start_refresher():
+    background.start("google-keys-refresher", run_refresher)
@@ -0,0 +1,199 @@
+import os
+import json
+import time
+import random
+import asyncio
+import logging
+import aiohttp
+
+from dataclasses import dataclass
+from yarl import URL
+from services import metrics
+
+
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "10"))
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "2"))
+HTTP_POOL_LIMIT = int(os.getenv("HTTP_POOL_LIMIT", "100"))
+HTTP_POOL_LIMIT_PER_HOST = int(os.getenv("HTTP_POOL_LIMIT_PER_HOST", "10"))
+HTTP_DNS_CACHE_TTL = int(os.getenv("HTTP_DNS_CACHE_TTL", "300"))
+HTTP_KEEPALIVE_TIMEOUT = float(os.getenv("HTTP_KEEPALIVE_TIMEOUT", "30"))
+
+# only idempotent requests are retried, a google authorization code can't be exchanged twice
+RETRYABLE_METHODS = {"GET", "HEAD", "OPTIONS"}
+RETRYABLE_STATUS_CODES = {502, 503, 504}
+
+USER_AGENT = "anyrecs/1.0"
+
+
+@dataclass
+class HTTPResponse:
+    status_code: int
+    url: str
+    headers: dict
+    content: bytes
+    # set when the body was cut at `max_bytes`
+    truncated: bool = False
+
+    @property
+    def text(self) -> str:
+        return self.content.decode("utf-8", errors="replace")
+
+    def json(self):
+        return json.loads(self.content)
+
+
+_session: aiohttp.ClientSession | None = None
+
+
+async def open_session():
+    global _session
+
+    if _session is not None:
+        return
+
+    connector = aiohttp.TCPConnector(
+        limit=HTTP_POOL_LIMIT,
+        limit_per_host=HTTP_POOL_LIMIT_PER_HOST,
+        use_dns_cache=True,
+        ttl_dns_cache=HTTP_DNS_CACHE_TTL,
+        keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT,
+    )
+
+    _session = aiohttp.ClientSession(
+        connector=connector,
+        timeout=aiohttp.ClientTimeout(total=HTTP_TIMEOUT),
+        headers={"User-Agent": USER_AGENT},
+    )
+
+
+async def close_session():
+    global _session
+
+    if _session is None:
+        return
+
+    await _session.close()
+    _session = None
+
+
+def _collect_pool_metrics():
+    if _session is None:
+        return
+
+    connector = _session.connector
+    # hosts come from user-submitted links, only the busiest one is reported
+    per_host = [len(connections) for connections in connector._acquired_per_host.values()]
+
+    metrics.HTTP_CLIENT_CONNECTIONS.labels("in_use").set(len(connector._acquired))
+    metrics.HTTP_CLIENT_CONNECTIONS.labels("limit").set(connector.limit)
+    metrics.HTTP_CLIENT_HOST_CONNECTIONS.labels("in_use").set(max(per_host, default=0))
+    metrics.HTTP_CLIENT_HOST_CONNECTIONS.labels("limit").set(connector.limit_per_host)
+
+
+metrics.add_collector(_collect_pool_metrics)
+
+
+def _get_session() -> aiohttp.ClientSession:
+    if _session is None:
+        raise RuntimeError("http client is not opened, call http_client.open_session() first (see main.lifespan)")
+
+    return _session
+
+
+async def _read_body(response: aiohttp.ClientResponse, max_bytes: int | None) -> tuple[bytes, bool]:
+    if max_bytes is None:
+        return await response.read(), False
+
+    chunks = []
+    size = 0
+
+    async for chunk in response.content.iter_chunked(64 * 1024):
+        chunks.append(chunk)
+        size += len(chunk)
+
+        if size >= max_bytes:
+            # the rest of the body is never read, the connection is dropped instead of reused
+            return b"".join(chunks)[:max_bytes], size > max_bytes or not response.content.at_eof()
+
+    return b"".join(chunks), False
+
+
+async def request(
+    method: str,
+    url: str,
+    *,
+    timeout: float | None = None,
+    retries: int | None = None,
+    max_bytes: int | None = None,
+    service: str = "other",
+    **kwargs,
+) -> HTTPResponse:
+    """Sends a request through the shared connection pool and reads the body,
+    streaming it and stopping after `max_bytes` when given.
+
+    Connection errors, timeouts and 502/503/504 answers are retried with
+    jittered exponential backoff for idempotent methods only, as long as
+    `timeout` (HTTP_TIMEOUT by default), shared by all the attempts, allows.
+
+    `service` labels the call in the metrics, hosts would be unbounded.
+    """
+
+    method = method.upper()
+    host = URL(url).host or url
+    call_start = time.perf_counter()
+
+    if retries is None:
+        retries = HTTP_RETRIES if method in RETRYABLE_METHODS else 0
+
+    # one budget for the call, retries included
+    deadline = call_start + (timeout if timeout is not None else HTTP_TIMEOUT)
+
+    for attempt in range(retries + 1):
+        start = time.perf_counter()
+        error = None
+        # aiohttp reads a timeout of 0 as no timeout at all
+        client_timeout = aiohttp.ClientTimeout(total=max(deadline - start, 0.001))
+
+        try:
+            async with _get_session().request(method, url, timeout=client_timeout, **kwargs) as response:
+                content, truncated = await _read_body(response, max_bytes=max_bytes)
+                http_response = HTTPResponse(
+                    status_code=response.status,
+                    url=str(response.url),
+                    headers=dict(response.headers),
+                    content=content,
+                    truncated=truncated,
+                )
+
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+            error = e
+
+        # kept current for the scrapes another worker answers
+        _collect_pool_metrics()
+
+        backoff = 0.1 * 2 ** attempt * (1 + random.random())
+        is_last_attempt = attempt == retries or time.perf_counter() + backoff >= deadline
+
+        if error is not None:
+            if is_last_attempt:
+                metrics.observe_outbound(service, time.perf_counter() - call_start, status_code=None)
+                raise error
+
+        else:
+            is_retryable = http_response.status_code in RETRYABLE_STATUS_CODES
+
+            if not is_retryable or is_last_attempt:
+                metrics.observe_outbound(service, time.perf_counter() - call_start, status_code=http_response.status_code)
+                return http_response
+
+        metrics.OUTBOUND_RETRIES.labels(service).inc()
+        logging.info(f"Retrying outbound request in {backoff:.2f}s: {method=} {host=} {attempt=}")
+        await asyncio.sleep(backoff)
+
+
+async def get(url: str, **kwargs) -> HTTPResponse:
+    return await request("GET", url, **kwargs)
+
+
+async def post(url: str, **kwargs) -> HTTPResponse:
+    return await request("POST", url, **kwargs)
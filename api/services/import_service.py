@@ -0,0 +1,223 @@
+"""Bulk tool import from a list of links or a dependency manifest.
+
+Entries are resolved to domains (packages through the npm / PyPI registry
+homepage), deduplicated against the user's tools and each other, cut at
+MAX_NB_TOOLS for the batch as a whole, then ingested IMPORT_CONCURRENCY at
+a time. The outcome of every entry is streamed back as a Server-Sent
+Event as soon as it is known.
+"""
+import os
+import re
+import json
+import asyncio
+import logging
+import aiohttp
+
+from dataclasses import dataclass
+from urllib.parse import quote
+from fastapi import HTTPException, UploadFile, status
+from schemas.tool_import import ToolImportItem, ToolImportStatus
+from services import http_client, tool_service
+from database.models import (
+    User as UserModel,
+    Tool as ToolModel,
+)
+
+
+IMPORT_CONCURRENCY = int(os.getenv("IMPORT_CONCURRENCY", "4"))
+IMPORT_MAX_ENTRIES = int(os.getenv("IMPORT_MAX_ENTRIES", "200"))
+IMPORT_MAX_FILE_BYTES = int(os.getenv("IMPORT_MAX_FILE_BYTES", str(1024 * 1024)))
+
+LINK = "link"
+NPM = "npm"
+PYPI = "pypi"
+
+# a repository page says nothing about the product, every package would become "GitHub"
+CODE_HOSTS = {"github.com", "gitlab.com", "bitbucket.org"}
+
+_REQUIREMENT = re.compile(r"^([A-Za-z0-9][A-Za-z0-9._-]*)")
+_BOOKMARK = re.compile(r'<a\s[^>]*href="(https?://[^"]+)"', re.IGNORECASE)
+
+
+@dataclass
+class ImportEntry:
+    source: str
+    kind: str
+
+
+def _parse_package_json(content: bytes) -> list[ImportEntry]:
+    try:
+        manifest = json.loads(content)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid package.json")
+
+    names = {**manifest.get("dependencies", {}), **manifest.get("devDependencies", {})}
+
+    return [ImportEntry(source=name, kind=NPM) for name in names]
+
+
+def _parse_requirements(content: bytes) -> list[ImportEntry]:
+    entries = []
+
+    for line in content.decode("utf-8", errors="replace").splitlines():
+        line = line.split("#", 1)[0].strip()
+
+        # options (-r, -e, --index-url...) and direct references
+        if not line or line.startswith("-") or "://" in line:
+            continue
+
+        match = _REQUIREMENT.match(line)
+        if match:
+            entries.append(ImportEntry(source=match.group(1), kind=PYPI))
+
+    return entries
+
+
+def _parse_bookmarks(content: bytes) -> list[ImportEntry]:
+    return [ImportEntry(source=url, kind=LINK) for url in _BOOKMARK.findall(content.decode("utf-8", errors="replace"))]
+
+
+async def parse_request(links: list[str], file: UploadFile | None) -> list[ImportEntry]:
+    entries = [ImportEntry(source=link.strip(), kind=LINK) for link in links if link.strip()]
+
+    if file is not None:
+        if file.size is not None and file.size > IMPORT_MAX_FILE_BYTES:
+            raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="File too large")
+
+        content = await file.read(IMPORT_MAX_FILE_BYTES)
+        filename = (file.filename or "").lower()
+
+        if filename.endswith(".json"):
+            entries += _parse_package_json(content)
+        elif filename.endswith(".txt"):
+            entries += _parse_requirements(content)
+        elif filename.endswith((".html", ".htm")):
+            entries += _parse_bookmarks(content)
+        else:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Unsupported file, expected package.json, requirements.txt or a bookmarks export")
+
+    if not entries:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Nothing to import")
+
+    if len(entries) > IMPORT_MAX_ENTRIES:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Too many entries, at most {IMPORT_MAX_ENTRIES}")
+
+    return entries
+
+
+async def _get_package_homepage(entry: ImportEntry) -> str | None:
+    if entry.kind == NPM:
+        response = await http_client.get(f"https://registry.npmjs.org/{quote(entry.source, safe='@')}", timeout=5, service="npm")
+    else:
+        response = await http_client.get(f"https://pypi.org/pypi/{quote(entry.source)}/json", timeout=5, service="pypi")
+
+    if response.status_code != 200:
+        return None
+
+    metadata = response.json()
+
+    if entry.kind == NPM:
+        return metadata.get("homepage")
+
+    info = metadata.get("info", {})
+    project_urls = info.get("project_urls") or {}
+
+    return info.get("home_page") or project_urls.get("Homepage") or project_urls.get("Documentation")
+
+
+async def _resolve(entry: ImportEntry) -> str | None:
+    if entry.kind == LINK:
+        homepage = entry.source
+    else:
+        try:
+            homepage = await _get_package_homepage(entry)
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            logging.info(f"Couldn't resolve package ({type(e).__name__}): {entry=}")
+            return None
+
+    if not homepage:
+        return None
+
+    domain = tool_service.get_domain_name(url=homepage)
+
+    if not domain or domain in CODE_HOSTS:
+        return None
+
+    return domain
+
+
+def _event(name: str, data: dict) -> str:
+    return f"event: {name}\ndata: {json.dumps(data)}\n\n"
+
+
+def _item_event(item: ToolImportItem) -> str:
+    return _event("item", item.model_dump(mode="json"))
+
+
+async def _bounded(semaphore: asyncio.Semaphore, coro):
+    async with semaphore:
+        return await coro
+
+
+async def _add(index: int, entry: ImportEntry, domain: str, tool: ToolModel | None, user: UserModel) -> ToolImportItem:
+    try:
+        if tool is None:
+            tool = await tool_service.get_or_create_tool(link=entry.source if entry.kind == LINK else domain)
+
+        await tool_service.attach_tool(tool=tool, user=user)
+
+    except HTTPException as e:
+        return ToolImportItem(index=index, source=entry.source, domain=domain, status=ToolImportStatus.FAILED, error=e.detail)
+
+    except Exception:
+        logging.exception(f"Unexpected error while importing tool: {user.id=} {domain=}")
+        return ToolImportItem(index=index, source=entry.source, domain=domain, status=ToolImportStatus.FAILED, error="Internal error")
+
+    return ToolImportItem(index=index, source=entry.source, domain=domain, status=ToolImportStatus.ADDED, tool=await tool.to_schema())
+
+
+async def stream_import(entries: list[ImportEntry], user: UserModel):
+    """Server-Sent Events: `start`, one `item` per entry whose outcome is
+    final, then `done` with the count of every status."""
+
+    yield _event("start", {"total": len(entries)})
+
+    semaphore = asyncio.Semaphore(IMPORT_CONCURRENCY)
+    counts = {item_status.value: 0 for item_status in ToolImportStatus}
+
+    def final(item: ToolImportItem) -> str:
+        counts[item.status.value] += 1
+        return _item_event(item)
+
+    domains = await asyncio.gather(*[_bounded(semaphore, _resolve(entry)) for entry in entries])
+
+    user_tools = await user.tools.all()
+    active_jobs = await tool_service.get_active_jobs(user=user)
+    owned = {tool.link for tool in user_tools} | {job.domain for job in active_jobs}
+    slots = int(os.getenv("MAX_NB_TOOLS", "10")) - len(user_tools) - len(active_jobs)
+
+    planned: dict[str, tuple[int, ImportEntry]] = {}
+
+    for index, (entry, domain) in enumerate(zip(entries, domains)):
+        if domain is None:
+            yield final(ToolImportItem(index=index, source=entry.source, status=ToolImportStatus.UNRESOLVED))
+        elif domain in owned:
+            yield final(ToolImportItem(index=index, source=entry.source, domain=domain, status=ToolImportStatus.ALREADY_ADDED))
+        elif domain in planned:
+            yield final(ToolImportItem(index=index, source=entry.source, domain=domain, status=ToolImportStatus.DUPLICATE))
+        elif len(planned) >= slots:
+            yield final(ToolImportItem(index=index, source=entry.source, domain=domain, status=ToolImportStatus.LIMIT_REACHED))
+        else:
+            planned[domain] = (index, entry)
+
+    catalog = {tool.link: tool for tool in await ToolModel.filter(link__in=list(planned))}
+
+    tasks = [
+        _bounded(semaphore, _add(index, entry, domain, catalog.get(domain), user))
+        for domain, (index, entry) in planned.items()
+    ]
+
+    for task in asyncio.as_completed(tasks):
+        yield final(await task)
+
+    yield _event("done", counts)
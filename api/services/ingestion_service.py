@@ -0,0 +1,78 @@
+import os
+import logging
+
+from fastapi import HTTPException
+from datetime import datetime, timezone, timedelta
+from schemas.tool_ingestion_job import ToolIngestionJobStatus
+from services import background, tool_service
+from database.models import ToolIngestionJob as ToolIngestionJobModel
+
+
+INGESTION_WORKERS = int(os.getenv("INGESTION_WORKERS", "2"))
+INGESTION_POLL_INTERVAL = float(os.getenv("INGESTION_POLL_INTERVAL", "1"))
+INGESTION_MAX_ATTEMPTS = int(os.getenv("INGESTION_MAX_ATTEMPTS", "3"))
+INGESTION_RETRY_BASE = float(os.getenv("INGESTION_RETRY_BASE", "10"))
+
+# lease of a running job, see background.JobQueue
+INGESTION_JOB_TIMEOUT = timedelta(seconds=int(os.getenv("INGESTION_JOB_TIMEOUT", "300")))
+
+queue = background.JobQueue(
+    ToolIngestionJobModel,
+    pending=ToolIngestionJobStatus.PENDING,
+    running=ToolIngestionJobStatus.RUNNING,
+    lease=INGESTION_JOB_TIMEOUT,
+)
+
+
+async def _finish_job(job: ToolIngestionJobModel, status: ToolIngestionJobStatus, error: str | None = None):
+    job.status = status
+    job.error = error
+    job.finished_at = datetime.now(timezone.utc)
+    await job.save()
+
+
+async def _retry_later(job: ToolIngestionJobModel, error: str):
+    if job.attempts >= INGESTION_MAX_ATTEMPTS:
+        logging.error(f"Ingestion job failed too many times, giving up: {job.id=} {job.domain=} {error=}")
+        await _finish_job(job, ToolIngestionJobStatus.FAILED, error=error)
+        return
+
+    job.status = ToolIngestionJobStatus.PENDING
+    job.error = error
+    job.run_after = datetime.now(timezone.utc) + background.retry_delay(job.attempts, base=INGESTION_RETRY_BASE)
+    await job.save()
+
+
+async def process_job(job: ToolIngestionJobModel):
+    user = await job.user
+
+    try:
+        tool = await tool_service.get_or_create_tool(link=job.link)
+
+        await tool_service.attach_tool(tool=tool, user=user)
+
+    except HTTPException as e:
+        if e.status_code >= 500:
+            await _retry_later(job, error=e.detail)
+        else:
+            await _finish_job(job, ToolIngestionJobStatus.FAILED, error=e.detail)
+        return
+
+    except Exception as e:
+        logging.exception(f"Unexpected error while ingesting tool: {job.id=} {job.domain=}")
+        await _retry_later(job, error=str(e))
+        return
+
+    job.tool = tool
+    await _finish_job(job, ToolIngestionJobStatus.DONE)
+    logging.info(f"Ingestion job done: {job.id=} {job.domain=} {tool.id=}")
+
+
+def start_workers():
+    background.start_queue_workers(
+        "tool-ingestion-worker",
+        queue,
+        process_job,
+        workers=INGESTION_WORKERS,
+        poll_interval=INGESTION_POLL_INTERVAL,
+    )
@@ -0,0 +1,71 @@
+"""In-memory indexes over the tools (search, recommendations), held by every
+worker.
+
+An index is rebuilt from the database every `interval` seconds, the heavy
+part in a thread, and kept current in between by the changes made through
+this worker (`apply`). Changes made while a rebuild is running are replayed
+on the new index before it replaces the old one. Changes made through
+another worker show up after the next rebuild.
+"""
+import time
+import asyncio
+import logging
+
+from typing import Awaitable, Callable, Generic, TypeVar
+from schemas.tool import Tool as ToolSchema
+from services import background, profile_service
+from database.models import Tool as ToolModel
+
+
+Index = TypeVar("Index")
+
+
+class LiveIndex(Generic[Index]):
+
+    def __init__(self, name: str, index: Index, build: Callable[[list[dict]], Awaitable[Index]], interval: float):
+        """`build` gets the rows of every tool (profile_service.TOOL_FIELDS) and returns a new index."""
+
+        self.name = name
+        self.index = index
+        self.interval = interval
+        # what the results are served with, tools only known from `remember` are kept across rebuilds
+        self.tools: dict[int, ToolSchema] = {}
+        self._build = build
+        self._pending: list[Callable[[Index], None]] | None = None
+
+    async def rebuild(self):
+        self._pending = []
+
+        try:
+            start = time.perf_counter()
+
+            tools = await ToolModel.all().values(*profile_service.TOOL_FIELDS)
+            index = await self._build(tools)
+
+            for change in self._pending:
+                change(index)
+
+            self.index = index
+            self.tools = self.tools | {tool["id"]: ToolSchema(**tool) for tool in tools}
+
+        finally:
+            self._pending = None
+
+        logging.info(f"Index rebuilt: name={self.name} tools={len(tools)} duration={time.perf_counter() - start:.2f}s")
+
+    def apply(self, change: Callable[[Index], None]):
+        change(self.index)
+
+        if self._pending is not None:
+            self._pending.append(change)
+
+    def remember(self, tool: ToolModel):
+        self.tools[tool.id] = ToolSchema(**{field: getattr(tool, field) for field in profile_service.TOOL_FIELDS})
+
+    async def _run_rebuilder(self):
+        while True:
+            await self.rebuild()
+            await asyncio.sleep(self.interval)
+
+    def start_rebuilder(self):
+        background.start(f"{self.name}-index-rebuilder", self._run_rebuilder)
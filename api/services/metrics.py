@@ -0,0 +1,241 @@
+"""Prometheus metrics, exposed in the text format on GET /metrics.
+
+- per route latency and status (MetricsMiddleware), and DB queries per request
+- outbound calls per service (http_client, OpenAI), and the connections of
+  http_client's pool against its limits
+- DB query latency and pool usage (database/client.py listeners)
+- lookups and size of the caches (services/cache.py, domain_cache, profile_cache)
+
+With several server workers, PROMETHEUS_MULTIPROC_DIR must point to a
+directory shared by the workers and emptied before they start (server.py
+does both): every worker writes its samples there and /metrics aggregates
+them, whichever worker answers.
+"""
+import os
+import time
+import contextvars
+
+from typing import Callable
+from contextlib import contextmanager
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from database import client as db_client
+
+
+MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Time to answer a request, per route template",
+    ["method", "route", "status"],
+)
+HTTP_REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress",
+    "Requests being answered",
+    multiprocess_mode="livesum",
+)
+HTTP_REQUEST_DB_QUERIES = Histogram(
+    "http_request_db_queries",
+    "Database queries run to answer a request, per route template",
+    ["method", "route"],
+    buckets=COUNT_BUCKETS,
+)
+
+OUTBOUND_REQUEST_DURATION = Histogram(
+    "outbound_request_duration_seconds",
+    "Time of the calls to external services, retries included",
+    ["service", "outcome"],
+)
+OUTBOUND_RETRIES = Counter(
+    "outbound_retries_total",
+    "Retried calls to external services",
+    ["service"],
+)
+HTTP_CLIENT_CONNECTIONS = Gauge(
+    "http_client_connections",
+    "Connections of the shared HTTP client, in use and its limit, summed over the workers",
+    ["state"],
+    multiprocess_mode="livesum",
+)
+HTTP_CLIENT_HOST_CONNECTIONS = Gauge(
+    "http_client_host_connections",
+    "Connections of the shared HTTP client to its busiest host and the per host limit, max over the workers",
+    ["state"],
+    multiprocess_mode="livemax",
+)
+
+DB_QUERY_DURATION = Histogram(
+    "db_query_duration_seconds",
+    "Time of the database queries, per statement type",
+    ["statement", "failed"],
+    buckets=DB_BUCKETS,
+)
+DB_POOL_WAIT = Histogram(
+    "db_pool_wait_seconds",
+    "Time waited for a database connection",
+    buckets=DB_BUCKETS,
+)
+DB_POOL_CONNECTIONS = Gauge(
+    "db_pool_connections",
+    "Database connections, in use or open, summed over the workers",
+    ["state"],
+    multiprocess_mode="livesum",
+)
+DB_POOL_WAITING = Gauge(
+    "db_pool_waiting",
+    "Tasks waiting for a database connection, summed over the workers",
+    multiprocess_mode="livesum",
+)
+
+CACHE_LOOKUPS = Counter(
+    "cache_lookups_total",
+    "Cache lookups, per cache and result (hit, miss)",
+    ["cache", "result"],
+)
+CACHE_ENTRIES = Gauge(
+    "cache_entries",
+    "Entries held by the in-process caches, summed over the workers",
+    ["cache"],
+    multiprocess_mode="livesum",
+)
+
+STATEMENTS = {"SELECT", "INSERT", "UPDATE", "DELETE", "WITH"}
+
+# queries of the current request, None outside of requests (background workers)
+_request_queries: contextvars.ContextVar[list[int] | None] = contextvars.ContextVar("request_queries", default=None)
+
+
+# called with (service, duration, outcome) after every outbound call
+_outbound_listeners: list[Callable[[str, float, str], None]] = []
+
+
+def add_outbound_listener(listener: Callable[[str, float, str], None]):
+    _outbound_listeners.append(listener)
+
+
+# called before every scrape, to set the gauges read from a live object
+_collectors: list[Callable[[], None]] = []
+
+
+def add_collector(collector: Callable[[], None]):
+    _collectors.append(collector)
+
+
+def _outcome(status_code: int) -> str:
+    return f"{status_code // 100}xx"
+
+
+def _record_outbound(service: str, duration: float, outcome: str):
+    OUTBOUND_REQUEST_DURATION.labels(service, outcome).observe(duration)
+
+    for listener in _outbound_listeners:
+        listener(service, duration, outcome)
+
+
+def observe_outbound(service: str, duration: float, status_code: int | None):
+    _record_outbound(service, duration, _outcome(status_code) if status_code is not None else "error")
+
+
+@contextmanager
+def time_outbound(service: str):
+    """Times a call made through a client other than http_client (OpenAI)."""
+
+    start = time.perf_counter()
+    outcome = "error"
+
+    try:
+        yield
+        outcome = "2xx"
+    finally:
+        _record_outbound(service, time.perf_counter() - start, outcome)
+
+
+def _on_query(event: db_client.QueryEvent):
+    statement = event.fingerprint.split(" ", 1)[0].upper()
+    DB_QUERY_DURATION.labels(statement if statement in STATEMENTS else "OTHER", str(event.failed).lower()).observe(event.duration)
+
+    queries = _request_queries.get()
+    if queries is not None:
+        queries[0] += 1
+
+
+def _on_pool_event(event: db_client.PoolEvent):
+    DB_POOL_WAIT.observe(event.wait)
+    DB_POOL_CONNECTIONS.labels("in_use").set(event.in_use)
+    DB_POOL_CONNECTIONS.labels("open").set(event.size)
+    DB_POOL_WAITING.set(event.waiting)
+
+
+db_client.add_query_listener(_on_query)
+db_client.add_pool_listener(_on_pool_event)
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware, BaseHTTPMiddleware would add a task per request."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        start = time.perf_counter()
+        status_code = 500
+        queries = [0]
+        token = _request_queries.set(queries)
+
+        async def send_wrapper(message):
+            nonlocal status_code
+
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+
+            await send(message)
+
+        HTTP_REQUESTS_IN_PROGRESS.inc()
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_REQUESTS_IN_PROGRESS.dec()
+            _request_queries.reset(token)
+
+            # the template, not the path: /auth/users/{url} is a single series
+            route = scope.get("route")
+            route = route.path if route is not None else "unmatched"
+
+            HTTP_REQUEST_DURATION.labels(scope["method"], route, str(status_code)).observe(time.perf_counter() - start)
+            HTTP_REQUEST_DB_QUERIES.labels(scope["method"], route).observe(queries[0])
+
+
+def generate() -> tuple[bytes, str]:
+    # the other workers' values are the ones they set after their last call
+    for collect in _collectors:
+        collect()
+
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead():
+    """Drops the live gauges of this worker, on shutdown."""
+
+    if MULTIPROC_DIR:
+        multiprocess.mark_process_dead(os.getpid())
@@ -0,0 +1,245 @@
+"""Tool popularity (number of users) and trending leaderboards.
+
+Both are maintained incrementally in `tool_popularity` on every membership
+change, so reading them never aggregates the users<->tools table. Every
+adoption weighs `2 ** ((added_at - TRENDING_EPOCH) / TRENDING_HALF_LIFE)`.
+All weights would decay by the same factor, so they are summed undecayed
+and only scaled down when served. The sum itself would overflow a float
+within a few thousand half-lives, its log2 is stored instead
+(`trending_log_score`, log-sum-exp, `-inf` for no adoption): it grows by
+one per half-life. Removing a tool subtracts the weight of its membership,
+hence the `created_at` column on the membership rows.
+
+A reconciler recomputes everything from the membership table every
+POPULARITY_RECONCILE_INTERVAL seconds and corrects the drift. The top
+POPULARITY_TOP_K tools are cached per worker for POPULARITY_TOP_K_TTL
+seconds and paginated by keyset.
+"""
+import os
+import math
+import asyncio
+import bisect
+import logging
+
+from tortoise import Tortoise
+from datetime import datetime, timezone, timedelta
+from fastapi import HTTPException, status
+from schemas.tool import Tool as ToolSchema
+from schemas.popularity import ToolRanking, ToolRankingPage
+from services import background, profile_service
+from services.cache import TTLCache
+from database.models import (
+    User as UserModel,
+    Tool as ToolModel,
+    ToolPopularity as ToolPopularityModel,
+)
+
+
+POPULAR = "popular"
+TRENDING = "trending"
+
+TRENDING_EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+TRENDING_HALF_LIFE = timedelta(hours=int(os.getenv("TRENDING_HALF_LIFE_HOURS", str(24 * 7))))
+
+POPULARITY_TOP_K = int(os.getenv("POPULARITY_TOP_K", "500"))
+POPULARITY_TOP_K_TTL = int(os.getenv("POPULARITY_TOP_K_TTL", "30"))
+POPULARITY_RECONCILE_INTERVAL = int(os.getenv("POPULARITY_RECONCILE_INTERVAL", "3600"))
+
+_ORDER_FIELDS = {
+    POPULAR: "users_count",
+    TRENDING: "trending_log_score",
+}
+
+_leaderboards = TTLCache(maxsize=len(_ORDER_FIELDS), ttl=POPULARITY_TOP_K_TTL)
+_leaderboard_lock = asyncio.Lock()
+
+
+def membership_table() -> tuple[str, str, str]:
+    field = UserModel._meta.fields_map["tools"]
+    return field.through, field.backward_key, field.forward_key
+
+
+# log2(2 ** score + 2 ** $3) and log2(2 ** score - 2 ** $3). Differences are floored at -1000:
+# 2 ** -1000 doesn't change the sum and postgres raises on underflow instead of returning 0
+_ADD_WEIGHT = (
+    'GREATEST("trending_log_score", $3) + LN(1 + POWER(2, GREATEST('
+    'LEAST("trending_log_score", $3) - GREATEST("trending_log_score", $3), -1000))) / LN(2)'
+)
+_REMOVE_WEIGHT = (
+    # removing the whole sum (or more, rounding): nothing left
+    """CASE WHEN $3 >= "trending_log_score" - 1e-9 THEN '-Infinity'::float8 """
+    'ELSE "trending_log_score" + LN(1 - POWER(2, GREATEST($3 - "trending_log_score", -1000))) / LN(2) END'
+)
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _log_weight(added_at: datetime) -> float:
+    return (added_at - TRENDING_EPOCH) / TRENDING_HALF_LIFE
+
+
+async def _apply(tool_id: int, users: int, log_weight: float):
+    await ToolPopularityModel.get_or_create(tool_id=tool_id, defaults={"trending_log_score": -math.inf})
+    await Tortoise.get_connection("default").execute_query(
+        f'UPDATE "tool_popularity" SET "users_count" = "users_count" + $2, '
+        f'"trending_log_score" = {_ADD_WEIGHT if users > 0 else _REMOVE_WEIGHT} WHERE "tool_id" = $1',
+        [tool_id, users, log_weight],
+    )
+
+
+async def add_membership(user: UserModel, tool: ToolModel):
+    await user.tools.add(tool)
+    await _apply(tool_id=tool.id, users=1, log_weight=_log_weight(_now()))
+
+
+async def remove_membership(user: UserModel, tool: ToolModel):
+    through, user_key, tool_key = membership_table()
+
+    rows = await Tortoise.get_connection("default").execute_query_dict(
+        f'SELECT "created_at" FROM "{through}" WHERE "{user_key}" = $1 AND "{tool_key}" = $2',
+        [user.id, tool.id],
+    )
+
+    if not rows:
+        return
+
+    await user.tools.remove(tool)
+    await _apply(tool_id=tool.id, users=-1, log_weight=_log_weight(rows[0]["created_at"]))
+
+
+async def reconcile() -> int:
+    """Recomputes every count and score from the membership table, returns
+    the number of tools that had drifted."""
+
+    through, _, tool_key = membership_table()
+
+    # log-sum-exp: the largest log weight of a tool is factored out of its sum
+    rows = await Tortoise.get_connection("default").execute_query_dict(
+        f'WITH "weights" AS ('
+        f'SELECT "{tool_key}" AS "tool_id", EXTRACT(EPOCH FROM ("created_at" - $1::timestamptz))::float8 / $2::float8 AS "log_weight" '
+        f'FROM "{through}"), '
+        f'"maxima" AS (SELECT "tool_id", MAX("log_weight") AS "max_log_weight" FROM "weights" GROUP BY "tool_id") '
+        f'SELECT "tool_id", COUNT(*) AS "users_count", '
+        f'"max_log_weight" + LN(SUM(POWER(2, GREATEST("log_weight" - "max_log_weight", -1000)))) / LN(2) AS "trending_log_score" '
+        f'FROM "weights" JOIN "maxima" USING ("tool_id") GROUP BY "tool_id", "max_log_weight"',
+        [TRENDING_EPOCH, TRENDING_HALF_LIFE.total_seconds()],
+    )
+    expected = {row["tool_id"]: (row["users_count"], float(row["trending_log_score"])) for row in rows}
+
+    # increments landing between the two reads are overwritten, the next run picks them up
+    existing = {entry.tool_id: entry for entry in await ToolPopularityModel.all()}
+    drifted = []
+
+    for tool_id, entry in existing.items():
+        users_count, trending_log_score = expected.get(tool_id, (0, -math.inf))
+
+        # log2 of the sums: an absolute tolerance is a relative one on the sums
+        if entry.users_count != users_count or not math.isclose(entry.trending_log_score, trending_log_score, abs_tol=1e-6):
+            entry.users_count = users_count
+            entry.trending_log_score = trending_log_score
+            drifted.append(entry)
+
+    if drifted:
+        await ToolPopularityModel.bulk_update(drifted, fields=["users_count", "trending_log_score"])
+
+    missing = [
+        ToolPopularityModel(tool_id=tool_id, users_count=users_count, trending_log_score=trending_log_score)
+        for tool_id, (users_count, trending_log_score) in expected.items()
+        if tool_id not in existing
+    ]
+
+    if missing:
+        await ToolPopularityModel.bulk_create(missing, ignore_conflicts=True)
+
+    if drifted or missing:
+        logging.info(f"Tool popularity reconciled: drifted={len(drifted)} missing={len(missing)}")
+
+    for kind in _ORDER_FIELDS:
+        _leaderboards.pop(kind)
+
+    return len(drifted) + len(missing)
+
+
+async def run_reconciler():
+    while True:
+        await reconcile()
+        await asyncio.sleep(POPULARITY_RECONCILE_INTERVAL)
+
+
+def start_reconciler():
+    background.start("tool-popularity-reconciler", run_reconciler)
+
+
+async def _load_leaderboard(kind: str) -> list[dict]:
+    order_field = _ORDER_FIELDS[kind]
+
+    return await ToolPopularityModel.filter(users_count__gt=0).order_by(
+        f"-{order_field}", "-tool_id",
+    ).limit(POPULARITY_TOP_K).values(
+        "users_count", "trending_log_score",
+        # `tool_id` included, as the alias of tool__id
+        **{f"tool_{field}": f"tool__{field}" for field in profile_service.TOOL_FIELDS},
+    )
+
+
+async def _get_leaderboard(kind: str) -> list[dict]:
+    rows = _leaderboards.get(kind)
+
+    if rows is None:
+        # a single refresh per expiry, whatever the number of waiting requests
+        async with _leaderboard_lock:
+            rows = _leaderboards.get(kind)
+
+            if rows is None:
+                rows = await _load_leaderboard(kind)
+                _leaderboards.set(kind, rows)
+
+    return rows
+
+
+def _sort_key(row: dict, order_field: str) -> tuple:
+    # ascending order of the leaderboard, which is sorted by value then id, both descending
+    return -row[order_field], -row["tool_id"]
+
+
+def _parse_cursor(cursor: str) -> tuple[float, int]:
+    try:
+        value, tool_id = cursor.split(":")
+        return float(value), int(tool_id)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+async def get_leaderboard(kind: str, limit: int, cursor: str | None = None) -> ToolRankingPage:
+    """A page of the cached top-K, starting right after `cursor` (the
+    `next_cursor` of the previous page)."""
+
+    order_field = _ORDER_FIELDS[kind]
+    rows = await _get_leaderboard(kind)
+
+    start = 0
+    if cursor is not None:
+        value, tool_id = _parse_cursor(cursor)
+        start = bisect.bisect_right(rows, (-value, -tool_id), key=lambda row: _sort_key(row, order_field))
+
+    page = rows[start:start + limit]
+
+    # scores are stored undecayed, see the module docstring
+    decay = _log_weight(_now())
+
+    items = [
+        ToolRanking(
+            tool=ToolSchema(**{field: row[f"tool_{field}"] for field in profile_service.TOOL_FIELDS}),
+            users_count=row["users_count"],
+            score=row["users_count"] if kind == POPULAR else 2 ** (row["trending_log_score"] - decay),
+        )
+        for row in page
+    ]
+
+    next_cursor = None
+    if start + limit < len(rows) and page:
+        next_cursor = f"{page[-1][order_field]!r}:{page[-1]['tool_id']}"
+
+    return ToolRankingPage(items=items, next_cursor=next_cursor)
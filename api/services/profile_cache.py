@@ -0,0 +1,171 @@
+"""Versioned cache of the public profile pages (`GET /auth/users/{url}`).
+
+Every user has a `profile_version` that the write paths bump (tools added or
+removed, profile edited). Serialized responses are cached by
+(url, version): a bump makes the old entries unreachable, nothing has to be
+deleted. Entries live in an in-process LRU and, when PROFILE_CACHE_REDIS_URL
+is set, in a shared tier that the other workers read from.
+
+The version itself is cached per worker for PROFILE_VERSION_TTL seconds, a
+bump made through another worker shows up after that at most. A hit costs
+no query at all, a version miss one indexed lookup by url.
+"""
+import os
+import logging
+
+from redis import asyncio as redis
+from redis.exceptions import RedisError
+from dataclasses import dataclass
+from fastapi import HTTPException, Request, Response, status
+from tortoise.expressions import F
+from tortoise.signals import post_save
+from services import audio_service, metrics, profile_service
+from services.cache import TTLCache
+from database.models import User as UserModel
+
+
+PROFILE_CACHE_SIZE = int(os.getenv("PROFILE_CACHE_SIZE", "2048"))
+PROFILE_CACHE_TTL = int(os.getenv("PROFILE_CACHE_TTL", str(24 * 60 * 60)))
+PROFILE_VERSION_TTL = float(os.getenv("PROFILE_VERSION_TTL", "5"))
+
+# optional shared tier, e.g. redis://redis:6379/0
+PROFILE_CACHE_REDIS_URL = os.getenv("PROFILE_CACHE_REDIS_URL")
+
+_versions = TTLCache(maxsize=PROFILE_CACHE_SIZE, ttl=PROFILE_VERSION_TTL, name="profile_versions")
+_bodies = TTLCache(maxsize=PROFILE_CACHE_SIZE, ttl=PROFILE_CACHE_TTL, name="profile_bodies")
+
+_redis: redis.Redis | None = None
+_shared_hits = metrics.CACHE_LOOKUPS.labels("profile_bodies_shared", "hit")
+_shared_misses = metrics.CACHE_LOOKUPS.labels("profile_bodies_shared", "miss")
+
+
+@dataclass
+class ProfileVersion:
+    user_id: int
+    version: int
+
+    @property
+    def etag(self) -> str:
+        return f'"{self.user_id}-{self.version}"'
+
+
+def _get_redis() -> redis.Redis | None:
+    global _redis
+
+    if _redis is None and PROFILE_CACHE_REDIS_URL:
+        _redis = redis.from_url(PROFILE_CACHE_REDIS_URL)
+
+    return _redis
+
+
+async def close():
+    global _redis
+
+    if _redis is not None:
+        await _redis.aclose()
+        _redis = None
+
+
+def _shared_key(url: str, version: int) -> str:
+    return f"profile:{url}:{version}"
+
+
+async def get_version(url: str) -> ProfileVersion:
+    version = _versions.get(url)
+
+    if version is None:
+        row = await UserModel.filter(url=url).first().values("id", "profile_version")
+
+        if row is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+
+        version = ProfileVersion(user_id=row["id"], version=row["profile_version"])
+        _versions.set(url, version)
+
+    return version
+
+
+async def bump(user: UserModel):
+    """Invalidates the cached profile of a user, to be called by every write
+    that changes what the public profile shows."""
+
+    await UserModel.filter(id=user.id).update(profile_version=F("profile_version") + 1)
+    _versions.pop(user.url)
+
+
+async def bump_tool_users(tool_ids: list[int]):
+    """`bump` for every user of the given tools, after an edit of the tools themselves."""
+
+    users = await UserModel.filter(tools__id__in=tool_ids).distinct().values("id", "url")
+
+    if not users:
+        return
+
+    await UserModel.filter(id__in=[user["id"] for user in users]).update(profile_version=F("profile_version") + 1)
+
+    for user in users:
+        _versions.pop(user["url"])
+
+
+@post_save(UserModel)
+async def _on_user_saved(sender, instance: UserModel, created, using_db, update_fields):
+    # profile edits, `bump` itself goes through an update query and never gets here
+    if not created:
+        await bump(instance)
+
+
+async def _load_body(url: str, version: ProfileVersion) -> bytes:
+    key = (url, version.version)
+    body = _bodies.get(key)
+
+    if body is not None:
+        return body
+
+    shared = _get_redis()
+
+    if shared is not None:
+        try:
+            body = await shared.get(_shared_key(url, version.version))
+        except RedisError as e:
+            logging.warning(f"Shared profile cache unavailable ({type(e).__name__}): {url=}")
+
+        if body is not None:
+            _shared_hits.inc()
+            _bodies.set(key, body)
+            return body
+
+        _shared_misses.inc()
+
+    profile = await profile_service.get_profile(url=url, include_tools=True)
+    body = profile.model_dump_json().encode()
+    _bodies.set(key, body)
+
+    if shared is not None:
+        try:
+            await shared.set(_shared_key(url, version.version), body, ex=PROFILE_CACHE_TTL)
+        except RedisError as e:
+            logging.warning(f"Shared profile cache unavailable ({type(e).__name__}): {url=}")
+
+    return body
+
+
+async def get_profile_response(request: Request, url: str) -> Response:
+    """Serves a public profile from the cache, with a version ETag and
+    conditional GET (304). Clients always revalidate."""
+
+    version = await get_version(url=url)
+
+    headers = {
+        "ETag": version.etag,
+        "Cache-Control": "public, no-cache",
+    }
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None and audio_service.etag_matches(if_none_match, version.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    return Response(
+        content=await _load_body(url=url, version=version),
+        headers=headers,
+        media_type="application/json",
+    )
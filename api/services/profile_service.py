@@ -0,0 +1,111 @@
+"""Read path of the profile pages.
+
+Rows go straight from `.values()` into the pydantic schemas: no model
+instances, no lazy relation loading, and `audio_reviews.audio_data` is
+never selected. Every function runs a fixed number of queries whatever the
+number of tools.
+"""
+from fastapi import HTTPException, status
+from schemas.tool import Tool as ToolSchema
+from schemas.user import (
+    User as UserSchema,
+    UserPrivate as UserPrivateSchema,
+)
+from schemas.audio_review import AudioReview as AudioReviewSchema
+from services import audio_service
+from database.models import (
+    User as UserModel,
+    Tool as ToolModel,
+    AudioReview as AudioReviewModel,
+)
+
+
+TOOL_FIELDS = ("id", "link", "name", "category", "logo")
+USER_FIELDS = ("id", "url", "username", "email", "created_at", "picture")
+
+
+def _user_schema(row: dict, private: bool) -> UserSchema | UserPrivateSchema:
+    if private:
+        return UserPrivateSchema(
+            id=row["id"],
+            url=row["url"],
+            username=row["username"],
+            picture=row["picture"],
+        )
+
+    return UserSchema(**{field: row[field] for field in USER_FIELDS})
+
+
+async def get_user_tools(user_id: int) -> list[ToolSchema]:
+    rows = await ToolModel.filter(users__id=user_id).values(*TOOL_FIELDS)
+
+    return [ToolSchema(**row) for row in rows]
+
+
+async def get_me(user: UserModel) -> UserSchema:
+    """The authenticated user is already loaded, only the tools are left: 1 query."""
+
+    schema = _user_schema({field: getattr(user, field) for field in USER_FIELDS}, private=False)
+    schema.tools = await get_user_tools(user_id=user.id)
+
+    return schema
+
+
+async def get_profile(
+    url: str,
+    include_tools: bool = True,
+    private: bool = False,
+) -> UserSchema | UserPrivateSchema:
+    """A profile and its tools in a single query, the user columns are
+    repeated on every tool row of the join."""
+
+    tool_fields = {f"tool_{field}": f"tools__{field}" for field in TOOL_FIELDS} if include_tools else {}
+    rows = await UserModel.filter(url=url).values(*USER_FIELDS, **tool_fields)
+
+    if not rows:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+
+    schema = _user_schema(rows[0], private=private)
+
+    if include_tools:
+        schema.tools = [
+            ToolSchema(**{field: row[f"tool_{field}"] for field in TOOL_FIELDS})
+            for row in rows
+            # users without tools come back as a single row of NULLs (left join)
+            if row["tool_id"] is not None
+        ]
+
+    return schema
+
+
+async def get_review(tool_id: int, user_id: int) -> AudioReviewSchema:
+    """Review metadata with its tool and author in a single query."""
+
+    review = await AudioReviewModel.filter(
+        tool_id=tool_id,
+        user_id=user_id,
+    ).order_by("-id").first().values(
+        "id", "blob_key", "size", "mime_type",
+        "rendition_key", "rendition_size", "rendition_mime_type",
+        "processing_status", "duration", "peaks",
+        **{f"tool_{field}": f"tool__{field}" for field in TOOL_FIELDS},
+        **{f"user_{field}": f"user__{field}" for field in USER_FIELDS},
+    )
+
+    if review is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Review not found")
+
+    # the rendition is served in place of the original once it exists
+    served_key = review["rendition_key"] or review["blob_key"]
+
+    return AudioReviewSchema(
+        id=review["id"],
+        tool=ToolSchema(**{field: review[f"tool_{field}"] for field in TOOL_FIELDS}),
+        user=_user_schema({field: review[f"user_{field}"] for field in USER_FIELDS}, private=True),
+        size=review["rendition_size"] or review["size"],
+        mime_type=review["rendition_mime_type"] or review["mime_type"],
+        content_hash=audio_service.content_hash(served_key),
+        processing_status=review["processing_status"],
+        duration=review["duration"],
+        peaks=review["peaks"],
+    )
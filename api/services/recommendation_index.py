@@ -0,0 +1,147 @@
+"""In-memory tool x tool co-occurrence index ("people who use X also use Y").
+
+Built in one vectorized pass from the user -> tool memberships: with A the
+sparse user x tool matrix, C = A.T @ A counts the users every pair of tools
+has in common and its diagonal the users of each tool. Tools are compared
+with the Jaccard similarity C[a, b] / (n[a] + n[b] - C[a, b]).
+
+Memberships added or removed afterwards update the counts of the pairs
+they touch and mark the top-K lists of those tools dirty, these are
+recomputed on their next read. No database access here, see
+services/recommendation_service.py.
+"""
+import heapq
+import numpy as np
+
+from scipy import sparse
+
+
+class RecommendationIndex:
+
+    def __init__(self, top_k: int):
+        self.top_k = top_k
+
+        self.user_tools: dict[int, set[int]] = {}
+        self.tool_users: dict[int, int] = {}
+        self.cooccurrences: dict[int, dict[int, int]] = {}
+
+        self._top: dict[int, list[tuple[int, float]]] = {}
+        self._dirty: set[int] = set()
+
+    @classmethod
+    def build(cls, user_ids: np.ndarray, tool_ids: np.ndarray, top_k: int) -> "RecommendationIndex":
+        """`user_ids[i]` uses `tool_ids[i]`, duplicated pairs are ignored."""
+
+        index = cls(top_k=top_k)
+
+        if len(user_ids) == 0:
+            return index
+
+        users, user_idx = np.unique(user_ids, return_inverse=True)
+        tools, tool_idx = np.unique(tool_ids, return_inverse=True)
+
+        memberships = sparse.csr_matrix(
+            (np.ones(len(user_idx), dtype=np.int32), (user_idx, tool_idx)),
+            shape=(len(users), len(tools)),
+        )
+        # duplicated pairs were summed
+        memberships.data[:] = 1
+
+        cooccurrences = (memberships.T @ memberships).tocsr()
+        counts = cooccurrences.diagonal()
+        cooccurrences.setdiag(0)
+        cooccurrences.eliminate_zeros()
+
+        rows = np.repeat(np.arange(len(tools)), np.diff(cooccurrences.indptr))
+        similarities = cooccurrences.data / (counts[rows] + counts[cooccurrences.indices] - cooccurrences.data)
+
+        # most similar first within every row, then the first `top_k` of each row
+        order = np.lexsort((cooccurrences.indices, -similarities, rows))
+        rank = np.arange(len(order)) - cooccurrences.indptr[rows[order]]
+        top = order[rank < top_k]
+
+        tool_list = tools.tolist()
+        top_rows = np.split(top, np.searchsorted(rows[top], np.arange(1, len(tools))))
+
+        for i, tool_id in enumerate(tool_list):
+            start, end = cooccurrences.indptr[i], cooccurrences.indptr[i + 1]
+            neighbours = tools[cooccurrences.indices[start:end]].tolist()
+
+            index.tool_users[tool_id] = int(counts[i])
+            index.cooccurrences[tool_id] = dict(zip(neighbours, cooccurrences.data[start:end].tolist()))
+            index._top[tool_id] = list(zip(
+                tools[cooccurrences.indices[top_rows[i]]].tolist(),
+                similarities[top_rows[i]].tolist(),
+            ))
+
+        user_list = users.tolist()
+        for i, start, end in zip(range(len(users)), memberships.indptr[:-1], memberships.indptr[1:]):
+            index.user_tools[user_list[i]] = set(tools[memberships.indices[start:end]].tolist())
+
+        return index
+
+    def _update(self, user_id: int, tool_id: int, delta: int):
+        others = self.user_tools.get(user_id, set()) - {tool_id}
+
+        self.tool_users[tool_id] = self.tool_users.get(tool_id, 0) + delta
+
+        for other in others:
+            for a, b in ((tool_id, other), (other, tool_id)):
+                counts = self.cooccurrences.setdefault(a, {})
+                counts[b] = counts.get(b, 0) + delta
+                if counts[b] <= 0:
+                    del counts[b]
+
+        # the size of `tool_id` also shifts its similarity with every other
+        # neighbour a little, that is left to the next full build
+        self._dirty.add(tool_id)
+        self._dirty.update(others)
+
+    def add(self, user_id: int, tool_id: int):
+        tools = self.user_tools.setdefault(user_id, set())
+
+        if tool_id in tools:
+            return
+
+        self._update(user_id, tool_id, delta=1)
+        tools.add(tool_id)
+
+    def remove(self, user_id: int, tool_id: int):
+        tools = self.user_tools.get(user_id)
+
+        if tools is None or tool_id not in tools:
+            return
+
+        tools.discard(tool_id)
+        self._update(user_id, tool_id, delta=-1)
+
+    def similar(self, tool_id: int) -> list[tuple[int, float]]:
+        """The `top_k` most similar tools, most similar first."""
+
+        if tool_id in self._dirty:
+            size = self.tool_users.get(tool_id, 0)
+            self._top[tool_id] = heapq.nsmallest(
+                self.top_k,
+                (
+                    (other, count / (size + self.tool_users[other] - count))
+                    for other, count in self.cooccurrences.get(tool_id, {}).items()
+                ),
+                key=lambda item: (-item[1], item[0]),
+            )
+            self._dirty.discard(tool_id)
+
+        return self._top.get(tool_id, [])
+
+    def recommend(self, user_id: int, limit: int) -> list[tuple[int, float]]:
+        """Tools the user doesn't have yet, scored by their summed similarity
+        with the tools they have."""
+
+        owned = self.user_tools.get(user_id, set())
+        scores: dict[int, float] = {}
+
+        for tool_id in owned:
+            for other, similarity in self.similar(tool_id):
+                if other not in owned:
+                    scores[other] = scores.get(other, 0.0) + similarity
+
+        return heapq.nsmallest(limit, scores.items(), key=lambda item: (-item[1], item[0]))
@@ -0,0 +1,70 @@
+"""Serves the co-occurrence recommendations (services/recommendation_index.py),
+from a LiveIndex rebuilt from the membership table every
+RECOMMENDATION_REBUILD_INTERVAL seconds (services/live_index.py)."""
+import os
+import asyncio
+import logging
+import numpy as np
+
+from tortoise import Tortoise
+from schemas.recommendation import ToolRecommendation
+from services import popularity_service
+from services.live_index import LiveIndex
+from services.recommendation_index import RecommendationIndex
+from database.models import Tool as ToolModel
+
+
+RECOMMENDATION_TOP_K = int(os.getenv("RECOMMENDATION_TOP_K", "50"))
+RECOMMENDATION_REBUILD_INTERVAL = int(os.getenv("RECOMMENDATION_REBUILD_INTERVAL", "600"))
+
+
+async def _build(tools: list[dict]) -> RecommendationIndex:
+    through, user_key, tool_key = popularity_service.membership_table()
+
+    rows = await Tortoise.get_connection("default").execute_query_dict(
+        f'SELECT "{user_key}" AS "user_id", "{tool_key}" AS "tool_id" FROM "{through}"'
+    )
+
+    user_ids = np.fromiter((row["user_id"] for row in rows), dtype=np.int64, count=len(rows))
+    tool_ids = np.fromiter((row["tool_id"] for row in rows), dtype=np.int64, count=len(rows))
+
+    logging.info(f"Building recommendation index: memberships={len(rows)}")
+
+    return await asyncio.to_thread(RecommendationIndex.build, user_ids, tool_ids, RECOMMENDATION_TOP_K)
+
+
+_live = LiveIndex(
+    "recommendation",
+    RecommendationIndex(top_k=RECOMMENDATION_TOP_K),
+    build=_build,
+    interval=RECOMMENDATION_REBUILD_INTERVAL,
+)
+
+
+def on_membership_added(user_id: int, tool: ToolModel):
+    _live.remember(tool)
+    _live.apply(lambda index: index.add(user_id, tool.id))
+
+
+def on_membership_removed(user_id: int, tool_id: int):
+    _live.apply(lambda index: index.remove(user_id, tool_id))
+
+
+def _to_schemas(scored: list[tuple[int, float]], limit: int) -> list[ToolRecommendation]:
+    return [
+        ToolRecommendation(tool=_live.tools[tool_id], score=score)
+        for tool_id, score in scored
+        if tool_id in _live.tools
+    ][:limit]
+
+
+def get_similar_tools(tool_id: int, limit: int) -> list[ToolRecommendation]:
+    return _to_schemas(_live.index.similar(tool_id), limit=limit)
+
+
+def get_recommendations(user_id: int, limit: int) -> list[ToolRecommendation]:
+    return _to_schemas(_live.index.recommend(user_id, limit=limit), limit=limit)
+
+
+def start_rebuilder():
+    _live.start_rebuilder()
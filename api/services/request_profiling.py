@@ -0,0 +1,249 @@
+"""On-demand request profiling and slow request capture.
+
+Profiling: a request is profiled when it carries the
+`X-Profiling-Token: <PROFILING_TOKEN>` header, or is drawn by
+PROFILING_SAMPLE_RATE. pyinstrument samples the request's own task (other
+requests served meanwhile don't show up) and the call tree, with the wall
+clock time of every frame, is saved as HTML in PROFILING_DIR under the
+request id. Only the last PROFILING_MAX_FILES profiles are kept. The
+request id is answered in the X-Request-ID header, and the profiles can be
+read on /debug/profiles (api/endpoints/debug_endpoint.py).
+
+A client's X-Request-ID is used as the request id, except for a profiled
+request: it gets one from the server, a reused id would overwrite another
+profile. The client's id is then logged as `client_request_id`.
+
+Slow requests: every request over SLOW_REQUEST_MS is logged as JSON on the
+`slow_requests` logger (and SLOW_REQUEST_LOG, a rotating file, when set)
+with its route, status, DB queries and outbound calls.
+
+With PROFILING_TOKEN and PROFILING_SAMPLE_RATE unset and SLOW_REQUEST_MS=0
+the middleware only forwards the requests.
+"""
+import os
+import re
+import json
+import time
+import uuid
+import hmac
+import random
+import asyncio
+import logging
+import contextvars
+import logging.handlers
+
+from dataclasses import dataclass, field
+from database import client as db_client
+from services import metrics
+
+
+PROFILING_TOKEN = os.getenv("PROFILING_TOKEN")
+PROFILING_SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", "0"))
+PROFILING_DIR = os.getenv("PROFILING_DIR", "/tmp/anyrecs-profiles")
+PROFILING_MAX_FILES = int(os.getenv("PROFILING_MAX_FILES", "100"))
+# sampled profiles a worker runs at once, a token always gets one
+PROFILING_MAX_CONCURRENT = int(os.getenv("PROFILING_MAX_CONCURRENT", "1"))
+PROFILING_INTERVAL = float(os.getenv("PROFILING_INTERVAL", "0.001"))
+
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "2000"))
+SLOW_REQUEST_LOG = os.getenv("SLOW_REQUEST_LOG")
+# entries kept per request, a N+1 loop could run thousands of queries
+TRACE_MAX_ENTRIES = int(os.getenv("TRACE_MAX_ENTRIES", "200"))
+
+TOKEN_HEADER = b"x-profiling-token"
+REQUEST_ID_HEADER = b"x-request-id"
+
+_REQUEST_ID = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+slow_request_logger = logging.getLogger("slow_requests")
+
+if SLOW_REQUEST_LOG:
+    slow_request_logger.addHandler(logging.handlers.RotatingFileHandler(SLOW_REQUEST_LOG, maxBytes=10 * 1024 * 1024, backupCount=5))
+
+
+@dataclass
+class RequestTrace:
+    start: float
+    queries: list = field(default_factory=list)
+    outbound: list = field(default_factory=list)
+    dropped: int = 0
+
+    def add(self, entries: list, entry: dict):
+        if len(entries) < TRACE_MAX_ENTRIES:
+            entries.append(entry)
+        else:
+            self.dropped += 1
+
+    def offset_ms(self, duration: float) -> float:
+        """When the operation that just ended started, from the request start."""
+        return round((time.perf_counter() - duration - self.start) * 1000, 2)
+
+
+_trace: contextvars.ContextVar[RequestTrace | None] = contextvars.ContextVar("request_trace", default=None)
+_profiling = 0
+
+
+def _on_query(event: db_client.QueryEvent):
+    trace = _trace.get()
+
+    if trace is not None:
+        trace.add(trace.queries, {
+            "at_ms": trace.offset_ms(event.duration),
+            "ms": round(event.duration * 1000, 2),
+            "rows": event.rows,
+            "failed": event.failed,
+            "sql": event.fingerprint[:500],
+        })
+
+
+def _on_outbound(service: str, duration: float, outcome: str):
+    trace = _trace.get()
+
+    if trace is not None:
+        trace.add(trace.outbound, {
+            "at_ms": trace.offset_ms(duration),
+            "ms": round(duration * 1000, 2),
+            "service": service,
+            "outcome": outcome,
+        })
+
+
+db_client.add_query_listener(_on_query)
+metrics.add_outbound_listener(_on_outbound)
+
+
+def is_valid_token(token: str | None) -> bool:
+    return bool(PROFILING_TOKEN) and token is not None and hmac.compare_digest(token, PROFILING_TOKEN)
+
+
+def _get_client_request_id(headers: dict) -> str | None:
+    request_id = headers.get(REQUEST_ID_HEADER, b"").decode("latin-1")
+    return request_id if _REQUEST_ID.match(request_id) else None
+
+
+def get_profile_path(request_id: str) -> str | None:
+    if not _REQUEST_ID.match(request_id):
+        return None
+
+    path = os.path.join(PROFILING_DIR, f"{request_id}.html")
+    return path if os.path.exists(path) else None
+
+
+def list_profiles() -> list[dict]:
+    try:
+        entries = [entry for entry in os.scandir(PROFILING_DIR) if entry.name.endswith(".html")]
+    except FileNotFoundError:
+        return []
+
+    entries.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+
+    return [
+        {"request_id": entry.name.removesuffix(".html"), "created_at": entry.stat().st_mtime, "size": entry.stat().st_size}
+        for entry in entries
+    ]
+
+
+def _save_profile(request_id: str, profiler):
+    html = profiler.output_html()
+
+    os.makedirs(PROFILING_DIR, exist_ok=True)
+
+    with open(os.path.join(PROFILING_DIR, f"{request_id}.html"), "w") as f:
+        f.write(html)
+
+    # ring: the oldest profiles go first
+    for profile in list_profiles()[PROFILING_MAX_FILES:]:
+        try:
+            os.remove(os.path.join(PROFILING_DIR, f"{profile['request_id']}.html"))
+        except FileNotFoundError:
+            pass
+
+
+def _log_slow_request(scope, request_id: str, client_request_id: str | None, status_code: int, duration: float, trace: RequestTrace):
+    route = scope.get("route")
+
+    slow_request_logger.warning(json.dumps({
+        "request_id": request_id,
+        "client_request_id": client_request_id,
+        "method": scope["method"],
+        "route": route.path if route is not None else None,
+        "path": scope["path"],
+        "status": status_code,
+        "ms": round(duration * 1000, 2),
+        "db_ms": round(sum(query["ms"] for query in trace.queries), 2),
+        "queries": trace.queries,
+        "outbound": trace.outbound,
+        "dropped": trace.dropped,
+    }))
+
+
+class ProfilingMiddleware:
+
+    def __init__(self, app):
+        self.app = app
+        self.enabled = bool(PROFILING_TOKEN) or PROFILING_SAMPLE_RATE > 0 or SLOW_REQUEST_MS > 0
+
+    def _should_profile(self, scope, headers: dict) -> bool:
+        # reading the profiles must not push them out of the ring
+        if scope["path"].startswith("/debug/"):
+            return False
+
+        if is_valid_token(headers.get(TOKEN_HEADER, b"").decode("latin-1")):
+            return True
+
+        return PROFILING_SAMPLE_RATE > 0 and _profiling < PROFILING_MAX_CONCURRENT and random.random() < PROFILING_SAMPLE_RATE
+
+    async def __call__(self, scope, receive, send):
+        if not self.enabled or scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        global _profiling
+
+        headers = dict(scope["headers"])
+        is_profiled = self._should_profile(scope, headers)
+        client_request_id = _get_client_request_id(headers)
+        request_id = uuid.uuid4().hex if is_profiled or client_request_id is None else client_request_id
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message["headers"] = [*message.get("headers", []), (REQUEST_ID_HEADER, request_id.encode())]
+
+            await send(message)
+
+        profiler = None
+        if is_profiled:
+            # imported on first use, nothing is loaded while profiling is off
+            from pyinstrument import Profiler
+
+            profiler = Profiler(interval=PROFILING_INTERVAL, async_mode="enabled")
+            _profiling += 1
+            profiler.start()
+
+        trace = RequestTrace(start=time.perf_counter()) if SLOW_REQUEST_MS > 0 else None
+        token = _trace.set(trace)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _trace.reset(token)
+            duration = time.perf_counter() - trace.start if trace is not None else None
+
+            # rendering and writing take long enough to stall the other requests, off the event loop
+            if profiler is not None:
+                profiler.stop()
+
+                try:
+                    await asyncio.to_thread(_save_profile, request_id, profiler)
+                    logging.info(f"Request profiled: {request_id=} {client_request_id=} {scope['method']} {scope['path']}")
+                except OSError:
+                    logging.exception(f"Couldn't save request profile: {request_id=}")
+                finally:
+                    # counted until saved, so sampled renderings don't pile up either
+                    _profiling -= 1
+
+            if duration is not None and duration * 1000 >= SLOW_REQUEST_MS:
+                await asyncio.to_thread(_log_slow_request, scope, request_id, client_request_id, status_code, duration, trace)
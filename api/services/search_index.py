@@ -0,0 +1,143 @@
+"""In-memory typeahead index over the tools: name, category and link.
+
+Every field is indexed by its trigrams, padded the way pg_trgm does ("  r",
+" re", "rea", ...), so short prefixes and misspellings both match. A query
+looks up the posting list of each of its trigrams and counts, in one
+`np.bincount`, how many of them every tool has per field. The score of a
+field is the share of the query trigrams it contains, weighted by
+FIELD_WEIGHTS, with a bonus when a word of the field starts with the query
+and a bigger one when the name is the query.
+
+Posting lists are frozen numpy arrays from the last build, tools indexed
+afterwards go into small python lists merged at query time. No database
+access here, see services/search_service.py.
+"""
+import re
+import heapq
+import numpy as np
+
+from collections import defaultdict
+
+
+NAME = "name"
+LINK = "link"
+CATEGORY = "category"
+
+FIELD_WEIGHTS = {
+    NAME: 1.0,
+    LINK: 0.8,
+    CATEGORY: 0.4,
+}
+
+PREFIX_BONUS = 0.5
+EXACT_BONUS = 1.0
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def normalize(text: str) -> list[str]:
+    return _WORD.findall(text.lower())
+
+
+def trigrams(text: str) -> set[str]:
+    grams = set()
+
+    for word in normalize(text):
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+
+    return grams
+
+
+class SearchIndex:
+
+    def __init__(self):
+        self.tool_ids: list[int] = []
+        self._positions: dict[int, int] = {}
+        self._names: list[str] = []
+        self._words: list[set[str]] = []
+        self._removed: set[int] = set()
+
+        self._postings: dict[str, dict[str, np.ndarray]] = {field: {} for field in FIELD_WEIGHTS}
+        self._recent: dict[str, dict[str, list[int]]] = {field: defaultdict(list) for field in FIELD_WEIGHTS}
+
+    @classmethod
+    def build(cls, tools: list[dict]) -> "SearchIndex":
+        index = cls()
+
+        for tool in tools:
+            index.add(tool)
+
+        for field, recent in index._recent.items():
+            index._postings[field] = {gram: np.array(positions, dtype=np.int32) for gram, positions in recent.items()}
+            index._recent[field] = defaultdict(list)
+
+        return index
+
+    def add(self, tool: dict):
+        """Indexes a new tool, or re-indexes an updated one."""
+
+        previous = self._positions.get(tool["id"])
+        if previous is not None:
+            self._removed.add(previous)
+
+        position = len(self.tool_ids)
+        self.tool_ids.append(tool["id"])
+        self._positions[tool["id"]] = position
+        self._names.append(" ".join(normalize(tool[NAME])))
+        self._words.append({word for field in FIELD_WEIGHTS for word in normalize(tool[field])})
+
+        for field in FIELD_WEIGHTS:
+            for gram in trigrams(tool[field]):
+                self._recent[field][gram].append(position)
+
+    def _counts(self, field: str, grams: set[str]) -> np.ndarray:
+        postings = self._postings[field]
+        recent = self._recent[field]
+
+        positions = [postings[gram] for gram in grams if gram in postings]
+        positions += [np.array(recent[gram], dtype=np.int32) for gram in grams if gram in recent]
+
+        if not positions:
+            return np.zeros(len(self.tool_ids), dtype=np.int64)
+
+        return np.bincount(np.concatenate(positions), minlength=len(self.tool_ids))
+
+    def search(self, query: str, limit: int, min_score: float = 0.3) -> list[tuple[int, float]]:
+        """Best matching tool ids with their score, best first."""
+
+        grams = trigrams(query)
+        words = normalize(query)
+
+        if not grams:
+            return []
+
+        scores = np.zeros(len(self.tool_ids))
+        for field, weight in FIELD_WEIGHTS.items():
+            np.maximum(scores, weight * self._counts(field, grams) / len(grams), out=scores)
+
+        candidates = np.flatnonzero(scores >= min_score * min(FIELD_WEIGHTS.values()))
+
+        # only the best few hundred get the (python) prefix and exact checks
+        if len(candidates) > limit * 20:
+            candidates = candidates[np.argpartition(scores[candidates], -limit * 20)[-limit * 20:]]
+
+        query_name = " ".join(words)
+        last_word = words[-1]
+        results = []
+
+        for position in candidates.tolist():
+            if position in self._removed:
+                continue
+
+            score = float(scores[position])
+
+            if any(word.startswith(last_word) for word in self._words[position]):
+                score += PREFIX_BONUS
+            if self._names[position] == query_name:
+                score += EXACT_BONUS
+
+            if score >= min_score:
+                results.append((self.tool_ids[position], score))
+
+        return heapq.nsmallest(limit, results, key=lambda item: (-item[1], item[0]))
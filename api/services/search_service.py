@@ -0,0 +1,40 @@
+"""Serves the tool search (services/search_index.py), from a LiveIndex
+rebuilt every SEARCH_REBUILD_INTERVAL seconds (services/live_index.py)."""
+import os
+import asyncio
+
+from schemas.search import ToolSearchResult
+from services import profile_service
+from services.live_index import LiveIndex
+from services.search_index import SearchIndex
+from database.models import Tool as ToolModel
+
+
+SEARCH_REBUILD_INTERVAL = int(os.getenv("SEARCH_REBUILD_INTERVAL", "600"))
+SEARCH_MIN_SCORE = float(os.getenv("SEARCH_MIN_SCORE", "0.3"))
+
+
+async def _build(tools: list[dict]) -> SearchIndex:
+    return await asyncio.to_thread(SearchIndex.build, tools)
+
+
+_live = LiveIndex("search", SearchIndex(), build=_build, interval=SEARCH_REBUILD_INTERVAL)
+
+
+def on_tool_saved(tool: ToolModel):
+    row = {field: getattr(tool, field) for field in profile_service.TOOL_FIELDS}
+
+    _live.remember(tool)
+    _live.apply(lambda index: index.add(row))
+
+
+def search(query: str, limit: int) -> list[ToolSearchResult]:
+    return [
+        ToolSearchResult(tool=_live.tools[tool_id], score=score)
+        for tool_id, score in _live.index.search(query, limit=limit, min_score=SEARCH_MIN_SCORE)
+        if tool_id in _live.tools
+    ]
+
+
+def start_rebuilder():
+    _live.start_rebuilder()
@@ -1,22 +1,46 @@
 import os
 import re
+import time
+import asyncio
 import logging
-import requests
-
-from openai import OpenAI
+import aiohttp
+import openai
+
+from typing import Any, BinaryIO, Awaitable, Callable
+from openai import AsyncOpenAI
+from tortoise.expressions import Q
+from tortoise.exceptions import IntegrityError
+from tortoise.transactions import in_transaction
 from urllib.parse import urlparse
+from datetime import datetime, timezone
 from fastapi import HTTPException, status, UploadFile
+from services import blob_storage, content_service, domain_cache, http_client, metrics, popularity_service, profile_cache, recommendation_service, search_service
+from schemas.tool_ingestion_job import ToolIngestionJobStatus
 from database.models import (
     User as UserModel,
     Tool as ToolModel,
-    AudioReview as AudioReviewModel
+    AudioReview as AudioReviewModel,
+    ToolIngestionJob as ToolIngestionJobModel,
 )
 
 
-openai_client = OpenAI()
+openai_client = AsyncOpenAI()
+
+# end-to-end budget for scraping and classifying a new tool
+TOOL_PIPELINE_DEADLINE = float(os.getenv("TOOL_PIPELINE_DEADLINE", "30"))
+
+AUDIO_UPLOAD_MAX_BYTES = int(os.getenv("AUDIO_UPLOAD_MAX_BYTES", str(10 * 1024 * 1024)))
+
+# overridden to run against local stand-ins (scripts/fake_services.py), as OPENAI_BASE_URL for OpenAI
+TOOL_WEBSITE_URL = os.getenv("TOOL_WEBSITE_URL", "https://{domain}")
+JINA_READER_URL = os.getenv("JINA_READER_URL", "https://r.jina.ai")
+FAVICON_API_URL = os.getenv("FAVICON_API_URL", "https://www.google.com/s2/favicons")
+
+# ingestions running in this worker, keyed by domain, see `get_or_create_tool`
+_inflight_tools: dict[str, asyncio.Task] = {}
 
 
-def _get_domain_name(url: str):
+def get_domain_name(url: str):
     # Add scheme if not present
     if not url.startswith('http://') and not url.startswith('https://'):
         url = 'http://' + url
@@ -24,8 +48,8 @@ def _get_domain_name(url: str):
     # Parse the URL
     parsed_url = urlparse(url)
 
-    # Extract the domain (network location)
-    domain = parsed_url.netloc
+    # Extract the domain (network location), hostnames are case-insensitive
+    domain = parsed_url.netloc.lower()
 
     # Remove 'www.' if present
     if domain.startswith('www.'):
@@ -33,16 +57,24 @@ def _get_domain_name(url: str):
 
     return domain
 
-def __verify_domain(domain: str):
+def _remaining(deadline: float | None, step_timeout: float) -> float:
+    if deadline is None:
+        return step_timeout
+
+    return max(0.0, min(step_timeout, deadline - asyncio.get_running_loop().time()))
+
+
+async def __verify_domain(domain: str, deadline: float | None = None):
 
     try:
-        response = requests.get(
-            url=f"https://{domain}",
-            timeout=5,
+        response = await http_client.get(
+            url=TOOL_WEBSITE_URL.format(domain=domain),
+            timeout=_remaining(deadline, 5),
+            service="tool_website",
         )
 
-    except requests.exceptions.ReadTimeout:
-        logging.warning(f"Couldn't reach domain (timeout): {domain=}")
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        logging.warning(f"Couldn't reach domain ({type(e).__name__}): {domain=}")
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Couldn't reach domain")
 
     if response.status_code != 200:
@@ -50,16 +82,22 @@ def __verify_domain(domain: str):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Couldn't reach domain")
 
 
-def _get_domain_favicon(domain: str):
+async def _get_domain_favicon(domain: str, deadline: float | None = None):
 
-    response = requests.get(
-        url="https://www.google.com/s2/favicons",
-        params={
-            "domain": domain,
-            "size": 256,
-        },
-        timeout=5,
-    )
+    try:
+        response = await http_client.get(
+            url=FAVICON_API_URL,
+            service="google_favicons",
+            params={
+                "domain": domain,
+                "size": 256,
+            },
+            timeout=_remaining(deadline, 5),
+        )
+
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        logging.warning(f"Couldn't retrieve favicon ({type(e).__name__}): {domain=}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Couldn't retrieve favicon")
 
     if response.status_code != 200:
         logging.error(f"Couldn't retrieve favicon {domain=} {response.status_code=} {response.text=}")
@@ -71,7 +109,7 @@ def _get_domain_favicon(domain: str):
     }
 
 
-def __extract_tag_content(text, tag_name):
+def extract_tag_content(text: str, tag_name: str) -> str | None:
     pattern = f'<{tag_name}>(.*?)</{tag_name}>'
     match = re.search(pattern, text, re.DOTALL)
     if match:
@@ -79,17 +117,7 @@ def __extract_tag_content(text, tag_name):
     return None
 
 
-def _get_product_info(domain: str):
-
-    response = requests.get(
-        url=f"https://r.jina.ai/{domain}",
-        timeout=15,
-    )
-
-    if response.status_code != 200:
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Couldn't retrieve website content")
-
-    prompt = """You will be given the content of a website. Your task is to identify the name of the product being described and determine its category (e.g., "front-end framework", "programming language", "database system", etc.).
+PRODUCT_INFO_PROMPT = """You will be given the content of a website. Your task is to identify the name of the product being described and determine its category (e.g., "front-end framework", "programming language", "database system", etc.).
 
 Here is the website content:
 <website_content>
@@ -116,65 +144,247 @@ Remember:
 
 Provide only the name and category in the specified format without any additional explanation or commentary."""
 
-    prompt = prompt.replace("{{WEBSITE_CONTENT}}", response.text)
 
-    completion = openai_client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {"role": "user", "content": prompt}
-        ],
-        timeout=30,
-    ).choices[0].message.content
+async def get_website_content(domain: str, deadline: float | None = None) -> str:
+
+    try:
+        response = await http_client.get(
+            url=f"{JINA_READER_URL}/{domain}",
+            timeout=_remaining(deadline, 15),
+            max_bytes=content_service.CONTENT_MAX_BYTES,
+            service="jina",
+        )
+
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        logging.warning(f"Couldn't retrieve website content ({type(e).__name__}): {domain=}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Couldn't retrieve website content")
+
+    if response.status_code != 200:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Couldn't retrieve website content")
+
+    content = content_service.prepare_content(raw=response.content, raw_truncated=response.truncated)
+
+    logging.info(
+        f"Prepared website content: {domain=} {content.raw_bytes=} {content.raw_truncated=} "
+        f"{content.dropped_bytes=} {content.estimated_tokens=} {content.dropped_tokens=}"
+    )
+
+    return content.text
+
+
+async def classify_website(content: str, deadline: float | None = None):
+
+    prompt = PRODUCT_INFO_PROMPT.replace("{{WEBSITE_CONTENT}}", content)
+
+    try:
+        with metrics.time_outbound("openai"):
+            completion = (await openai_client.chat.completions.create(
+                model="gpt-4o-mini",
+                messages=[
+                    {"role": "user", "content": prompt}
+                ],
+                timeout=_remaining(deadline, 30),
+            )).choices[0].message.content
+
+    except openai.APIError as e:
+        logging.warning(f"Couldn't classify website ({type(e).__name__}): {e}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Couldn't classify website")
+
+    return {
+        "name": extract_tag_content(text=completion, tag_name="name"),
+        "category": extract_tag_content(text=completion, tag_name="category"),
+    }
+
+
+async def _timed_step(name: str, timings: dict, coro):
+    start = time.perf_counter()
+
+    try:
+        return await coro
+    finally:
+        timings[name] = round(time.perf_counter() - start, 3)
+
+
+async def _scrape_tool_info(domain: str):
+    """Runs the reachability probe and the favicon lookup alongside the content
+    fetch + classification, all under one deadline. The first failing step
+    cancels the others. Every step is served from services/domain_cache.py
+    when a fresh (or negative) entry exists."""
+
+    deadline = asyncio.get_running_loop().time() + TOOL_PIPELINE_DEADLINE
+    timings = {}
+
+    async def verify():
+        await __verify_domain(domain=domain, deadline=deadline)
+        return {"reachable": True}
+
+    async def favicon_url():
+        return {"url": (await _get_domain_favicon(domain=domain, deadline=deadline))["url"]}
+
+    async def product_info():
+        content = await _timed_step("content", timings, get_website_content(domain=domain, deadline=deadline))
+        return await _timed_step("classify", timings, classify_website(content=content, deadline=deadline))
+
+    await domain_cache.load(domain=domain)
+
+    try:
+        async with asyncio.timeout_at(deadline):
+            async with asyncio.TaskGroup() as task_group:
+                task_group.create_task(_timed_step("verify", timings, domain_cache.cached(domain_cache.VERIFY, domain, verify)))
+                favicon = task_group.create_task(_timed_step("favicon", timings, domain_cache.cached(domain_cache.FAVICON, domain, favicon_url)))
+                info = task_group.create_task(domain_cache.cached(domain_cache.PRODUCT_INFO, domain, product_info))
+
+    except TimeoutError:
+        logging.warning(f"Tool pipeline deadline exceeded: {domain=} {timings=}")
+        raise HTTPException(status_code=status.HTTP_504_GATEWAY_TIMEOUT, detail="Timed out while retrieving tool info")
+
+    except ExceptionGroup as group:
+        logging.warning(f"Tool pipeline failed: {domain=} {timings=}")
+
+        # the steps report their failures as HTTPException, anything else is a bug and stays out of the answer
+        for exception in group.exceptions:
+            if isinstance(exception, HTTPException):
+                raise exception
+
+        logging.error(f"Unexpected error in tool pipeline: {domain=}", exc_info=group.exceptions[0])
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Couldn't retrieve tool info")
+
+    logging.info(f"Tool pipeline done: {domain=} {timings=}")
 
     return {
-        "name": __extract_tag_content(text=completion, tag_name="name"),
-        "category": __extract_tag_content(text=completion, tag_name="category"),
+        "logo": favicon.result()["url"],
+        **info.result(),
     }
 
 
 async def create_new_tool(
     link: str,
-    user: UserModel,
 ):
 
-    domain = _get_domain_name(url=link)
-    __verify_domain(domain=domain)
+    domain = get_domain_name(url=link)
 
-    logo = _get_domain_favicon(domain=domain)["url"]
-    info = _get_product_info(domain=domain)
+    # scraped outside of any transaction: no connection is held meanwhile and the domain cache writes stick
+    info = await _scrape_tool_info(domain=domain)
 
-    new_tool = await ToolModel.create(
-        name=info["name"],
-        category=info["category"],
-        link=domain,
-        logo=logo,
-        user=user,
+    try:
+        new_tool = await ToolModel.create(
+            name=info["name"],
+            category=info["category"],
+            link=domain,
+            logo=info["logo"],
+        )
+    except IntegrityError:
+        # created by another worker while we were scraping, the unique index on `tools.link` kept the duplicate out
+        return await ToolModel.get(link=domain)
+
+    search_service.on_tool_saved(new_tool)
+
+    return new_tool
+
+
+async def get_or_create_tool(
+    link: str,
+) -> ToolModel:
+    """Concurrent calls for the same domain share a single scrape in this
+    worker through `_inflight_tools`. Across workers they may both scrape,
+    the unique index on `tools.link` keeps a single row."""
+
+    domain = get_domain_name(url=link)
+
+    tool = await ToolModel.get_or_none(link=domain)
+
+    if tool is not None:
+        return tool
+
+    task = _inflight_tools.get(domain)
+
+    if task is None:
+        task = asyncio.create_task(create_new_tool(link=link))
+        _inflight_tools[domain] = task
+        task.add_done_callback(lambda _: _inflight_tools.pop(domain, None))
+
+    # a cancelled waiter must not cancel the ingestion the others wait for
+    return await asyncio.shield(task)
+
+
+async def get_active_jobs(user: UserModel):
+    return await ToolIngestionJobModel.filter(
+        user_id=user.id,
+        status__in=[ToolIngestionJobStatus.PENDING, ToolIngestionJobStatus.RUNNING],
     )
 
-    return await new_tool
+
+async def attach_tool(
+    tool: ToolModel,
+    user: UserModel,
+):
+
+    user_tools = await user.tools.all()
+
+    if tool.id in [_tool.id for _tool in user_tools]:
+        return
+
+    if len(user_tools) >= int(os.getenv("MAX_NB_TOOLS", "10")):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="max tools limit reached")
+
+    await popularity_service.add_membership(user=user, tool=tool)
+    recommendation_service.on_membership_added(user_id=user.id, tool=tool)
+    await profile_cache.bump(user)
 
 
 async def add_tool(
     link: str,
     user: UserModel,
-):
+) -> ToolIngestionJobModel:
+
+    user_tools = await user.tools.all()
+    active_jobs = await get_active_jobs(user=user)
 
-    if len(await user.tools.all()) >= int(os.getenv("MAX_NB_TOOLS", "10")):
+    if len(user_tools) + len(active_jobs) >= int(os.getenv("MAX_NB_TOOLS", "10")):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="max tools limit reached")
 
-    domain = _get_domain_name(url=link)
+    domain = get_domain_name(url=link)
 
-    if domain in [_tool.link for _tool in await user.tools.all()]:
+    if domain in [_tool.link for _tool in user_tools]:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Tool already added")
 
+    for job in active_jobs:
+        if job.domain == domain:
+            return job
+
     tool = await ToolModel.get_or_none(link=domain)
 
     if tool is None:
-        tool = await create_new_tool(link=link, user=user)
+        # scraped and attached by the ingestion worker, see services/ingestion_service.py
+        return await ToolIngestionJobModel.create(
+            user=user,
+            link=link,
+            domain=domain,
+        )
+
+    await attach_tool(tool=tool, user=user)
+
+    return await ToolIngestionJobModel.create(
+        user=user,
+        tool=tool,
+        link=link,
+        domain=domain,
+        status=ToolIngestionJobStatus.DONE,
+        finished_at=datetime.now(timezone.utc),
+    )
+
+
+async def get_ingestion_job(
+    id: int,
+    user: UserModel,
+) -> ToolIngestionJobModel:
+
+    job = await ToolIngestionJobModel.get_or_none(id=id, user_id=user.id)
 
-    await user.tools.add(tool)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="job not found")
 
-    return await tool.to_schema()
+    return job
 
 
 async def get_tool(
@@ -194,8 +404,10 @@ async def remove_tool(
     user: UserModel,
 ):
 
-    tool = await ToolModel.get_or_none(id=id)
-    await user.tools.remove(tool)
+    tool = await get_tool(id=id)
+    await popularity_service.remove_membership(user=user, tool=tool)
+    recommendation_service.on_membership_removed(user_id=user.id, tool_id=tool.id)
+    await profile_cache.bump(user)
 
     return
 
@@ -231,31 +443,98 @@ async def get_audio_review(
     return review[0]
 
 
-async def update_audio_review(
+async def save_audio_review(
     tool_id: int,
-    audio: UploadFile,
+    file: BinaryIO,
+    mime_type: str | None,
     user: UserModel,
 ) -> AudioReviewModel:
 
     tool = await get_tool(id=tool_id)
-    audio_data = await audio.read()
 
-    try:
-        review = await get_audio_review(tool_id=tool_id, user_id=user.id)
-        await review.delete()
-    except HTTPException:
-        # no review yet for the audio
-        pass
+    if not mime_type or not mime_type.startswith("audio/"):
+        file.seek(0)
+        mime_type = blob_storage.sniff_audio_mime_type(file.read(16))
+
+    previous_reviews = await AudioReviewModel.filter(tool_id=tool_id, user_id=user.id)
+
+    # created first: identical bytes give the same key, the old row must not be its last reference
+    async def create_review(blob: blob_storage.StoredBlob, connection) -> AudioReviewModel:
+        return await AudioReviewModel.create(
+            tool=tool,
+            user=user,
+            blob_key=blob.key,
+            size=blob.size,
+            mime_type=blob.content_type,
+            using_db=connection,
+        )
 
-    review = await AudioReviewModel.create(
-        tool=tool,
-        user=user,
-        audio_data=audio_data,
-    )
+    blob, review = await store_audio_blob(file, content_type=mime_type, reference=create_review)
+
+    for previous_review in previous_reviews:
+        await previous_review.delete()
+
+        for key in (previous_review.blob_key, previous_review.rendition_key):
+            if key != blob.key:
+                await release_audio_blob(key=key)
 
     return review
 
 
+async def update_audio_review(
+    tool_id: int,
+    audio: UploadFile,
+    user: UserModel,
+) -> AudioReviewModel:
+
+    # starlette spools uploads bigger than 1MB to disk, only the size needs checking here
+    if audio.size is not None and audio.size > AUDIO_UPLOAD_MAX_BYTES:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="Audio review too large")
+
+    return await save_audio_review(tool_id=tool_id, file=audio.file, mime_type=audio.content_type, user=user)
+
+
+async def _lock_audio_blob(connection, key: str):
+    # held until the end of the transaction, by the writers of a reference and by release_audio_blob
+    await connection.execute_query("SELECT pg_advisory_xact_lock(hashtext('audio_blob'), hashtext($1))", [key])
+
+
+async def store_audio_blob(
+    file: BinaryIO,
+    content_type: str,
+    reference: Callable[[blob_storage.StoredBlob, Any], Awaitable[Any]],
+) -> tuple[blob_storage.StoredBlob, Any]:
+    """Stores the file, then runs `reference(blob, connection)` to point an
+    audio review at it, under the blob's lock: a concurrent
+    `release_audio_blob` of the same content can't delete it in between."""
+
+    storage = blob_storage.get_storage()
+    blob = await storage.store(file, content_type=content_type)
+
+    async with in_transaction() as connection:
+        await _lock_audio_blob(connection, blob.key)
+
+        # released by its last review since it was stored, uploaded again
+        if not await storage.exists(blob.key):
+            blob = await storage.store(file, content_type=content_type)
+
+        return blob, await reference(blob, connection)
+
+
+async def release_audio_blob(key: str | None):
+    if key is None:
+        return
+
+    async with in_transaction() as connection:
+        await _lock_audio_blob(connection, key)
+
+        # blobs are content-addressed, other reviews may share the same recording
+        if await AudioReviewModel.filter(Q(blob_key=key) | Q(rendition_key=key)).using_db(connection).exists():
+            return
+
+        await blob_storage.get_storage().delete(key)
+
+
 async def delete_audio_review(
     id: int,
     user: UserModel,
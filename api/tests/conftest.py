@@ -0,0 +1,79 @@
+"""The tests run against a real Postgres, configured with the usual
+POSTGRES_* variables. Every table is emptied before each test, so the
+database name has to end with `_test`; the tests are skipped otherwise.
+
+    pip install -r requirements-dev.txt
+    POSTGRES_DB=anyrecs_test ... python -m pytest
+"""
+import os
+
+# required at import time by the services, never used for real here
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("JWT_SECRET_KEY", "test")
+
+import pytest
+
+from contextlib import contextmanager
+from tortoise import Tortoise
+from database import client as db_client
+from database.database import init_db, upgrade_schema
+from services import popularity_service
+
+
+TEST_DATABASE = os.getenv("POSTGRES_DB", "")
+
+# fingerprints of the queries run inside `count_queries`, None outside of it
+_queries: list[str] | None = None
+
+
+def _on_query(event: db_client.QueryEvent):
+    if _queries is not None:
+        _queries.append(event.fingerprint)
+
+
+db_client.add_query_listener(_on_query)
+
+
+def pytest_collection_modifyitems(config, items):
+    if TEST_DATABASE.endswith("_test"):
+        return
+
+    skip = pytest.mark.skip(reason="needs a Postgres database whose name ends with _test (POSTGRES_DB)")
+    for item in items:
+        if "db" in item.fixturenames:
+            item.add_marker(skip)
+
+
+@pytest.fixture
+async def db():
+    await init_db()
+    await upgrade_schema()
+
+    connection = Tortoise.get_connection("default")
+    # the applied migrations (aerich.models) are kept
+    tables = ", ".join(f'"{model._meta.db_table}"' for model in Tortoise.apps["models"].values() if model.__module__ == "database.models")
+    through, _, _ = popularity_service.membership_table()
+    await connection.execute_script(f'TRUNCATE {tables}, "{through}" RESTART IDENTITY CASCADE')
+
+    yield connection
+
+    await Tortoise.close_connections()
+
+
+@contextmanager
+def _count_queries():
+    global _queries
+
+    _queries = []
+
+    try:
+        yield _queries
+    finally:
+        _queries = None
+
+
+@pytest.fixture
+def count_queries():
+    """`with count_queries() as queries:` collects the fingerprints of the queries run in the block."""
+
+    return _count_queries
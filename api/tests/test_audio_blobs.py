@@ -0,0 +1,63 @@
+import io
+import pytest
+
+from services import blob_storage, tool_service
+from database.models import AudioReview, Tool, User
+
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    storage = blob_storage.LocalBlobStorage(root=str(tmp_path))
+    monkeypatch.setattr(blob_storage, "_storage", storage)
+    return storage
+
+
+async def _create_user(name: str) -> User:
+    return await User.create(url=name, username=name, email=f"{name}@example.com", picture="p")
+
+
+async def test_re_recording_releases_the_previous_blob_only(db, storage):
+    tool = await Tool.create(link="example.com", name="Example", category="Tools", logo="l")
+    alice = await _create_user("alice")
+
+    first = await tool_service.save_audio_review(tool_id=tool.id, file=io.BytesIO(b"first"), mime_type="audio/wav", user=alice)
+    same = await tool_service.save_audio_review(tool_id=tool.id, file=io.BytesIO(b"first"), mime_type="audio/wav", user=alice)
+
+    assert same.blob_key == first.blob_key
+    assert await storage.exists(first.blob_key)
+
+    second = await tool_service.save_audio_review(tool_id=tool.id, file=io.BytesIO(b"second"), mime_type="audio/wav", user=alice)
+
+    assert not await storage.exists(first.blob_key)
+    assert await storage.exists(second.blob_key)
+    assert await AudioReview.filter(user_id=alice.id).count() == 1
+
+
+async def test_blob_released_while_another_review_stores_it_is_kept(db, storage, monkeypatch):
+    tool = await Tool.create(link="example.com", name="Example", category="Tools", logo="l")
+    alice = await _create_user("alice")
+    bob = await _create_user("bob")
+
+    shared = await tool_service.save_audio_review(tool_id=tool.id, file=io.BytesIO(b"same"), mime_type="audio/wav", user=alice)
+    await AudioReview.filter(id=shared.id).delete()
+
+    store = storage.store
+    released = []
+
+    async def store_then_release(file, content_type, prefix="audio"):
+        blob = await store(file, content_type=content_type, prefix=prefix)
+
+        # alice's re-recording releases the blob right after bob's upload found it already stored
+        if not released:
+            released.append(blob.key)
+            await tool_service.release_audio_blob(key=blob.key)
+
+        return blob
+
+    monkeypatch.setattr(storage, "store", store_then_release)
+
+    review = await tool_service.save_audio_review(tool_id=tool.id, file=io.BytesIO(b"same"), mime_type="audio/wav", user=bob)
+
+    assert released == [shared.blob_key]
+    assert review.blob_key == shared.blob_key
+    assert await storage.read(review.blob_key) == b"same"
@@ -0,0 +1,28 @@
+from datetime import datetime, timezone
+from schemas.audio_review import AudioProcessingStatus
+from services import audio_processing_service, background, blob_storage
+from database.models import AudioReview, Tool, User
+
+
+async def test_failed_processing_is_retried_after_a_backoff(db, tmp_path, monkeypatch):
+    # the recording is missing from the storage, the download fails
+    monkeypatch.setattr(blob_storage, "_storage", blob_storage.LocalBlobStorage(root=str(tmp_path)))
+
+    tool = await Tool.create(link="example.com", name="Example", category="Tools", logo="l")
+    user = await User.create(url="alice", username="alice", email="alice@example.com", picture="p")
+    review = await AudioReview.create(tool=tool, user=user, blob_key="audio/00/missing", size=1, mime_type="audio/wav")
+
+    claimed = await audio_processing_service.queue.claim_one()
+    assert claimed.id == review.id
+
+    before = datetime.now(timezone.utc)
+    await audio_processing_service.process_review(claimed)
+
+    review = await AudioReview.get(id=review.id)
+    assert review.processing_status == AudioProcessingStatus.PENDING
+    assert review.processing_run_after >= before + background.retry_delay(1, base=audio_processing_service.AUDIO_PROCESSING_RETRY_BASE)
+
+    assert await audio_processing_service.queue.claim_one() is None
+
+    await AudioReview.filter(id=review.id).update(processing_run_after=before)
+    assert (await audio_processing_service.queue.claim_one()).processing_attempts == 2
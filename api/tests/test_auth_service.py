@@ -0,0 +1,43 @@
+import pytest
+
+from services import auth_service
+from database.models import Tool, User
+
+
+@pytest.fixture(autouse=True)
+def empty_principals():
+    # ids restart with every test, a principal cached by another one would match
+    auth_service._principals.clear()
+
+
+async def test_cached_principal_is_a_new_instance_per_request(db, count_queries):
+    user = await User.create(url="alice", username="alice", email="alice@example.com", picture="p")
+    token = "Bearer " + auth_service.create_access_token(data={"sub": user.email, "uid": user.id})
+
+    first = await auth_service.get_current_user(token)
+
+    with count_queries() as queries:
+        second = await auth_service.get_current_user(token)
+
+    assert queries == []
+    assert second is not first
+    assert (second.id, second.email, second.created_at, second.profile_version) == (first.id, first.email, first.created_at, first.profile_version)
+
+    # relations fetched by one request don't show up in another's instance
+    await second.tools.add(await Tool.create(link="example.com", name="Example", category="Tools", logo="l"))
+    await second.fetch_related("tools")
+    third = await auth_service.get_current_user(token)
+
+    assert not third.tools._fetched
+    assert len(await third.tools.all()) == 1
+
+
+async def test_saving_a_user_invalidates_its_principal(db):
+    user = await User.create(url="alice", username="alice", email="alice@example.com", picture="p")
+    token = "Bearer " + auth_service.create_access_token(data={"sub": user.email, "uid": user.id})
+
+    principal = await auth_service.get_current_user(token)
+    principal.username = "Alice"
+    await principal.save()
+
+    assert (await auth_service.get_current_user(token)).username == "Alice"
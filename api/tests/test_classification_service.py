@@ -0,0 +1,24 @@
+from services import classification_service
+from database.models import (
+    User as UserModel,
+    Tool as ToolModel,
+)
+
+
+async def test_save_results_bumps_the_profiles_showing_the_tools(db):
+    alice = await UserModel.create(url="alice", username="alice", email="alice@example.com", picture="picture")
+    bob = await UserModel.create(url="bob", username="bob", email="bob@example.com", picture="picture")
+    renamed = await ToolModel.create(link="renamed.com", name="Old", category="Unknown", logo="logo")
+    unchanged = await ToolModel.create(link="unchanged.com", name="Same", category="database", logo="logo")
+    await alice.tools.add(renamed)
+    await bob.tools.add(unchanged)
+
+    saved = await classification_service.save_results({
+        renamed.id: {"name": "New", "category": "database"},
+        unchanged.id: {"name": "Same", "category": "database"},
+    })
+
+    assert saved == 1
+    assert (await ToolModel.get(id=renamed.id)).name == "New"
+    assert (await UserModel.get(id=alice.id)).profile_version == 1
+    assert (await UserModel.get(id=bob.id)).profile_version == 0
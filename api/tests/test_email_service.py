@@ -0,0 +1,137 @@
+"""The outbox against the Mailjet stand-in (scripts/fake_mailjet.py), served
+on a local port for each test."""
+import pytest
+
+from datetime import datetime, timezone, timedelta
+from aiohttp.test_utils import TestServer
+from scripts import fake_mailjet
+from schemas.email_outbox import EmailStatus
+from services import background, email_service, http_client
+from database.models import EmailOutbox
+
+
+def _message(email: str = "someone@example.com") -> dict:
+    return {
+        "From": {"Email": "no-reply@appsquad.com", "Name": "No reply"},
+        "To": [{"Email": email, "Name": "You"}],
+        "Subject": "Hello",
+        "TextPart": "Hello",
+    }
+
+
+@pytest.fixture
+async def mailjet(monkeypatch):
+    """`await mailjet(fail_rate)` starts a stand-in and points the service to it."""
+
+    servers = []
+
+    async def start(fail_rate: float = 0.0) -> TestServer:
+        server = TestServer(fake_mailjet.create_app(fail_rate=fail_rate, latency=0.0))
+        await server.start_server()
+        servers.append(server)
+        monkeypatch.setattr(email_service, "MAILJET_API_URL", str(server.make_url("/v3.1/send")))
+        return server
+
+    await http_client.open_session()
+
+    yield start
+
+    await http_client.close_session()
+
+    for server in servers:
+        await server.close()
+
+
+async def _make_due():
+    await EmailOutbox.all().update(run_after=datetime.now(timezone.utc) - timedelta(seconds=1))
+
+
+async def _delivered(server: TestServer) -> list[dict]:
+    response = await http_client.get(str(server.make_url("/v3.1/messages")))
+    return response.json()
+
+
+async def test_enqueued_emails_are_sent_in_one_batch(db, mailjet):
+    server = await mailjet()
+
+    first = await email_service.enqueue(_message("first@example.com"))
+    second = await email_service.enqueue(_message("second@example.com"))
+
+    batch = await email_service.claim_batch()
+    assert [email.id for email in batch] == [first.id, second.id]
+
+    await email_service.send_batch(batch)
+
+    for email in await EmailOutbox.all():
+        assert email.status == EmailStatus.SENT
+        assert email.sent_at is not None
+        assert email.attempts == 1
+
+    assert [message["To"][0]["Email"] for message in await _delivered(server)] == ["first@example.com", "second@example.com"]
+    assert await email_service.claim_batch() == []
+
+
+async def test_rejected_emails_are_dead_lettered_the_others_sent(db, mailjet):
+    await mailjet()
+
+    valid = await email_service.enqueue(_message("someone@example.com"))
+    invalid = await email_service.enqueue(_message("invalid@example.com"))
+
+    await email_service.send_batch(await email_service.claim_batch())
+
+    assert (await EmailOutbox.get(id=valid.id)).status == EmailStatus.SENT
+
+    invalid = await EmailOutbox.get(id=invalid.id)
+    assert invalid.status == EmailStatus.DEAD
+    assert "mj-0013" in invalid.error
+
+
+async def test_failed_calls_are_retried_with_backoff(db, mailjet):
+    await mailjet(fail_rate=1.0)
+
+    email = await email_service.enqueue(_message())
+    before = datetime.now(timezone.utc)
+
+    await email_service.send_batch(await email_service.claim_batch())
+
+    email = await EmailOutbox.get(id=email.id)
+    assert email.status == EmailStatus.PENDING
+    assert email.error.startswith("503")
+    assert email.run_after >= before + background.retry_delay(1, base=email_service.EMAIL_RETRY_BASE)
+
+    # not before its backoff
+    assert await email_service.claim_batch() == []
+
+    healthy = await mailjet()
+    await _make_due()
+    await email_service.send_batch(await email_service.claim_batch())
+
+    email = await EmailOutbox.get(id=email.id)
+    assert email.status == EmailStatus.SENT
+    assert email.attempts == 2
+    assert email.error is None
+    assert len(await _delivered(healthy)) == 1
+
+
+async def test_emails_out_of_attempts_are_dead_lettered(db, mailjet, monkeypatch):
+    monkeypatch.setattr(email_service, "EMAIL_MAX_ATTEMPTS", 3)
+    server = await mailjet(fail_rate=1.0)
+
+    email = await email_service.enqueue(_message())
+
+    for attempt in range(1, 4):
+        if attempt == 3:
+            # unreachable on the last attempt, connection errors count the same
+            await server.close()
+
+        await _make_due()
+        await email_service.send_batch(await email_service.claim_batch())
+
+        email = await EmailOutbox.get(id=email.id)
+        assert email.attempts == attempt
+
+    assert email.status == EmailStatus.DEAD
+    assert email.error == "ClientConnectorError"
+
+    await _make_due()
+    assert await email_service.claim_batch() == []
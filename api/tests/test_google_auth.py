@@ -0,0 +1,105 @@
+"""Sign-in identity against the Google stand-in (scripts/fake_google.py),
+served on a local port for each test."""
+import asyncio
+import jwt
+import pytest
+
+from fastapi import HTTPException
+from aiohttp.test_utils import TestServer
+from scripts import fake_google
+from services import auth_service, google_auth, http_client
+
+
+CLIENT_ID = "anyrecs-test"
+
+
+class _Google:
+    def __init__(self, server: TestServer):
+        self.server = server
+
+    def url(self, path: str) -> str:
+        return str(self.server.make_url(path))
+
+    async def sign_in(self, code: str = "alice") -> dict:
+        response = await http_client.post(self.url("/token"), data={"code": code, "client_id": CLIENT_ID})
+        return response.json()
+
+    async def rotate(self):
+        await http_client.post(self.url("/rotate"))
+
+
+@pytest.fixture
+async def google(monkeypatch, unused_tcp_port):
+    base_url = f"http://127.0.0.1:{unused_tcp_port}"
+    server = TestServer(fake_google.create_app(base_url=base_url, keys_max_age=3600, latency=0.0), port=unused_tcp_port)
+    await server.start_server()
+
+    monkeypatch.setenv("GOOGLE_CLIENT_ID", CLIENT_ID)
+    monkeypatch.setattr(google_auth, "GOOGLE_DISCOVERY_URL", f"{base_url}/.well-known/openid-configuration")
+
+    # nothing cached from another test
+    monkeypatch.setattr(google_auth, "_discovery", None)
+    monkeypatch.setattr(google_auth, "_jwks", None)
+    monkeypatch.setattr(google_auth, "_keys", {})
+    monkeypatch.setattr(google_auth, "_last_keys_refresh", 0.0)
+    monkeypatch.setattr(google_auth, "_refresh_lock", asyncio.Lock())
+
+    await http_client.open_session()
+
+    yield _Google(server)
+
+    await http_client.close_session()
+    await server.close()
+
+
+async def test_id_token_is_verified_locally(google):
+    tokens = await google.sign_in("alice")
+
+    claims = await google_auth.verify_id_token(tokens["id_token"], audience=CLIENT_ID)
+    assert claims["email"] == "alice@example.com"
+
+    identity = await auth_service._get_google_identity(tokens)
+    # the id token claims, userinfo answers with `id` instead
+    assert identity["sub"] == "alice"
+    assert "id" not in identity
+
+
+async def test_rotated_key_falls_back_to_userinfo_until_the_next_refresh(google, monkeypatch):
+    await google_auth.verify_id_token((await google.sign_in("alice"))["id_token"], audience=CLIENT_ID)
+    await google.rotate()
+
+    tokens = await google.sign_in("bob")
+
+    # refreshed a moment ago, the new key is not fetched yet
+    with pytest.raises(google_auth.GoogleAuthError):
+        await google_auth.verify_id_token(tokens["id_token"], audience=CLIENT_ID)
+
+    identity = await auth_service._get_google_identity(tokens)
+    assert identity["email"] == "bob@example.com"
+    assert identity["id"] == "bob"
+
+    monkeypatch.setattr(google_auth, "GOOGLE_KEYS_MIN_REFRESH_INTERVAL", 0)
+
+    claims = await google_auth.verify_id_token(tokens["id_token"], audience=CLIENT_ID)
+    assert claims["email"] == "bob@example.com"
+
+
+async def test_tampered_id_token_is_rejected(google):
+    tokens = await google.sign_in("alice")
+    header, payload, signature = tokens["id_token"].split(".")
+    tampered = f"{header}.{payload}.{signature[::-1]}"
+
+    with pytest.raises(jwt.InvalidTokenError):
+        await google_auth.verify_id_token(tampered, audience=CLIENT_ID)
+
+    with pytest.raises(HTTPException) as error:
+        await auth_service._get_google_identity({**tokens, "id_token": tampered})
+
+    assert error.value.status_code == 400
+
+
+async def test_wrong_audience_is_rejected(google):
+    tokens = await google.sign_in("alice")
+
+    with pytest.raises(jwt.InvalidAudienceError):
+        await google_auth.verify_id_token(tokens["id_token"], audience="another-client")
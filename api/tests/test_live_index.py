@@ -0,0 +1,28 @@
+import asyncio
+
+from services.live_index import LiveIndex
+from database.models import Tool as ToolModel
+
+
+async def test_changes_made_during_a_rebuild_are_replayed_on_the_new_index(db):
+    await ToolModel.create(link="old.com", name="Old", category="database", logo="logo")
+    building = asyncio.Event()
+    release = asyncio.Event()
+
+    async def build(tools: list[dict]) -> set:
+        building.set()
+        await release.wait()
+        return {tool["link"] for tool in tools}
+
+    live = LiveIndex("test", set(), build=build, interval=60)
+    rebuild = asyncio.create_task(live.rebuild())
+    await building.wait()
+
+    new_tool = await ToolModel.create(link="new.com", name="New", category="database", logo="logo")
+    live.remember(new_tool)
+    live.apply(lambda index: index.add(new_tool.link))
+    release.set()
+    await rebuild
+
+    assert live.index == {"old.com", "new.com"}
+    assert {tool.link for tool in live.tools.values()} == {"old.com", "new.com"}
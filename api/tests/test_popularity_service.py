@@ -0,0 +1,78 @@
+import math
+import pytest
+
+from tortoise import Tortoise
+from datetime import datetime, timezone, timedelta
+from services import popularity_service
+from database.models import (
+    User as UserModel,
+    Tool as ToolModel,
+    ToolPopularity as ToolPopularityModel,
+)
+
+
+HALF_LIFE = timedelta(hours=1)
+# ~650,000 half-lives after the epoch, 2 ** that is far beyond a float
+FAR_FUTURE = datetime(2100, 1, 1, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [FAR_FUTURE]
+
+    monkeypatch.setattr(popularity_service, "TRENDING_HALF_LIFE", HALF_LIFE)
+    monkeypatch.setattr(popularity_service, "_now", lambda: now[0])
+    popularity_service._leaderboards.clear()
+
+    return now
+
+
+async def _create_users(count: int) -> list[UserModel]:
+    return [
+        await UserModel.create(url=f"user{i}", username=f"user{i}", email=f"user{i}@example.com", picture="picture")
+        for i in range(count)
+    ]
+
+
+async def _add(user: UserModel, tool: ToolModel, added_at: datetime):
+    await popularity_service.add_membership(user, tool)
+
+    # the membership row gets the database clock, moved to the test one
+    through, user_key, tool_key = popularity_service.membership_table()
+    await Tortoise.get_connection("default").execute_query(
+        f'UPDATE "{through}" SET "created_at" = $1 WHERE "{user_key}" = $2 AND "{tool_key}" = $3',
+        [added_at, user.id, tool.id],
+    )
+
+
+async def test_trending_scores_with_a_short_half_life_far_from_the_epoch(db, clock):
+    alice, bob, carol = await _create_users(3)
+    fresh = await ToolModel.create(link="fresh.com", name="Fresh", category="database", logo="logo")
+    older = await ToolModel.create(link="older.com", name="Older", category="database", logo="logo")
+
+    # two adoptions two half-lives ago, then one now
+    clock[0] = FAR_FUTURE - 2 * HALF_LIFE
+    await _add(alice, older, clock[0])
+    await _add(bob, older, clock[0])
+    clock[0] = FAR_FUTURE
+    await _add(carol, fresh, clock[0])
+
+    page = await popularity_service.get_leaderboard(kind=popularity_service.TRENDING, limit=10)
+
+    assert [item.tool.id for item in page.items] == [fresh.id, older.id]
+    assert [item.score for item in page.items] == [pytest.approx(1.0), pytest.approx(0.5)]
+
+    # the incremental scores are the ones the reconciler computes from the memberships
+    assert await popularity_service.reconcile() == 0
+
+    await popularity_service.remove_membership(alice, older)
+    older_popularity = await ToolPopularityModel.get(tool_id=older.id)
+    assert older_popularity.users_count == 1
+    assert 2 ** (older_popularity.trending_log_score - popularity_service._log_weight(FAR_FUTURE)) == pytest.approx(0.25)
+
+    await popularity_service.remove_membership(bob, older)
+    older_popularity = await ToolPopularityModel.get(tool_id=older.id)
+    assert older_popularity.users_count == 0
+    assert older_popularity.trending_log_score == -math.inf
+
+    assert await popularity_service.reconcile() == 0
@@ -0,0 +1,87 @@
+"""The profile read paths run a fixed number of queries, whatever the number of tools."""
+import pytest
+
+from starlette.requests import Request
+from services import profile_cache, profile_service
+from database.models import (
+    User as UserModel,
+    Tool as ToolModel,
+    AudioReview as AudioReviewModel,
+)
+
+
+async def _create_user(nb_tools: int) -> UserModel:
+    user = await UserModel.create(url="alice", username="alice", email="alice@example.com", picture="picture")
+
+    for i in range(nb_tools):
+        tool = await ToolModel.create(link=f"tool{i}.com", name=f"Tool {i}", category="database", logo="logo")
+        await user.tools.add(tool)
+
+    return user
+
+
+def _request(**headers) -> Request:
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "path": "/",
+        "headers": [(name.encode(), value.encode()) for name, value in headers.items()],
+    })
+
+
+@pytest.mark.parametrize("nb_tools", [0, 1, 10])
+async def test_get_me_runs_one_query(db, count_queries, nb_tools):
+    user = await _create_user(nb_tools)
+
+    with count_queries() as queries:
+        me = await profile_service.get_me(user)
+
+    assert len(queries) == 1
+    assert len(me.tools) == nb_tools
+
+
+@pytest.mark.parametrize("nb_tools", [0, 1, 10])
+async def test_get_profile_runs_one_query(db, count_queries, nb_tools):
+    await _create_user(nb_tools)
+
+    with count_queries() as queries:
+        profile = await profile_service.get_profile(url="alice", include_tools=True)
+
+    assert len(queries) == 1
+    assert profile.url == "alice"
+    assert len(profile.tools) == nb_tools
+
+
+@pytest.mark.parametrize("nb_tools", [1, 10])
+async def test_get_review_runs_one_query(db, count_queries, nb_tools):
+    user = await _create_user(nb_tools)
+    tool = await ToolModel.first()
+    await AudioReviewModel.create(tool=tool, user=user, blob_key="audio/abc", size=3, mime_type="audio/webm")
+
+    with count_queries() as queries:
+        review = await profile_service.get_review(tool_id=tool.id, user_id=user.id)
+
+    assert len(queries) == 1
+    assert review.tool.id == tool.id
+    assert review.content_hash == "abc"
+
+
+async def test_profile_endpoint_queries(db, count_queries):
+    await _create_user(nb_tools=10)
+    profile_cache._versions.clear()
+    profile_cache._bodies.clear()
+
+    # cold: the version lookup, then the profile
+    with count_queries() as queries:
+        response = await profile_cache.get_profile_response(_request(), url="alice")
+
+    assert len(queries) == 2
+    assert response.status_code == 200
+
+    # warm: served from the worker caches
+    with count_queries() as queries:
+        response = await profile_cache.get_profile_response(_request(), url="alice")
+        not_modified = await profile_cache.get_profile_response(_request(**{"if-none-match": response.headers["etag"]}), url="alice")
+
+    assert len(queries) == 0
+    assert not_modified.status_code == 304
@@ -0,0 +1,35 @@
+import os
+
+from services import request_profiling
+
+
+async def _app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+
+async def _call(middleware, headers: list) -> dict:
+    scope = {"type": "http", "method": "GET", "path": "/tool/popular", "headers": headers}
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    await middleware(scope, None, send)
+    return dict(messages[0]["headers"])
+
+
+async def test_profiled_request_id_is_generated_by_the_server(tmp_path, monkeypatch):
+    monkeypatch.setattr(request_profiling, "PROFILING_TOKEN", "secret")
+    monkeypatch.setattr(request_profiling, "PROFILING_DIR", str(tmp_path))
+    middleware = request_profiling.ProfilingMiddleware(_app)
+
+    first = await _call(middleware, [(b"x-profiling-token", b"secret"), (b"x-request-id", b"reused")])
+    second = await _call(middleware, [(b"x-profiling-token", b"secret"), (b"x-request-id", b"reused")])
+
+    request_ids = {first[b"x-request-id"].decode(), second[b"x-request-id"].decode()}
+    assert "reused" not in request_ids
+    assert sorted(os.listdir(tmp_path)) == sorted(f"{request_id}.html" for request_id in request_ids)
+
+    # not profiled, the client's id is kept
+    assert (await _call(middleware, [(b"x-request-id", b"reused")]))[b"x-request-id"] == b"reused"
@@ -0,0 +1,69 @@
+import asyncio
+import pytest
+
+from fastapi import HTTPException
+from services import domain_cache, tool_service
+from schemas.tool_ingestion_job import ToolIngestionJobStatus
+from database.models import Tool, DomainMetadata, User
+
+
+INFO = {"name": "Example", "category": "Tools", "logo": "https://example.com/favicon.ico"}
+
+
+async def test_concurrent_calls_share_one_scrape_and_one_row(db, monkeypatch):
+    scrapes = []
+
+    async def scrape(domain):
+        scrapes.append(domain)
+        await asyncio.sleep(0.05)
+        return INFO
+
+    monkeypatch.setattr(tool_service, "_scrape_tool_info", scrape)
+
+    tools = await asyncio.gather(*(tool_service.get_or_create_tool("https://example.com/pricing") for _ in range(5)))
+
+    assert scrapes == ["example.com"]
+    assert {tool.id for tool in tools} == {tools[0].id}
+    assert await Tool.filter(link="example.com").count() == 1
+
+
+async def test_tool_created_elsewhere_during_the_scrape_is_reused(db, monkeypatch):
+    async def scrape(domain):
+        # another worker finishes first
+        await Tool.create(link=domain, **INFO)
+        return INFO
+
+    monkeypatch.setattr(tool_service, "_scrape_tool_info", scrape)
+
+    tool = await tool_service.get_or_create_tool("https://example.com")
+
+    assert await Tool.filter(link="example.com").count() == 1
+    assert tool.id == (await Tool.get(link="example.com")).id
+
+
+async def test_domain_cache_entries_outlive_a_failed_scrape(db, monkeypatch):
+    async def unreachable():
+        raise HTTPException(status_code=400, detail="Couldn't reach domain")
+
+    async def scrape(domain):
+        return await domain_cache.cached(domain_cache.VERIFY, domain, unreachable)
+
+    monkeypatch.setattr(tool_service, "_scrape_tool_info", scrape)
+
+    with pytest.raises(HTTPException):
+        await tool_service.get_or_create_tool("https://unreachable.example")
+
+    assert await DomainMetadata.filter(domain="unreachable.example", is_negative=True).count() == 1
+    assert not await Tool.exists(link="unreachable.example")
+
+
+async def test_adding_an_existing_tool_attaches_it_right_away(db):
+    tool = await Tool.create(link="example.com", **INFO)
+    user = await User.create(url="alice", username="alice", email="alice@example.com", picture="p")
+
+    job = await tool_service.add_tool("https://example.com/pricing", user=user)
+
+    assert job.status == ToolIngestionJobStatus.DONE
+    assert job.tool_id == tool.id
+    assert [_tool.id for _tool in await user.tools.all()] == [tool.id]
+    assert (await User.get(id=user.id)).profile_version == 1
@@ -3,14 +3,19 @@ import { Play, Pause, Mic, X, Square } from 'lucide-react';
 import axios from 'axios';
 
 const API_URL = process.env.REACT_APP_API_URL;
+const UPLOAD_CHUNK_SIZE = 256 * 1024;
 
-const DynamicWaveform = ({ audioBlob }) => {
+const DynamicWaveform = ({ audioBlob, peaks }) => {
   const [waveformData, setWaveformData] = useState([]);
   const canvasRef = useRef(null);
 
   useEffect(() => {
     const processAudioData = async () => {
-      if (!audioBlob) return;
+      if (!audioBlob) {
+        // peaks computed by the server, nothing to download before drawing
+        if (peaks) setWaveformData(peaks);
+        return;
+      }
 
       try {
         const arrayBuffer = await audioBlob.arrayBuffer();
@@ -37,7 +42,7 @@ const DynamicWaveform = ({ audioBlob }) => {
     };
 
     processAudioData();
-  }, [audioBlob]);
+  }, [audioBlob, peaks]);
 
   useEffect(() => {
     if (canvasRef.current && waveformData.length > 0) {
@@ -85,6 +90,9 @@ const Tool = ({ tool, userId, isAuthenticated, onRemove }) => {
   const [isRecording, setIsRecording] = useState(false);
   const [recordingTime, setRecordingTime] = useState(0);
   const [audioBlob, setAudioBlob] = useState(null);
+  const [audioUrl, setAudioUrl] = useState(null);
+  const [peaks, setPeaks] = useState(null);
+  const [duration, setDuration] = useState(null);
   const [currentTime, setCurrentTime] = useState(0);
   const [stream, setStream] = useState(null);
 
@@ -95,16 +103,16 @@ const Tool = ({ tool, userId, isAuthenticated, onRemove }) => {
   const checkToolForAudio = async () => {
     setIsCheckingAudio(true);
     try {
+      // only the metadata, the browser streams the recording itself when played
       const response = await axios.get(`${API_URL}/tool/${tool.id}/review`, {
-        responseType: 'blob',
         withCredentials: true,
         params: {
           user_id: userId,
-          data: true
         },
       });
-      const blob = new Blob([response.data], { type: 'audio/webm' });
-      setAudioBlob(blob);
+      setAudioUrl(`${API_URL}/tool/${tool.id}/review?user_id=${userId}&data=true&v=${response.data.content_hash}`);
+      setPeaks(response.data.peaks);
+      setDuration(response.data.duration);
       setHasAudio(true);
     } catch (error) {
       if (error.response && error.response.status !== 404) {
@@ -157,8 +165,7 @@ const Tool = ({ tool, userId, isAuthenticated, onRemove }) => {
       setIsPlaying(false);
     } else {
       try {
-        const audioUrl = URL.createObjectURL(audioBlob);
-        audioRef.current.src = audioUrl;
+        audioRef.current.src = audioBlob ? URL.createObjectURL(audioBlob) : audioUrl;
         audioRef.current.play();
         setIsPlaying(true);
 
@@ -226,13 +233,35 @@ const Tool = ({ tool, userId, isAuthenticated, onRemove }) => {
   }, [stream]);
 
   const sendAudioToServer = async (audioBlob) => {
+    // resumable upload: chunks are sent with their offset, a dropped connection resumes where the server stopped
+    const uploadsUrl = `${API_URL}/tool/${tool.id}/review/uploads`;
     try {
-      const formData = new FormData();
-      formData.append('audio', audioBlob, 'review.webm');
-      await axios.post(`${API_URL}/tool/${tool.id}/review`, formData, {
-        withCredentials: true,
-        headers: { 'Content-Type': 'multipart/form-data' }
-      });
+      const { data: upload } = await axios.post(uploadsUrl, {
+        size: audioBlob.size,
+        mime_type: audioBlob.type,
+      }, { withCredentials: true });
+
+      let offset = 0;
+      let failures = 0;
+      while (offset < audioBlob.size) {
+        try {
+          const { data } = await axios.put(`${uploadsUrl}/${upload.id}`, audioBlob.slice(offset, offset + UPLOAD_CHUNK_SIZE), {
+            withCredentials: true,
+            params: { offset },
+            headers: { 'Content-Type': 'application/octet-stream' },
+          });
+          offset = data.offset;
+          failures = 0;
+        } catch (error) {
+          if (++failures > 3) {
+            throw error;
+          }
+          await new Promise(resolve => setTimeout(resolve, 1000 * failures));
+          ({ data: { offset } } = await axios.get(`${uploadsUrl}/${upload.id}`, { withCredentials: true }));
+        }
+      }
+
+      await axios.post(`${uploadsUrl}/${upload.id}/complete`, {}, { withCredentials: true });
       setHasAudio(true);
     } catch (error) {
       console.error('Error sending audio to server:', error);
@@ -247,6 +276,9 @@ const Tool = ({ tool, userId, isAuthenticated, onRemove }) => {
       });
       setHasAudio(false);
       setAudioBlob(null);
+      setAudioUrl(null);
+      setPeaks(null);
+      setDuration(null);
     } catch (error) {
       console.error('Error deleting audio:', error);
     }
@@ -289,10 +321,10 @@ const Tool = ({ tool, userId, isAuthenticated, onRemove }) => {
                 {isPlaying ? <Pause size={20} /> : <Play size={20} />}
               </button>
               <div className="flex-grow">
-                <DynamicWaveform audioBlob={audioBlob} />
+                <DynamicWaveform audioBlob={audioBlob} peaks={peaks} />
               </div>
               <div className="ml-2 text-sm">
-                {formatTime(currentTime)}
+                {formatTime(currentTime)}{duration ? ` / ${formatTime(duration)}` : ''}
               </div>
             </>
           ) : (
@@ -7,6 +7,9 @@ import UserProfileMenu from "../components/UserProfileMenu";
 
 const API_URL = process.env.REACT_APP_API_URL;
 const MAX_NB_TOOLS = parseInt(process.env.REACT_APP_MAX_NB_TOOLS, 10);
+// long enough for the scraping deadline and the worker's retries (about 2 minutes)
+const JOB_POLL_INTERVAL_MS = 1000;
+const JOB_POLL_MAX_ATTEMPTS = 180;
 
 
 const AddToolModal = ({ isOpen, onClose, onAddTool }) => {
@@ -167,9 +170,21 @@ function UserProfile() {
 
   const handleAddTool = async (url) => {
     try {
-      const response = await axios.post(`${API_URL}/tool/`, { link: url }, { withCredentials: true });
+      // the tool is scraped in the background, poll the ingestion job until it is done
+      let { data: job } = await axios.post(`${API_URL}/tool/`, { link: url }, { withCredentials: true });
+      let attempts = 0;
+      while (job.status === "pending" || job.status === "running") {
+        if (++attempts > JOB_POLL_MAX_ATTEMPTS) {
+          throw new Error("Timed out while adding the tool");
+        }
+        await new Promise(resolve => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
+        ({ data: job } = await axios.get(`${API_URL}/tool/jobs/${job.id}`, { withCredentials: true }));
+      }
+      if (job.status === "failed") {
+        throw new Error(job.error || "Failed to add tool");
+      }
       setUserData(prevData => {
-        const updatedTools = [...prevData.tools, response.data];
+        const updatedTools = [...prevData.tools, job.tool];
         if (updatedTools.length >= MAX_NB_TOOLS) {
           setIsModalOpen(false); // Close the modal when reaching the limit
         }